@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+import os
 import uuid
 
 from utils.security import get_current_user
 from database.mongodb import get_db
 from models.user import UserResponse
+from utils.metrics import metrics
+from utils.facets import facet_counts
+from utils.ttl_cache import TTLCache
+from services.encoding_profiles import encoding_profiles
 
 router = APIRouter()
 
@@ -14,6 +19,10 @@ CEO_USER_IDS = [
     "85da75de-0905-4ab6-b3c2-fd37e593b51e"  # BrianJames
 ]
 
+# Platform analytics are computed at most once per TTL per worker
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+_analytics_cache = TTLCache(maxsize=1, ttl=ANALYTICS_CACHE_TTL)
+
 def verify_ceo(current_user):
     """Verify user is CEO"""
     if current_user['user_id'] not in CEO_USER_IDS:
@@ -95,7 +104,7 @@ async def update_user_tier(
         'target_username': user.get('username'),
         'old_tier': user.get('premium_tier', 'free'),
         'new_tier': tier,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
     
     return {'message': f"User upgraded to {tier}"}
@@ -120,7 +129,7 @@ async def impersonate_user(
         'action': 'impersonate',
         'target_user_id': user_id,
         'target_username': user.get('username'),
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
     
     from utils.security import create_access_token
@@ -205,6 +214,45 @@ async def get_admin_logs(
     
     return logs
 
+@router.get("/metrics")
+async def get_metrics(
+    current_user = Depends(get_current_user)
+):
+    """Get in-process performance counters for this worker (CEO only)"""
+    verify_ceo(current_user)
+    
+    return metrics.snapshot()
+
+@router.get("/encoding-profiles")
+async def get_encoding_profiles(
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Get per-tier video encoding profiles (CEO only)"""
+    verify_ceo(current_user)
+    
+    await encoding_profiles.refresh(db, force=True)
+    return encoding_profiles.as_dict()
+
+@router.put("/encoding-profiles")
+async def update_encoding_profiles(
+    profiles: Dict[str, Dict[str, Any]],
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Update encoding profiles (CEO only)
+    
+    Body: {"<tier>": {"preset": ..., "crf": ..., "max_height": ..., "threads": ...}}
+    Only the given settings change. Workers pick changes up within a minute.
+    """
+    verify_ceo(current_user)
+    
+    try:
+        return await encoding_profiles.update(db, profiles)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 @router.put("/users/{user_id}/interested")
 async def toggle_interested_party(
     user_id: str,
@@ -232,7 +280,7 @@ async def toggle_interested_party(
         'target_user_id': user_id,
         'target_username': user.get('username'),
         'interested': interested,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
     
     return {'message': f"User {'added to' if interested else 'removed from'} interested parties"}
@@ -323,7 +371,7 @@ async def bulk_import_users(
         'action': 'bulk_import',
         'imported_count': imported,
         'skipped_count': skipped,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
     
     return {
@@ -352,80 +400,44 @@ async def get_interested_parties(
     } for u in users]
 
 
-@router.get("/analytics")
-async def get_platform_analytics(
-    current_user = Depends(get_current_user),
-    db = Depends(get_db)
-):
-    """
-    Get comprehensive platform analytics for investors/admins
-    Accessible to CEO and Enterprise users
-    """
-    from datetime import timezone, timedelta
-    
-    # Get user info
-    user = await db.users.find_one({"_id": current_user["user_id"]}, {"_id": 0})
-    
-    # Check if user has access (CEO or Enterprise tier)
-    is_ceo = current_user['user_id'] in CEO_USER_IDS
-    is_enterprise = user.get("premium_tier") == "enterprise"
-    
-    if not (is_ceo or is_enterprise):
-        raise HTTPException(403, "Access denied. Enterprise tier or CEO access required.")
-    
-    # Calculate date ranges
+async def _compute_platform_analytics(db) -> Dict[str, Any]:
+    """Platform analytics from one $facet aggregation per collection"""
     now = datetime.now(timezone.utc)
-    thirty_days_ago = now - timedelta(days=30)
-    seven_days_ago = now - timedelta(days=7)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # PLATFORM METRICS
-    total_users = await db.users.count_documents({})
-    total_videos = await db.videos.count_documents({})
-    
-    # Active users (uploaded in last 30 days)
-    active_users_list = await db.videos.distinct("user_id", {
-        "uploaded_at": {"$gte": thirty_days_ago}
-    })
-    active_users_30d = len(active_users_list)
-    
-    # USER METRICS
-    users_by_tier = {
-        "free": await db.users.count_documents({"$or": [{"premium_tier": "free"}, {"premium_tier": {"$exists": False}}]}),
-        "pro": await db.users.count_documents({"premium_tier": "pro"}),
-        "enterprise": await db.users.count_documents({"premium_tier": "enterprise"})
-    }
-    
-    # Calculate growth rate (last 30 days vs previous 30 days)
+    seven_days_ago = now - timedelta(days=7)
+    thirty_days_ago = now - timedelta(days=30)
     sixty_days_ago = now - timedelta(days=60)
-    users_last_30d = await db.users.count_documents({
-        "created_at": {"$gte": thirty_days_ago.isoformat()}
-    })
-    users_prev_30d = await db.users.count_documents({
-        "created_at": {
-            "$gte": sixty_days_ago.isoformat(),
-            "$lt": thirty_days_ago.isoformat()
-        }
-    })
-    growth_rate = ((users_last_30d - users_prev_30d) / users_prev_30d * 100) if users_prev_30d > 0 else 100
-    
-    # VIDEO METRICS
-    videos_by_source = {
-        "bodycam": await db.videos.count_documents({"source": "bodycam"}),
-        "studio": await db.videos.count_documents({"source": "studio"})
-    }
     
-    blockchain_verified = await db.videos.count_documents({
-        "blockchain_signature": {"$ne": None}
+    # users.created_at is an ISO string
+    user_counts = await facet_counts(db.users, {
+        "total": {},
+        "free": {"$or": [{"premium_tier": "free"}, {"premium_tier": {"$exists": False}}]},
+        "pro": {"premium_tier": "pro"},
+        "enterprise": {"premium_tier": "enterprise"},
+        "last_30d": {"created_at": {"$gte": thirty_days_ago.isoformat()}},
+        "prev_30d": {"created_at": {"$gte": sixty_days_ago.isoformat(), "$lt": thirty_days_ago.isoformat()}}
     })
     
-    uploaded_today = await db.videos.count_documents({
-        "uploaded_at": {"$gte": today_start}
+    video_counts = await facet_counts(db.videos, {
+        "total": {},
+        "bodycam": {"source": "bodycam"},
+        "studio": {"source": "studio"},
+        "blockchain_verified": {"blockchain_signature": {"$ne": None}},
+        "today": {"uploaded_at": {"$gte": today_start}},
+        "week": {"uploaded_at": {"$gte": seven_days_ago}},
+        # Distinct uploaders in the last 30 days
+        "active_users_30d": [
+            {"$match": {"uploaded_at": {"$gte": thirty_days_ago}}},
+            {"$group": {"_id": "$user_id"}}
+        ]
     })
     
-    uploaded_this_week = await db.videos.count_documents({
-        "uploaded_at": {"$gte": seven_days_ago}
-    })
+    total_users = user_counts["total"]
+    total_videos = video_counts["total"]
+    
+    # Growth rate (last 30 days vs previous 30 days)
+    users_last_30d, users_prev_30d = user_counts["last_30d"], user_counts["prev_30d"]
+    growth_rate = ((users_last_30d - users_prev_30d) / users_prev_30d * 100) if users_prev_30d > 0 else 100
     
     avg_videos_per_user = total_videos / total_users if total_users > 0 else 0
     
@@ -449,19 +461,26 @@ async def get_platform_analytics(
         "platform": {
             "total_users": total_users,
             "total_videos": total_videos,
-            "active_users_30d": active_users_30d,
+            "active_users_30d": video_counts["active_users_30d"],
             "generated_at": now.isoformat()
         },
         "users": {
-            "by_tier": users_by_tier,
+            "by_tier": {
+                "free": user_counts["free"],
+                "pro": user_counts["pro"],
+                "enterprise": user_counts["enterprise"]
+            },
             "growth_rate": round(growth_rate, 1),
             "new_users_30d": users_last_30d
         },
         "videos": {
-            "by_source": videos_by_source,
-            "blockchain_verified": blockchain_verified,
-            "uploaded_today": uploaded_today,
-            "uploaded_this_week": uploaded_this_week,
+            "by_source": {
+                "bodycam": video_counts["bodycam"],
+                "studio": video_counts["studio"]
+            },
+            "blockchain_verified": video_counts["blockchain_verified"],
+            "uploaded_today": video_counts["today"],
+            "uploaded_this_week": video_counts["week"],
             "average_per_user": round(avg_videos_per_user, 2)
         },
         "storage": {
@@ -478,3 +497,24 @@ async def get_platform_analytics(
         }
     }
 
+@router.get("/analytics")
+async def get_platform_analytics(
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Get comprehensive platform analytics for investors/admins
+    Accessible to CEO and Enterprise users
+    """
+    # Get user info
+    user = await db.users.find_one({"_id": current_user["user_id"]}, {"_id": 0})
+    
+    # Check if user has access (CEO or Enterprise tier)
+    is_ceo = current_user['user_id'] in CEO_USER_IDS
+    is_enterprise = user.get("premium_tier") == "enterprise"
+    
+    if not (is_ceo or is_enterprise):
+        raise HTTPException(403, "Access denied. Enterprise tier or CEO access required.")
+    
+    return await _analytics_cache.get_or_compute("platform", lambda: _compute_platform_analytics(db))
+
@@ -1,87 +1,110 @@
 from fastapi import APIRouter, Depends
 from datetime import datetime, timedelta
+from typing import Dict
+import os
 from database.mongodb import get_db
+from services.analytics_buffer import analytics_buffer
+from services.analytics_rollups import analytics_rollups
 
 from api.auth import get_current_user
 from datetime import timezone
+from utils.facets import facet_counts
+from utils.ttl_cache import TTLCache
 
 router = APIRouter()
 
-@router.get("/public")
-async def get_public_analytics(db = Depends(get_db)):
-    """Get public analytics for investors (no auth required)"""
-    
-    # Get current date info
-    now = datetime.now()
-    start_of_month = datetime(now.year, now.month, 1)
-    
-    # Count users
-    total_users = await db.users.count_documents({})
-    free_users = await db.users.count_documents({'premium_tier': 'free'})
-    pro_users = await db.users.count_documents({'premium_tier': 'pro'})
-    enterprise_users = await db.users.count_documents({'premium_tier': 'enterprise'})
-    interested_parties = await db.users.count_documents({'interested_party': True})
-    
-    # Users this month
-    users_this_month = await db.users.count_documents({
-        'created_at': {'$gte': start_of_month.isoformat()}
+# Unauthenticated and scans whole collections, so computed at most once per TTL per worker
+PUBLIC_ANALYTICS_TTL = int(os.getenv("PUBLIC_ANALYTICS_TTL", "60"))
+_public_cache = TTLCache(maxsize=1, ttl=PUBLIC_ANALYTICS_TTL)
+
+async def _compute_public_analytics(db) -> Dict:
+    """Public analytics from one $facet aggregation per collection"""
+    now = datetime.now(timezone.utc)
+    start_of_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    
+    # users.created_at is an ISO string; videos.uploaded_at and verification timestamps are dates
+    user_counts = await facet_counts(db.users, {
+        'total': {},
+        'free': {'premium_tier': 'free'},
+        'pro': {'premium_tier': 'pro'},
+        'enterprise': {'premium_tier': 'enterprise'},
+        'interested_parties': {'interested_party': True},
+        'this_month': {'created_at': {'$gte': start_of_month.replace(tzinfo=None).isoformat()}}
     })
     
-    # Count videos
-    total_videos = await db.videos.count_documents({})
-    blockchain_verified = await db.videos.count_documents({'blockchain_signature': {'$exists': True}})
-    bodycam_videos = await db.videos.count_documents({'source': 'bodycam'})
-    studio_videos = await db.videos.count_documents({'source': 'studio'})
-    
-    # Videos this month
-    videos_this_month = await db.videos.count_documents({
-        'uploaded_at': {'$gte': start_of_month.isoformat()}
+    video_counts = await facet_counts(db.videos, {
+        'total': {},
+        'blockchain_verified': {'blockchain_signature': {'$ne': None}},
+        'bodycam': {'source': 'bodycam'},
+        'studio': {'source': 'studio'},
+        'this_month': {'uploaded_at': {'$gte': start_of_month}},
+        # Active creators (uploaded this month)
+        'active_creators': [
+            {'$match': {'uploaded_at': {'$gte': start_of_month}}},
+            {'$group': {'_id': '$user_id'}}
+        ]
     })
     
-    # Count verifications
-    total_verifications = await db.verification_attempts.count_documents({})
-    verifications_this_month = await db.verification_attempts.count_documents({
-        'timestamp': {'$gte': start_of_month.isoformat()}
+    verification_counts = await facet_counts(db.verification_attempts, {
+        'total': {},
+        'this_month': {'timestamp': {'$gte': start_of_month}}
     })
     
     # Calculate engagement
+    total_users, total_videos = user_counts['total'], video_counts['total']
     avg_videos_per_user = total_videos / total_users if total_users > 0 else 0
     
-    # Active creators (uploaded this month)
-    active_creators = len(set([
-        v['user_id'] for v in await db.videos.find({
-            'uploaded_at': {'$gte': start_of_month.isoformat()}
-        }).to_list(length=10000)
-    ]))
-    
     return {
         'users': {
             'total': total_users,
-            'free': free_users,
-            'pro': pro_users,
-            'enterprise': enterprise_users,
-            'interested_parties': interested_parties
+            'free': user_counts['free'],
+            'pro': user_counts['pro'],
+            'enterprise': user_counts['enterprise'],
+            'interested_parties': user_counts['interested_parties']
         },
         'videos': {
             'total': total_videos,
-            'blockchain_verified': blockchain_verified,
-            'bodycam': bodycam_videos,
-            'studio': studio_videos
+            'blockchain_verified': video_counts['blockchain_verified'],
+            'bodycam': video_counts['bodycam'],
+            'studio': video_counts['studio']
         },
         'verifications': {
-            'total': total_verifications
+            'total': verification_counts['total']
         },
         'growth': {
-            'users_this_month': users_this_month,
-            'videos_this_month': videos_this_month,
-            'verifications_this_month': verifications_this_month
+            'users_this_month': user_counts['this_month'],
+            'videos_this_month': video_counts['this_month'],
+            'verifications_this_month': verification_counts['this_month']
         },
         'engagement': {
             'avg_videos_per_user': round(avg_videos_per_user, 2),
-            'active_creators': active_creators
+            'active_creators': video_counts['active_creators']
         }
     }
 
+def _activity_item(doc: Dict) -> Dict:
+    """A stored /track/* event in the shape the dashboard has always returned"""
+    meta = doc.get("meta") or {}
+    event_type = meta.get("event_type")
+    timestamp = doc.get("timestamp")
+    
+    item = {
+        "username": meta.get("username"),
+        "type": event_type,
+        "referrer": doc.get("referrer"),
+        "clicked_at" if event_type == "social_click" else "viewed_at":
+            timestamp.replace(tzinfo=timezone.utc).isoformat() if isinstance(timestamp, datetime) else timestamp
+    }
+    for field in ("video_id", "platform"):
+        if field in doc:
+            item[field] = doc[field]
+    return item
+
+@router.get("/public")
+async def get_public_analytics(db = Depends(get_db)):
+    """Get public analytics for investors (no auth required)"""
+    return await _public_cache.get_or_compute('public', lambda: _compute_public_analytics(db))
+
 @router.post("/track/page-view")
 async def track_page_view(
     username: str,
@@ -90,12 +113,11 @@ async def track_page_view(
 ):
     """Track showcase page view"""
     view_doc = {
-        "username": username,
-        "viewed_at": datetime.now(timezone.utc).isoformat(),
-        "referrer": referrer,
-        "type": "page_view"
+        "timestamp": datetime.now(timezone.utc),
+        "meta": {"username": username, "event_type": "page_view"},
+        "referrer": referrer
     }
-    await db.analytics_events.insert_one(view_doc)
+    await analytics_buffer.add(view_doc)
     return {"status": "tracked"}
 
 @router.post("/track/video-view")
@@ -107,13 +129,12 @@ async def track_video_view(
 ):
     """Track individual video view"""
     view_doc = {
+        "timestamp": datetime.now(timezone.utc),
+        "meta": {"username": username, "event_type": "video_view"},
         "video_id": video_id,
-        "username": username,
-        "viewed_at": datetime.now(timezone.utc).isoformat(),
-        "referrer": referrer,
-        "type": "video_view"
+        "referrer": referrer
     }
-    await db.analytics_events.insert_one(view_doc)
+    await analytics_buffer.add(view_doc)
     return {"status": "tracked"}
 
 @router.post("/track/social-click")
@@ -125,13 +146,12 @@ async def track_social_click(
 ):
     """Track social media link click"""
     click_doc = {
-        "username": username,
+        "timestamp": datetime.now(timezone.utc),
+        "meta": {"username": username, "event_type": "social_click"},
         "platform": platform,
-        "clicked_at": datetime.now(timezone.utc).isoformat(),
-        "referrer": referrer,
-        "type": "social_click"
+        "referrer": referrer
     }
-    await db.analytics_events.insert_one(click_doc)
+    await analytics_buffer.add(click_doc)
     return {"status": "tracked"}
 
 @router.get("/dashboard")
@@ -146,103 +166,55 @@ async def get_dashboard_analytics(
     # Calculate date range
     start_date = datetime.now(timezone.utc) - timedelta(days=days)
     
-    # Count total page views
-    page_views = await db.analytics_events.count_documents({
-        "username": username,
-        "type": "page_view",
-        "viewed_at": {"$gte": start_date.isoformat()}
-    })
+    # Pre-summed hourly/daily rollups of the legacy events, keyed "@<username>"
+    # (see services/analytics_rollups.py)
+    summary = await analytics_rollups.summary(
+        db, f"@{username}", ["page_view", "video_view", "social_click"], start_date
+    )
     
-    # Count total video views
-    video_views = await db.analytics_events.count_documents({
-        "username": username,
-        "type": "video_view",
-        "viewed_at": {"$gte": start_date.isoformat()}
-    })
-    
-    # Count total social clicks
-    social_clicks = await db.analytics_events.count_documents({
-        "username": username,
-        "type": "social_click",
-        "clicked_at": {"$gte": start_date.isoformat()}
-    })
+    page_views = summary["page_view"]["count"]
+    video_views = summary["video_view"]["count"]
+    social_clicks = summary["social_click"]["count"]
     
     # Get top videos by views
-    pipeline = [
-        {
-            "$match": {
-                "username": username,
-                "type": "video_view",
-                "viewed_at": {"$gte": start_date.isoformat()}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$video_id",
-                "view_count": {"$sum": 1}
-            }
-        },
-        {
-            "$sort": {"view_count": -1}
-        },
-        {
-            "$limit": 5
-        }
-    ]
-    
-    top_videos_cursor = db.analytics_events.aggregate(pipeline)
-    top_videos_raw = await top_videos_cursor.to_list(length=5)
+    top_videos_raw = analytics_rollups.top(summary["video_view"]["videos"], 5)
+    
+    # Enrich with video details (one query for all of them)
+    videos = {
+        video["_id"]: video
+        async for video in db.videos.find(
+            {"_id": {"$in": [video_id for video_id, _ in top_videos_raw]}},
+            {"verification_code": 1, "thumbnail_path": 1}
+        )
+    }
     
-    # Enrich with video details
     top_videos = []
-    for item in top_videos_raw:
-        video = await db.videos.find_one({"_id": item["_id"]}, {"_id": 0, "verification_code": 1, "thumbnail_path": 1})
+    for video_id, view_count in top_videos_raw:
+        video = videos.get(video_id)
         if video:
             top_videos.append({
-                "video_id": item["_id"],
+                "video_id": video_id,
                 "verification_code": video.get("verification_code"),
                 "thumbnail_path": video.get("thumbnail_path"),
-                "view_count": item["view_count"]
+                "view_count": view_count
             })
     
     # Get social click breakdown
-    social_pipeline = [
-        {
-            "$match": {
-                "username": username,
-                "type": "social_click",
-                "clicked_at": {"$gte": start_date.isoformat()}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$platform",
-                "click_count": {"$sum": 1}
-            }
-        },
-        {
-            "$sort": {"click_count": -1}
-        }
-    ]
-    
-    social_cursor = db.analytics_events.aggregate(social_pipeline)
-    social_breakdown = await social_cursor.to_list(length=20)
-    
     social_click_breakdown = [
         {
-            "platform": item["_id"],
-            "click_count": item["click_count"]
+            "platform": platform,
+            "click_count": click_count
         }
-        for item in social_breakdown
+        for platform, click_count in analytics_rollups.top(summary["social_click"]["platforms"], 20)
     ]
     
     # Get recent activity (last 10 events)
     recent_cursor = db.analytics_events.find(
-        {"username": username},
+        {"meta.username": username},
         {"_id": 0}
-    ).sort("viewed_at", -1).limit(10)
+    ).sort("timestamp", -1).limit(10)
     
-    recent_activity = await recent_cursor.to_list(length=10)
+    recent_activity = [_activity_item(doc) for doc in await recent_cursor.to_list(length=10)]
     
     return {
         "total_page_views": page_views,
@@ -2,12 +2,16 @@ from fastapi import APIRouter, Depends, Request, HTTPException
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 from database.mongodb import get_db
+from services.analytics_buffer import analytics_buffer
+from services.analytics_rollups import analytics_rollups, PLATFORM_TARGET
 from models.analytics_event import EventCreate, AnalyticsStats
 from utils.security import get_current_user_optional
 import uuid
 
 router = APIRouter()
 
+EVENT_TYPES = ["showcase_view", "video_view", "social_click", "video_download"]
+
 @router.post("/track")
 async def track_event(
     event: EventCreate,
@@ -17,24 +21,30 @@ async def track_event(
 ):
     """
     Track an analytics event (public endpoint, no auth required)
+    
+    Events are buffered and written in batches (see services/analytics_buffer.py);
+    under sustained database slowness some events may be dropped.
     """
     try:
         # Create event document
         event_doc = {
             "_id": str(uuid.uuid4()),
-            "event_type": event.event_type,
+            "timestamp": datetime.now(timezone.utc),
+            "meta": {
+                "target_user_id": event.target_user_id,
+                "event_type": event.event_type
+            },
             "user_id": current_user.get("user_id") if current_user else None,
-            "target_user_id": event.target_user_id,
             "target_username": event.target_username,
             "video_id": event.video_id,
             "metadata": event.metadata or {},
             "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent"),
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "user_agent": request.headers.get("user-agent")
         }
         
-        # Insert into analytics_events collection
-        await db.analytics_events.insert_one(event_doc)
+        # Queue for the next batched insert into analytics_events
+        if not await analytics_buffer.add(event_doc):
+            return {"success": False, "error": "Analytics busy, event dropped"}
         
         return {"success": True, "event_id": event_doc["_id"]}
     except Exception as e:
@@ -64,102 +74,45 @@ async def get_user_analytics(
         
         user_id = user["_id"]
         
-        # Query events for this user
-        query = {
-            "target_user_id": user_id,
-            "timestamp": {"$gte": start_date.isoformat()}
-        }
-        
-        # Count showcase views
-        showcase_views = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "showcase_view"
-        })
-        
-        # Count video views
-        video_views = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "video_view"
-        })
+        # Pre-summed hourly/daily rollups (see services/analytics_rollups.py)
+        summary = await analytics_rollups.summary(db, user_id, EVENT_TYPES, start_date)
         
-        # Count social clicks
-        social_clicks = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "social_click"
-        })
-        
-        # Count downloads
-        downloads = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "video_download"
-        })
-        
-        # Get unique visitors (by IP address)
-        unique_ips = await db.analytics_events.distinct("ip_address", query)
-        unique_visitors = len([ip for ip in unique_ips if ip])
+        # Get unique visitors (by IP address, HyperLogLog estimate)
+        unique_visitors = await analytics_rollups.unique_visitors(db, user_id, start_date)
         
         # Get top videos
-        video_view_pipeline = [
-            {"$match": {
-                "target_user_id": user_id,
-                "event_type": "video_view",
-                "video_id": {"$ne": None},
-                "timestamp": {"$gte": start_date.isoformat()}
-            }},
-            {"$group": {
-                "_id": "$video_id",
-                "views": {"$sum": 1}
-            }},
-            {"$sort": {"views": -1}},
-            {"$limit": 10}
-        ]
+        top_videos_raw = analytics_rollups.top(summary["video_view"]["videos"], 10)
         
-        top_videos_cursor = db.analytics_events.aggregate(video_view_pipeline)
-        top_videos_raw = await top_videos_cursor.to_list(length=10)
+        # Enrich with video details (one query for all of them)
+        ids = [video_id for video_id, _ in top_videos_raw]
+        videos = {}
+        async for video in db.videos.find(
+            {"$or": [{"id": {"$in": ids}}, {"_id": {"$in": ids}}]},
+            {"id": 1, "title": 1, "verification_code": 1}
+        ):
+            videos[video.get("id") or video["_id"]] = video
         
-        # Enrich with video details
         top_videos = []
-        for item in top_videos_raw:
-            video = await db.videos.find_one(
-                {"$or": [{"id": item["_id"]}, {"_id": item["_id"]}]},
-                {"_id": 0, "title": 1, "verification_code": 1, "thumbnail_url": 1}
-            )
+        for video_id, views in top_videos_raw:
+            video = videos.get(video_id)
             if video:
                 top_videos.append({
-                    "video_id": item["_id"],
-                    "views": item["views"],
+                    "video_id": video_id,
+                    "views": views,
                     "title": video.get("title", "Untitled"),
                     "verification_code": video.get("verification_code", "N/A")
                 })
         
         # Get social platform breakdown
-        social_pipeline = [
-            {"$match": {
-                "target_user_id": user_id,
-                "event_type": "social_click",
-                "timestamp": {"$gte": start_date.isoformat()}
-            }},
-            {"$group": {
-                "_id": "$metadata.platform",
-                "clicks": {"$sum": 1}
-            }}
-        ]
-        
-        social_cursor = db.analytics_events.aggregate(social_pipeline)
-        social_breakdown_raw = await social_cursor.to_list(length=20)
-        
-        platform_breakdown = {
-            item["_id"] or "unknown": item["clicks"] 
-            for item in social_breakdown_raw
-        }
+        platform_breakdown = summary["social_click"]["platforms"]
         
         return {
             "username": username,
             "period_days": days,
-            "total_showcase_views": showcase_views,
-            "total_video_views": video_views,
-            "total_social_clicks": social_clicks,
-            "total_downloads": downloads,
+            "total_showcase_views": summary["showcase_view"]["count"],
+            "total_video_views": summary["video_view"]["count"],
+            "total_social_clicks": summary["social_click"]["count"],
+            "total_downloads": summary["video_download"]["count"],
             "unique_visitors": unique_visitors,
             "top_videos": top_videos,
             "platform_breakdown": platform_breakdown
@@ -182,39 +135,18 @@ async def get_platform_analytics(
         end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=days)
         
-        query = {"timestamp": {"$gte": start_date.isoformat()}}
-        
-        # Count all event types
-        showcase_views = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "showcase_view"
-        })
-        
-        video_views = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "video_view"
-        })
-        
-        social_clicks = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "social_click"
-        })
-        
-        downloads = await db.analytics_events.count_documents({
-            **query,
-            "event_type": "video_download"
-        })
+        # Platform-wide rollups
+        summary = await analytics_rollups.summary(db, PLATFORM_TARGET, EVENT_TYPES, start_date)
         
-        # Unique visitors
-        unique_ips = await db.analytics_events.distinct("ip_address", query)
-        unique_visitors = len([ip for ip in unique_ips if ip])
+        # Unique visitors (HyperLogLog estimate)
+        unique_visitors = await analytics_rollups.unique_visitors(db, PLATFORM_TARGET, start_date)
         
         return {
             "period_days": days,
-            "total_showcase_views": showcase_views,
-            "total_video_views": video_views,
-            "total_social_clicks": social_clicks,
-            "total_downloads": downloads,
+            "total_showcase_views": summary["showcase_view"]["count"],
+            "total_video_views": summary["video_view"]["count"],
+            "total_social_clicks": summary["social_click"]["count"],
+            "total_downloads": summary["video_download"]["count"],
             "unique_visitors": unique_visitors
         }
     except Exception as e:
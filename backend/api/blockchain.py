@@ -1,12 +1,15 @@
-from fastapi import APIRouter
-from services.blockchain_service import blockchain_service
+from fastapi import APIRouter, Depends, HTTPException
+from services.anchor_queue import anchor_queue
+from database.mongodb import get_db
+from utils.lazy import LazyService
 
 router = APIRouter()
+blockchain_service = LazyService("services.blockchain_service", "blockchain_service")
 
 @router.get("/status")
 async def get_blockchain_status():
     """Get blockchain connection status"""
-    status = blockchain_service.get_connection_status()
+    status = await blockchain_service.get_connection_status()
     
     return {
         "blockchain_enabled": status['has_key'],
@@ -17,7 +20,7 @@ async def get_blockchain_status():
         "balance_pol": status.get('balance', 0),
         "current_block": status.get('block_number'),
         "gas_price_gwei": status.get('gas_price_gwei'),
-        "explorer": "https://amoy.polygonscan.com"
+        "explorer": blockchain_service.explorer_url
     }
 
 @router.get("/read/{tx_hash}")
@@ -29,10 +32,40 @@ async def read_transaction(tx_hash: str):
         return {
             "success": True,
             "data": data,
-            "explorer_url": f"https://amoy.polygonscan.com/tx/{tx_hash}"
+            "explorer_url": blockchain_service.explorer_tx_url(tx_hash)
         }
     else:
         return {
             "success": False,
             "error": "Could not read transaction data"
         }
+
+@router.get("/verify/{verification_code}")
+async def verify_anchor(
+    verification_code: str,
+    db = Depends(get_db)
+):
+    """
+    Verify a video's blockchain anchor by verification code
+    
+    The Merkle inclusion proof is checked locally against the stored root; the
+    anchor transaction itself is looked up once and cached afterwards.
+    """
+    video = await db.videos.find_one(
+        {"verification_code": verification_code},
+        {
+            "_id": 1, "id": 1, "hashes.original": 1, "storage.file_sha256": 1,
+            "blockchain_anchor": 1, "blockchain_signature": 1
+        }
+    )
+    
+    if not video:
+        raise HTTPException(404, "Verification code not found")
+    
+    try:
+        result = await anchor_queue.verify(db, video)
+    except Exception as e:
+        print(f"❌ Anchor verification failed: {e}")
+        raise HTTPException(502, "Could not reach the blockchain")
+    
+    return {"verification_code": verification_code, **result}
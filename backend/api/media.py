@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+import asyncio
+import mimetypes
+import os
+from typing import Optional
+
+from services.storage import storage, PUBLIC_PREFIXES
+from services.thumbnail_service import thumbnail_service, THUMBNAIL_FORMATS, RESIZE_WIDTHS
+from utils.range_response import file_response, object_response
+
+router = APIRouter()
+
+IMMUTABLE = {"cache-control": "public, max-age=31536000, immutable"}
+
+
+@router.get("/{key:path}")
+async def get_media(
+    key: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    format: Optional[str] = Query(None)
+):
+    """
+    Serve a public stored object (thumbnails, profile pictures, banners)
+
+    Keys are content-addressed, so a key's bytes never change: responses are
+    cacheable forever and the digest in the file name is a strong ETag.
+
+    With ?w= (and optionally ?format=webp|jpg) the image is resized on demand;
+    widths snap to a fixed set and results are kept in an on-disk LRU cache.
+    """
+    if not key.startswith(PUBLIC_PREFIXES) or ".." in key.split("/"):
+        raise HTTPException(404, "File not found")
+
+    digest, extension = os.path.splitext(os.path.basename(key))
+
+    if w is None and format is None:
+        return await object_response(
+            request,
+            storage.backend,
+            key,
+            etag=f'"{digest}"',
+            media_type=mimetypes.guess_type(key)[0] or "application/octet-stream",
+            headers=IMMUTABLE
+        )
+
+    target_format = format or extension.lstrip(".")
+    if target_format not in THUMBNAIL_FORMATS:
+        raise HTTPException(400, f"Unsupported format. Use {', '.join(THUMBNAIL_FORMATS)}")
+
+    width = thumbnail_service.snap_width(w or RESIZE_WIDTHS[-1])
+
+    # Only a missing object or a key outside the store is a 404; storage and
+    # decoding failures surface as server errors
+    try:
+        exists = await asyncio.to_thread(storage.backend.exists, key)
+    except ValueError:
+        exists = False
+    if not exists:
+        raise HTTPException(404, "File not found")
+
+    try:
+        path = await asyncio.to_thread(thumbnail_service.resized, key, width, target_format)
+    except FileNotFoundError:
+        # Deleted since the check
+        raise HTTPException(404, "File not found")
+
+    return await file_response(
+        request,
+        path,
+        etag=f'"{digest}-{width}-{target_format}"',
+        media_type=THUMBNAIL_FORMATS[target_format][2],
+        headers=IMMUTABLE
+    )
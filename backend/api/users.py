@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from typing import List
+import asyncio
 import os
-import shutil
 import uuid
 
 from models.user import CreatorProfile, UpdateProfile
 from models.video import VideoInfo
 from utils.security import get_current_user
 from database.mongodb import get_db
+from services.storage import storage
+from services.thumbnail_service import thumbnail_service
 
 router = APIRouter()
 
@@ -68,12 +70,21 @@ async def get_creator_videos(
         if video.get("folder_id"):
             folder_name = folder_map.get(video["folder_id"], "Unknown")
         
-        thumbnail_url = f"/api/thumbnails/{video['_id']}.jpg" if video.get("thumbnail_path") else None
+        # Showcase grids use the small thumbnail; thumbnail_urls carries every size/format
+        thumbnail_urls = thumbnail_service.urls(video)
+        thumbnail_key = video.get("storage", {}).get("thumbnail_key")
+        if thumbnail_urls:
+            thumbnail_url = thumbnail_urls["grid"]["jpg"]
+        elif thumbnail_key:
+            thumbnail_url = storage.media_url(thumbnail_key)
+        else:
+            thumbnail_url = f"/api/thumbnails/{video['_id']}.jpg" if video.get("thumbnail_path") else None
         
         result.append(VideoInfo(
             video_id=video["_id"],
             verification_code=video["verification_code"],
             thumbnail_url=thumbnail_url or "",
+            thumbnail_urls=thumbnail_urls,
             captured_at=video["captured_at"],
             folder_name=folder_name,
             folder_id=video.get("folder_id"),
@@ -124,6 +135,51 @@ async def update_creator_profile(
     
     return {"message": "Profile updated successfully"}
 
+# Stored image extension per accepted upload type
+IMAGE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp'
+}
+
+async def _store_image(file: UploadFile) -> str:
+    """Store an uploaded image under its content-addressed key and return its URL"""
+    extension = IMAGE_EXTENSIONS[file.content_type]
+    temp_path = f"uploads/temp/{uuid.uuid4()}{extension}"
+    
+    with open(temp_path, "wb") as f:
+        content = await file.read()
+        f.write(content)
+    
+    try:
+        stored = await asyncio.to_thread(storage.store_file, temp_path, "images", extension, file.content_type)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    return storage.media_url(stored["key"])
+
+async def _replace_image(db, user_id: str, file: UploadFile, field: str, legacy_field: str) -> str:
+    """Store an uploaded image as the user's `field` and delete the image it replaces"""
+    previous = await db.users.find_one({"_id": user_id}, {field: 1, legacy_field: 1}) or {}
+    
+    url = await _store_image(file)
+    
+    await db.users.update_one(
+        {"_id": user_id},
+        {"$set": {
+            field: url,
+            legacy_field: url  # Also update old field for compatibility
+        }}
+    )
+    
+    # The old object goes only once no user document points at it any more
+    for old_url in {previous.get(field), previous.get(legacy_field)} - {url, None}:
+        await storage.delete_unshared_image(db, old_url)
+    
+    return url
+
 @router.post("/upload-profile-picture")
 async def upload_profile_picture(
     file: UploadFile = File(...),
@@ -131,35 +187,14 @@ async def upload_profile_picture(
     db = Depends(get_db)
 ):
     """Upload profile picture"""
-    import os
-    from pathlib import Path
-    
     # Validate file type
     allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp']
     if file.content_type not in allowed_types:
         raise HTTPException(400, "Invalid file type. Use JPG, PNG, or WebP")
     
-    # Create profile pictures directory
-    profile_pics_dir = Path("uploads/profile_pictures")
-    profile_pics_dir.mkdir(exist_ok=True, parents=True)
-    
-    # Save file
-    file_extension = file.filename.split('.')[-1]
-    filename = f"{current_user['user_id']}.{file_extension}"
-    file_path = profile_pics_dir / filename
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
-    # Update user profile
-    picture_url = f"/api/profile_pictures/{filename}"
-    await db.users.update_one(
-        {"_id": current_user["user_id"]},
-        {"$set": {
-            "profile_picture_url": picture_url,
-            "profile_picture": picture_url  # Also update old field for compatibility
-        }}
+    # Store under its content-addressed key, update the profile, drop the old picture
+    picture_url = await _replace_image(
+        db, current_user["user_id"], file, "profile_picture_url", "profile_picture"
     )
     
     return {"profile_picture": picture_url}
@@ -171,9 +206,6 @@ async def upload_banner(
     db = Depends(get_db)
 ):
     """Upload showcase banner image (Pro/Enterprise only)"""
-    import os
-    from pathlib import Path
-    
     # Check tier
     user = await db.users.find_one({"_id": current_user["user_id"]})
     if user.get("premium_tier") not in ["pro", "enterprise"]:
@@ -184,27 +216,9 @@ async def upload_banner(
     if file.content_type not in allowed_types:
         raise HTTPException(400, "Invalid file type. Use JPG, PNG, or WebP")
     
-    # Create banners directory
-    banners_dir = Path("uploads/banners")
-    banners_dir.mkdir(exist_ok=True, parents=True)
-    
-    # Save file
-    file_extension = file.filename.split('.')[-1]
-    filename = f"{current_user['user_id']}_banner.{file_extension}"
-    file_path = banners_dir / filename
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
-    # Update user profile
-    banner_url = f"/api/banners/{filename}"
-    await db.users.update_one(
-        {"_id": current_user["user_id"]},
-        {"$set": {
-            "banner_image_url": banner_url,
-            "banner_image": banner_url  # Also update old field for compatibility
-        }}
+    # Store under its content-addressed key, update the profile, drop the old banner
+    banner_url = await _replace_image(
+        db, current_user["user_id"], file, "banner_image_url", "banner_image"
     )
     
     return {"banner_image": banner_url}
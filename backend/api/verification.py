@@ -1,15 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import datetime, timezone
 import uuid
 import os
-import shutil
+from utils.upload_ingest import ingest_upload, max_upload_bytes
 
-from services.video_processor import VideoProcessor
+from utils.lazy import LazyService
 from models.video import VerificationCodeRequest, VerificationResult
 from database.mongodb import get_db
 
 router = APIRouter()
-video_processor = VideoProcessor()
+video_processor = LazyService("services.video_processor", "video_processor")
 
 @router.post("/code", response_model=VerificationResult)
 async def verify_by_code(
@@ -43,7 +43,7 @@ async def verify_by_code(
         "verification_code": request.verification_code,
         "verification_type": "code",
         "result": "authentic",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now(timezone.utc)
     })
     
     metadata = {
@@ -72,34 +72,52 @@ async def verify_by_code(
 
 @router.post("/deep", response_model=VerificationResult)
 async def deep_verification(
-    video_file: UploadFile = File(...),
-    verification_code: str = Form(...),
+    request: Request,
     db = Depends(get_db)
 ):
-    """Deep verification by file upload"""
-    original_video = await db.videos.find_one({"verification_code": verification_code})
-    
-    if not original_video:
-        raise HTTPException(404, "Verification code not found")
-    
+    """
+    Deep verification by file upload
+
+    Multipart form: video_file (file), verification_code. The body is streamed
+    from the request, so oversized files are rejected without being read in full.
+    """
     # Save temp file
     temp_id = str(uuid.uuid4())
     upload_dir = "uploads/temp"
     os.makedirs(upload_dir, exist_ok=True)
     
-    file_path = f"{upload_dir}/{temp_id}_{video_file.filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(video_file.file, buffer)
+    # Anonymous verifiers get the free-tier size limit
+    ingested, form = await ingest_upload(
+        request,
+        "video_file",
+        lambda filename: f"{upload_dir}/{temp_id}_{filename}",
+        max_upload_bytes("free")
+    )
+    file_path = ingested.path
+    verification_code = form.get("verification_code")
     
     try:
-        # Process uploaded video
-        frames, _ = video_processor.extract_frames(file_path)
+        if not verification_code:
+            raise HTTPException(422, "Missing form field 'verification_code'")
+        
+        original_video = await db.videos.find_one({"verification_code": verification_code})
+        
+        if not original_video:
+            raise HTTPException(404, "Verification code not found")
+        
+        # Process uploaded video, sampling the same frames the original hash was taken from
+        original_hash = original_video['perceptual_hash']
+        frames, frame_info = video_processor.extract_frames(
+            file_path, sampling_mode=original_hash.get('sampling_mode')
+        )
         new_hash = video_processor.calculate_perceptual_hash(frames)
+        new_hash['sampling_mode'] = frame_info['sampling_mode']
         
         # Compare with original
-        original_hash = original_video['perceptual_hash']
-        comparison = video_processor.compare_hashes(original_hash, new_hash)
+        try:
+            comparison = video_processor.compare_hashes(original_hash, new_hash)
+        except ValueError as e:
+            raise HTTPException(422, f"Video cannot be compared with the original: {e}")
         
         # Generate analysis
         if comparison['result'] == "authentic":
@@ -122,7 +140,7 @@ async def deep_verification(
             "frame_comparison": comparison['frame_comparison'],
             "result": comparison['result'],
             "confidence_level": comparison['confidence_level'],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now(timezone.utc)
         })
         
         # Clean up
@@ -150,6 +168,10 @@ async def deep_verification(
             metadata=metadata
         )
         
+    except HTTPException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
         if os.path.exists(file_path):
             os.remove(file_path)
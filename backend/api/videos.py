@@ -1,24 +1,36 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query
-from datetime import datetime, timezone, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from datetime import datetime, timezone
+import asyncio
 import os
-import shutil
 import uuid
 from utils.security import get_current_user
+from utils.upload_ingest import ingest_upload, max_upload_bytes
+from utils.range_response import object_response
+from utils.ttl_cache import TTLCache
 from database.mongodb import get_db
-from services.video_processor import video_processor
-from utils.watermark import watermark_processor
-from services.blockchain_service import blockchain_service
-from services.enhanced_video_processor import enhanced_processor
-from services.notification_service import notification_service
+from services.job_queue import job_queue
+from services.upload_pipeline import UPLOAD_DIR, upload_pipeline
+from services.hls_packager import hls_packager, MEDIA_TYPES as HLS_MEDIA_TYPES
+from services.storage import storage
+from services.thumbnail_service import thumbnail_service
+from models.video import VideoStatusResponse
 from pydantic import BaseModel
-from typing import Optional
-from fastapi.responses import FileResponse
+from typing import Dict, Optional
 
 router = APIRouter()
 
+# Public/private decision and ETag per video for the stream endpoint. Changes made
+# through this worker invalidate immediately; other workers see them within the TTL.
+STREAM_ACCESS_TTL = int(os.getenv("STREAM_ACCESS_TTL", "30"))
+# Unknown ids are cached only briefly: a video requested just before its insert
+# commits must not stay 404 for the full TTL
+STREAM_ACCESS_MISS_TTL = float(os.getenv("STREAM_ACCESS_MISS_TTL", "2"))
+_stream_access_cache = TTLCache(maxsize=10000, ttl=STREAM_ACCESS_TTL)
+
 class VideoUploadResponse(BaseModel):
     video_id: str
-    verification_code: str
+    job_id: Optional[str] = None
+    verification_code: Optional[str] = None
     status: str
     message: str
     expires_at: Optional[str] = None
@@ -27,6 +39,8 @@ class VideoUploadResponse(BaseModel):
     duplicate_detected: Optional[bool] = None
     confidence_score: Optional[float] = None
     original_upload_date: Optional[str] = None
+    content_sha256: Optional[str] = None
+    file_size: Optional[int] = None
 
 class VideoUpdateData(BaseModel):
     title: Optional[str] = None
@@ -38,20 +52,26 @@ class VideoUpdateData(BaseModel):
 
 @router.post("/upload", response_model=VideoUploadResponse)
 async def upload_video(
-    video_file: UploadFile = File(...),
-    folder_id: str = Form(None),
+    request: Request,
     current_user = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
-    Upload and process video with enhanced detection and storage management
+    Upload a video and queue it for processing
+    
+    Multipart form: video_file (file), folder_id (optional). The body is parsed from
+    the request stream after the quota check, so it is only read once and an upload
+    over the tier's size limit is rejected as soon as it crosses it.
     
-    NEW WORKFLOW:
-    1. Save temp video
-    2. Calculate ORIGINAL hash (pre-watermark)
-    3. Check for duplicates using smart detection
-    4. If duplicate -> return existing code
-    5. If new -> Generate code, watermark, calculate all hashes, store with expiration
+    WORKFLOW:
+    1. Check quota and save the upload
+    2. Queue a background job (see services/upload_pipeline.py) that calculates the
+       ORIGINAL hash, checks for duplicates, watermarks, hashes, thumbnails,
+       timestamps and stores the video
+    3. Return the job id immediately - poll GET /jobs/{job_id} for progress and the
+       verification code (or the existing code if the video is a duplicate)
+    
+    Byte-identical re-uploads are answered immediately with the existing code (no job).
     
     Source is auto-detected: "studio" for web uploads
     """
@@ -72,266 +92,122 @@ async def upload_video(
         ]
     })
     
+    # Uploads still being processed count towards the quota too
+    pending_count = await db.processing_jobs.count_documents({
+        "user_id": current_user["user_id"],
+        "type": "video_upload",
+        "status": {"$in": ["queued", "running"]}
+    })
+    
     # Check quota limits
     quota_limits = {"free": 5, "pro": 100, "enterprise": -1}
     limit = quota_limits.get(tier, 5)
     
-    if limit != -1 and active_count >= limit:
+    if limit != -1 and active_count + pending_count >= limit:
         raise HTTPException(
             403, 
-            f"Video quota reached. You have {active_count}/{limit} videos. Delete old videos or upgrade your tier."
+            f"Video quota reached. You have {active_count + pending_count}/{limit} videos. Delete old videos or upgrade your tier."
         )
     
     video_id = str(uuid.uuid4())
-    upload_dir = "/app/backend/uploads/videos"
+    upload_dir = UPLOAD_DIR
     os.makedirs(upload_dir, exist_ok=True)
     
-    file_path = f"{upload_dir}/{video_id}_{video_file.filename}"
+    # Stream the upload to disk, hashing it in the same pass (413 if over the tier limit)
+    ingested, form = await ingest_upload(
+        request,
+        "video_file",
+        lambda filename: f"{upload_dir}/{video_id}_{filename}",
+        max_upload_bytes(tier)
+    )
+    file_path = ingested.path
+    folder_id = form.get("folder_id") or None
     
-    # Save uploaded file to temp
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(video_file.file, buffer)
+    # Byte-identical re-upload: return the existing code without decoding anything
+    duplicate = await upload_pipeline.resolve_exact_duplicate(
+        db, file_path, ingested.sha256, current_user["user_id"], tier
+    )
+    if duplicate:
+        print(f"⚡ Exact duplicate of video {duplicate['video_id']} ({ingested.sha256[:16]}...)")
+        return {**duplicate, "tier": tier, "content_sha256": ingested.sha256, "file_size": ingested.size}
     
     try:
-        print(f"\n{'='*60}")
-        print("🎬 NEW VIDEO UPLOAD - Hash-First Workflow")
-        print(f"{'='*60}")
-        print(f"   User: {user.get('username')}")
-        print(f"   Tier: {tier}")
-        print(f"   Quota: {active_count + 1}/{limit if limit != -1 else 'unlimited'}")
-        
-        # STEP 1: Calculate ORIGINAL hash (pre-watermark)
-        print("\n🔍 STEP 1: Calculating original hash (pre-watermark)...")
-        original_hashes = enhanced_processor.calculate_all_hashes(file_path, tier)
-        
-        print(f"   ✅ Original hash: {original_hashes['original_hash'][:32]}...")
-        print(f"   ✅ Duration: {original_hashes['duration']}s")
-        print(f"   ✅ Frames: {original_hashes['frame_count']}")
-        
-        # STEP 2: Smart Duplicate Detection
-        print("\n🔍 STEP 2: Smart duplicate detection...")
-        
-        # Get all user's existing videos
-        existing_videos = await db.videos.find(
-            {"user_id": current_user["user_id"]},
-            {"_id": 0}
-        ).to_list(length=1000)
-        
-        is_duplicate, matching_video, confidence = enhanced_processor.smart_duplicate_detection(
-            new_hashes=original_hashes,
-            existing_videos=existing_videos,
-            tier=tier
-        )
-        
-        if is_duplicate:
-            print("\n🚨 DUPLICATE DETECTED!")
-            print(f"   Confidence: {confidence:.2%}")
-            print(f"   Original code: {matching_video['verification_code']}")
-            print(f"   Original upload: {matching_video.get('uploaded_at')}")
-            
-            # Delete temp file
-            os.remove(file_path)
-            
-            # Update expiration if needed (extend storage)
-            if matching_video.get('storage', {}).get('expires_at'):
-                storage_durations = {"free": 24, "pro": 168, "enterprise": None}  # hours
-                duration = storage_durations.get(tier)
-                
-                if duration:
-                    new_expiration = datetime.now(timezone.utc) + timedelta(hours=duration)
-                    await db.videos.update_one(
-                        {"id": matching_video['id']},
-                        {"$set": {"storage.expires_at": new_expiration}}
-                    )
-                    print(f"   ✅ Storage extended to: {new_expiration}")
-            
-            return {
-                "video_id": matching_video['id'],
-                "verification_code": matching_video['verification_code'],
-                "status": "duplicate",
-                "message": "This video was already uploaded. Returning existing verification code.",
-                "duplicate_detected": True,
-                "confidence_score": confidence,
-                "original_upload_date": matching_video.get('uploaded_at')
-            }
-        
-        # STEP 3: NEW VIDEO - Generate verification code
-        print("\n✅ NEW VIDEO DETECTED")
-        print("\n🔐 STEP 3: Generating verification code...")
-        verification_code = video_processor.generate_verification_code()
-        print(f"   ✅ Code: {verification_code}")
-        
-        # STEP 4: Apply Watermark
-        print("\n💧 STEP 4: Applying watermark...")
-        username = user.get("username", "user")
-        watermark_position = user.get("watermark_position", "left")
-        watermarked_path = f"{upload_dir}/{video_id}_watermarked.mp4"
-        
-        watermark_success = watermark_processor.apply_watermark(
-            input_video_path=file_path,
-            output_video_path=watermarked_path,
-            username=username,
-            position=watermark_position,
-            tier=tier,
-            verification_code=verification_code
-        )
-        
-        if watermark_success:
-            final_path = f"{upload_dir}/{video_id}.mp4"
-            os.rename(watermarked_path, final_path)    # Rename watermarked → final
-            print(f"✅ Watermarked video saved: {final_path}")
-        else:
-            final_video_path = file_path
-            print("   ⚠️ Watermark failed - using original")
-        
-        # Rename to standard format
-        final_path = f"{upload_dir}/{video_id}.mp4"
-        os.rename(final_video_path, final_path)
-        
-        # STEP 5: Calculate watermarked hash
-        print("\n🔐 STEP 5: Calculating watermarked hash...")
-        watermarked_hashes = enhanced_processor.calculate_all_hashes(final_path, tier)
-        print(f"   ✅ Watermarked hash: {watermarked_hashes['original_hash'][:32]}...")
-        
-        # STEP 6: Generate thumbnail
-        print("\n📸 STEP 6: Generating thumbnail...")
-        thumbnail_path = video_processor.extract_thumbnail(final_path, video_id)
-        print("   ✅ Thumbnail saved")
-        
-        # STEP 7: Calculate expiration
-        print("\n⏰ STEP 7: Setting storage expiration...")
-        uploaded_at = datetime.now(timezone.utc)
-        
-        storage_durations = {
-            "free": 24,      # 24 hours
-            "pro": 168,      # 7 days
-            "enterprise": None  # Unlimited
-        }
-        
-        duration_hours = storage_durations.get(tier)
-        
-        if duration_hours:
-            expires_at = uploaded_at + timedelta(hours=duration_hours)
-            print(f"   ⏰ Tier: {tier} - Expires in {duration_hours} hours")
-            print(f"   ⏰ Expiration: {expires_at}")
-        else:
-            expires_at = None
-            print(f"   ♾️ Tier: {tier} - Unlimited storage")
-        
-        # STEP 8: Blockchain (optional)
-        blockchain_data = None
-        try:
-            print("\n⛓️ STEP 8: Blockchain timestamping...")
-            blockchain_data = blockchain_service.timestamp_video(
-                video_id=video_id,
-                verification_code=verification_code,
-                video_hash=original_hashes['original_hash'],
-                metadata={
-                    "duration": original_hashes['duration'],
-                    "resolution": original_hashes['resolution'],
-                    "tier": tier
-                }
-            )
-            if blockchain_data:
-                print(f"   ✅ Blockchain tx: {blockchain_data.get('tx_hash', 'N/A')[:16]}...")
-        except Exception as e:
-            print(f"   ⚠️ Blockchain failed: {e}")
-        
-        # STEP 9: Save to database
-        print("\n💾 STEP 9: Saving to database...")
-        
-        video_doc = {
-            "_id": video_id,
-            "id": video_id,
-            "user_id": current_user["user_id"],
-            "verification_code": verification_code,
-            "source": source,
-            "uploaded_at": uploaded_at,
-            
-            # Enhanced hashes (NEW)
-            "hashes": {
-                "original": original_hashes['original_hash'],
-                "watermarked": watermarked_hashes['original_hash'],
-                "center_region": original_hashes.get('center_region_hash'),
-                "audio": original_hashes.get('audio_hash'),
-                "metadata": original_hashes['metadata_hash']
+        job_id = await job_queue.enqueue(
+            db,
+            "video_upload",
+            {
+                "video_id": video_id,
+                "user_id": current_user["user_id"],
+                "file_path": file_path,
+                "content_sha256": ingested.sha256,
+                "file_size": ingested.size,
+                "folder_id": folder_id,
+                "source": source,
+                "tier": tier
             },
-            
-            # Storage management (NEW)
-            "storage": {
-                "tier": tier,
-                "uploaded_at": uploaded_at,
-                "expires_at": expires_at,
-                "warned_at": None,
-                "download_count": 0
-            },
-            
-            # Legacy fields (keep for compatibility)
-            "perceptual_hash": {
-                "combined_hash": original_hashes['original_hash']
-            },
-            "video_metadata": {
-                "duration": original_hashes['duration'],
-                "frame_count": original_hashes['frame_count'],
-                "resolution": original_hashes['resolution']
-            },
-            "thumbnail_path": thumbnail_path,
-            "folder_id": folder_id,
-            "showcase_folder_id": folder_id,  # NEW: Also set showcase folder
-            "blockchain_signature": blockchain_data,
-            "verification_status": "verified",
-            "is_public": True  # NEW: Default to public for showcase
-        }
-        
-        await db.videos.insert_one(video_doc)
-        print("   ✅ Saved to database")
-        
-        # STEP 10: Send notification (if applicable)
-        print("\n📧 STEP 10: Checking notification preferences...")
-        
-        should_notify = original_hashes['duration'] >= user.get('notify_video_length_threshold', 30)
-        
-        if should_notify:
-            print(f"   📧 Video length ({original_hashes['duration']}s) exceeds threshold - sending notification")
-            
-            download_url = f"https://rendr-studio-1.preview.emergentagent.com/dashboard?video={video_id}"
-            
-            notification_results = await notification_service.send_video_ready_notification(
-                user=user,
-                verification_code=verification_code,
-                download_url=download_url,
-                video_duration=original_hashes['duration']
-            )
-            
-            print(f"   📧 Email sent: {notification_results.get('email', False)}")
-            print(f"   📱 SMS sent: {notification_results.get('sms', False)}")
-        else:
-            print(f"   ℹ️ Video too short ({original_hashes['duration']}s < threshold) - skipping notification")
-        
-        print(f"\n{'='*60}")
-        print("✅ UPLOAD COMPLETE")
-        print(f"{'='*60}\n")
-        
-        return {
-            "video_id": video_id,
-            "verification_code": verification_code,
-            "status": "success",
-            "message": "Video uploaded and verified successfully",
-            "expires_at": expires_at.isoformat() if expires_at else None,
-            "storage_duration": f"{duration_hours} hours" if duration_hours else "unlimited",
-            "tier": tier
-        }
-        
+            user_id=current_user["user_id"],
+            video_id=video_id
+        )
     except Exception as e:
-        print(f"\n❌ ERROR during upload: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Cleanup on error
         if os.path.exists(file_path):
             os.remove(file_path)
-        
-        raise HTTPException(500, f"Video processing failed: {str(e)}")
+        raise HTTPException(500, f"Could not queue video for processing: {str(e)}")
+    
+    print(f"📥 Upload queued: video {video_id}, job {job_id} ({tier})")
+    
+    return {
+        "video_id": video_id,
+        "job_id": job_id,
+        "verification_code": None,
+        "status": "processing",
+        "message": "Video uploaded. Processing has started.",
+        "tier": tier,
+        "content_sha256": ingested.sha256,
+        "file_size": ingested.size
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=VideoStatusResponse)
+async def get_processing_status(
+    job_id: str,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Get progress of a queued upload (and its result once processing finishes)"""
+    job = await job_queue.get(db, job_id)
+    
+    if not job:
+        raise HTTPException(404, "Job not found")
+    
+    if job.get('user_id') != current_user['user_id']:
+        raise HTTPException(403, "Not authorized")
+    
+    result = job.get('result') or {}
+    
+    if job['status'] == "completed":
+        status = result.get('status', "success")
+    elif job['status'] == "running":
+        status = "processing"
+    else:
+        status = job['status']
+    
+    return VideoStatusResponse(
+        video_id=job['video_id'],
+        job_id=job_id,
+        status=status,
+        progress=job.get('progress', 0),
+        step=job.get('step'),
+        message=result.get('message') or job.get('message'),
+        error=job.get('error') if job['status'] == "failed" else None,
+        verification_code=result.get('verification_code'),
+        thumbnail_url=result.get('thumbnail_url'),
+        expires_at=result.get('expires_at'),
+        storage_duration=result.get('storage_duration'),
+        tier=result.get('tier'),
+        duplicate_detected=result.get('duplicate_detected'),
+        confidence_score=result.get('confidence_score'),
+        original_upload_date=result.get('original_upload_date')
+    )
 
 
 @router.get("/user/list")
@@ -341,13 +217,15 @@ async def list_user_videos(
 ):
     """Get all videos for current user"""
     videos = await db.videos.find(
-        {"user_id": current_user["user_id"]}
+        {"user_id": current_user["user_id"]},
+        {"hashes.frames": 0, "hashes.audio_fingerprint": 0, "similarity_keys": 0}  # Binary hash data is not JSON-serialisable
     ).to_list(length=1000)
     
     video_list = []
     for v in videos:
         # Get video_id, prefer 'id' field, fallback to '_id'
         video_id = v.get('id') or str(v.get('_id', ''))
+        hls_path = hls_packager.playlist_path(v.get('hls'))
         
         video_list.append({
             "video_id": video_id,
@@ -356,13 +234,15 @@ async def list_user_videos(
             "captured_at": v.get('captured_at'),
             "uploaded_at": v.get('uploaded_at'),
             "thumbnail_url": v.get('thumbnail_path'),
+            "thumbnail_urls": thumbnail_service.urls(v),
             "folder_id": v.get('folder_id'),
             "showcase_folder_id": v.get('showcase_folder_id'),
             "is_public": v.get('is_public', False),
             "has_blockchain": v.get('blockchain_signature') is not None,
             "verification_status": v.get('verification_status', 'pending'),
             "storage": v.get('storage'),
-            "hashes": v.get('hashes')
+            "hashes": v.get('hashes'),
+            "hls_url": f"/api/videos/{video_id}/hls/{hls_path}" if hls_path else None
         })
     
     # Sort by showcase folder, then by order
@@ -412,6 +292,7 @@ async def update_video(
             {id_field: video_id},
             {"$set": update_fields}
         )
+        _stream_access_cache.invalidate(video_id)
     
     return {"message": "Video updated successfully"}
 
@@ -484,6 +365,7 @@ async def update_video_metadata(
             {id_field: video_id},
             {"$set": update_fields}
         )
+        _stream_access_cache.invalidate(video_id)
     
     return {"message": "Video metadata updated successfully"}
 
@@ -504,27 +386,44 @@ async def delete_video(
     if video['user_id'] != current_user['user_id']:
         raise HTTPException(403, "Not authorized")
     
-    # Delete video file
-    video_path = f"/app/backend/uploads/videos/{video_id}.mp4"
-    if os.path.exists(video_path):
-        os.remove(video_path)
-    
-    # Delete thumbnail
-    if video.get('thumbnail_path'):
-        thumb_path = f"/app/backend{video['thumbnail_path']}"
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
+    # Delete video file, thumbnail and HLS renditions
+    await storage.delete_unshared_video_objects(db, video)
     
     # Delete from database - use whichever ID field exists
     id_field = "id" if video.get("id") else "_id"
     await db.videos.delete_one({id_field: video_id})
+    _stream_access_cache.invalidate(video_id)
     
     return {"message": "Video deleted successfully"}
 
 
+async def _stream_access(db, video_id: str) -> Dict:
+    """Visibility and ETag for a video (cached for STREAM_ACCESS_TTL seconds)"""
+    access = _stream_access_cache.get(video_id)
+    if access is not None:
+        return access
+    
+    # Check both 'id' and '_id' fields for compatibility with old videos
+    video = await db.videos.find_one(
+        {"$or": [{"id": video_id}, {"_id": video_id}]},
+        {"id": 1, "is_public": 1, "storage.file_sha256": 1, "storage.video_key": 1}
+    )
+    
+    file_sha256 = (video or {}).get("storage", {}).get("file_sha256")
+    access = {
+        "exists": video is not None,
+        "is_public": bool(video and video.get("is_public", False)),
+        "etag": f'"{file_sha256}"' if file_sha256 else None,
+        "object": storage.video_object(video) if video else None
+    }
+    _stream_access_cache.set(video_id, access, ttl=None if video else STREAM_ACCESS_MISS_TTL)
+    return access
+
+
 @router.get("/{video_id}/download")
 async def download_video(
     video_id: str,
+    request: Request,
     current_user = Depends(get_current_user),
     db = Depends(get_db)
 ):
@@ -538,47 +437,122 @@ async def download_video(
     if video['user_id'] != current_user['user_id']:
         raise HTTPException(403, "Not authorized")
     
-    video_path = f"/app/backend/uploads/videos/{video_id}.mp4"
+    backend, key = storage.video_object(video)
     
-    if not os.path.exists(video_path):
+    if not await asyncio.to_thread(backend.exists, key):
         raise HTTPException(404, "Video file not found")
     
-    # Increment download count
-    id_field = "id" if video.get("id") else "_id"
-    await db.videos.update_one(
-        {id_field: video_id},
-        {"$inc": {"storage.download_count": 1}}
-    )
+    # Increment download count (resumed downloads are not counted again)
+    range_header = request.headers.get("range", "")
+    if not range_header or range_header.replace(" ", "").startswith("bytes=0-"):
+        id_field = "id" if video.get("id") else "_id"
+        await db.videos.update_one(
+            {id_field: video_id},
+            {"$inc": {"storage.download_count": 1}}
+        )
     
-    # Return file with proper headers
-    return FileResponse(
-        video_path,
+    # Return file with proper headers (or redirect to the object store)
+    file_sha256 = video.get("storage", {}).get("file_sha256")
+    filename = f'{video["verification_code"]}.mp4'
+    return await object_response(
+        request,
+        backend,
+        key,
+        etag=f'"{file_sha256}"' if file_sha256 else None,
         media_type="video/mp4",
-        filename=f"{video['verification_code']}.mp4"
+        headers={
+            "content-disposition": f'attachment; filename="{filename}"',
+            "cache-control": "private, no-cache"
+        },
+        filename=filename
     )
 
 
 @router.get("/{video_id}/stream")
 async def stream_video(
     video_id: str,
+    request: Request,
     db = Depends(get_db)
 ):
-    """Stream video file (public access if video is public)"""
-    # Check both 'id' and '_id' fields for compatibility with old videos
-    video = await db.videos.find_one({"$or": [{"id": video_id}, {"_id": video_id}]})
+    """
+    Stream video file (public access if video is public)
     
-    if not video:
+    Supports Range requests for seeking and If-None-Match revalidation. The
+    visibility lookup is cached briefly so scrubbing doesn't query MongoDB per range.
+    With object storage the player is redirected to a presigned URL instead.
+    """
+    access = await _stream_access(db, video_id)
+    
+    if not access["exists"]:
         raise HTTPException(404, "Video not found")
     
-    if not video.get('is_public', False):
+    if not access["is_public"]:
         raise HTTPException(403, "Video is private")
     
-    video_path = f"/app/backend/uploads/videos/{video_id}.mp4"
+    backend, key = access["object"]
     
-    if not os.path.exists(video_path):
-        raise HTTPException(404, "Video file not found")
+    try:
+        return await object_response(
+            request,
+            backend,
+            key,
+            etag=access["etag"],
+            media_type="video/mp4",
+            headers={"cache-control": "public, max-age=300"}
+        )
+    except HTTPException as e:
+        if e.status_code == 404:
+            raise HTTPException(404, "Video file not found")
+        raise
+
+
+@router.get("/{video_id}/hls/{file_path:path}")
+async def stream_hls(
+    video_id: str,
+    file_path: str,
+    request: Request,
+    db = Depends(get_db)
+):
+    """
+    Serve the HLS ladder of a public video: master.m3u8, then <rendition>/index.m3u8
+    and its segments (relative URLs in the playlists resolve under this endpoint)
+    """
+    access = await _stream_access(db, video_id)
     
-    return FileResponse(
-        video_path,
-        media_type="video/mp4"
-    )
+    if not access["exists"]:
+        raise HTTPException(404, "Video not found")
+    
+    if not access["is_public"]:
+        raise HTTPException(403, "Video is private")
+    
+    key = hls_packager.object_key(video_id, file_path)
+    if not key:
+        raise HTTPException(404, "HLS file not found")
+    media_type = HLS_MEDIA_TYPES[os.path.splitext(key)[1]]
+    
+    # Ladders are never rewritten (re-packaging publishes a new version)
+    cache_control = "public, max-age=31536000, immutable"
+    
+    backend = storage.backend
+    
+    if file_path.endswith(".m3u8") and not backend.local_path(key):
+        # Playlists are proxied from object storage: their relative segment URLs
+        # must resolve under this endpoint, which redirects each segment
+        try:
+            playlist = await asyncio.to_thread(backend.get_bytes, key)
+        except Exception:
+            raise HTTPException(404, "HLS file not found")
+        return Response(playlist, media_type=media_type, headers={"cache-control": cache_control})
+    
+    try:
+        return await object_response(
+            request,
+            backend,
+            key,
+            media_type=media_type,
+            headers={"cache-control": cache_control}
+        )
+    except HTTPException as e:
+        if e.status_code == 404:
+            raise HTTPException(404, "HLS file not found")
+        raise
@@ -1,6 +1,8 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
+from services.similarity_index import similarity_index
+
 client = None
 db = None
 
@@ -14,6 +16,13 @@ async def connect_db():
     await db.users.create_index("email", unique=True)
     await db.videos.create_index("verification_code", unique=True)
     await db.videos.create_index("user_id")
+    # Exact-duplicate fast path: one stored video per uploaded file per user
+    await db.videos.create_index(
+        [("content_sha256", 1), ("user_id", 1)],
+        unique=True,
+        partialFilterExpression={"content_sha256": {"$type": "string"}}
+    )
+    await similarity_index.ensure_indexes(db)
     
     print("✅ MongoDB connected and indexes created")
     return db
@@ -18,10 +18,22 @@ class VideoUploadResponse(BaseModel):
 
 class VideoStatusResponse(BaseModel):
     video_id: str
-    status: str
-    verification_code: str
+    status: str  # queued, processing, success, duplicate, failed
+    verification_code: Optional[str] = None
     verified_at: Optional[str] = None
     thumbnail_url: Optional[str] = None
+    # Background processing fields
+    job_id: Optional[str] = None
+    progress: int = 0
+    step: Optional[str] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+    expires_at: Optional[str] = None
+    storage_duration: Optional[str] = None
+    tier: Optional[str] = None
+    duplicate_detected: Optional[bool] = None
+    confidence_score: Optional[float] = None
+    original_upload_date: Optional[str] = None
 
 class VerificationCodeRequest(BaseModel):
     verification_code: str
@@ -42,6 +54,7 @@ class VideoInfo(BaseModel):
     video_id: str
     verification_code: str
     thumbnail_url: str
+    thumbnail_urls: Optional[Dict] = None  # {size: {width, height, webp, jpg}}
     captured_at: str
     folder_name: Optional[str] = None
     folder_id: Optional[str] = None
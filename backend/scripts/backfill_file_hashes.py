@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Stored File Hash Backfill
+
+Records the SHA-256 and size of each stored video file (storage.file_sha256 /
+storage.file_size) for videos uploaded before they were saved at upload time.
+The stream and download endpoints use the hash as a strong ETag; videos without
+it are served with a weak mtime/size ETag.
+
+Usage:
+    python3 scripts/backfill_file_hashes.py
+"""
+
+import asyncio
+import os
+import sys
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mongodb import connect_db, close_db
+from services.storage import storage
+from utils.upload_ingest import sha256_file
+
+
+def _hash_object(backend, key: str):
+    """(sha256, size) of a stored video"""
+    with backend.open_local(key) as path:
+        return sha256_file(path), os.path.getsize(path)
+
+
+async def main():
+    """Main entry point"""
+    db = await connect_db()
+    updated = 0
+    missing = 0
+
+    try:
+        print("🔐 Hashing stored video files...")
+        async for video in db.videos.find(
+            {"storage.file_sha256": {"$exists": False}},
+            {"_id": 1, "id": 1, "storage.video_key": 1}
+        ):
+            backend, key = storage.video_object(video)
+
+            if not await asyncio.to_thread(backend.exists, key):
+                missing += 1
+                continue
+
+            file_sha256, file_size = await asyncio.to_thread(_hash_object, backend, key)
+            await db.videos.update_one(
+                {"_id": video["_id"]},
+                {"$set": {
+                    "storage.file_sha256": file_sha256,
+                    "storage.file_size": file_size
+                }}
+            )
+            updated += 1
+
+        print(f"✅ Hashed {updated} videos ({missing} without a stored file)")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Hash Comparator Benchmark
+
+Compares throughput of:
+1. Per-pair: VideoProcessor.compare_hashes in a Python loop (imagehash per frame)
+2. Batch: VideoProcessor.compare_hashes_batch (one uint64 XOR + popcount over N x F)
+
+Usage:
+    python3 scripts/benchmark_comparator.py [candidates ...]
+
+Defaults to 10,000 and 1,000,000 random candidates of 10 frames each.
+The per-pair loop is timed on at most PER_PAIR_SAMPLE candidates and extrapolated.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.video_processor import VideoProcessor
+
+
+FRAMES = 10
+DEFAULT_SIZES = [10_000, 1_000_000]
+PER_PAIR_SAMPLE = 10_000
+RUNS = 3
+
+
+def random_hash(rng: np.random.Generator) -> dict:
+    """Random calculate_perceptual_hash()-style result"""
+    words = rng.integers(0, 2**64, size=FRAMES, dtype=np.uint64)
+    return {"frame_hashes": [f"{int(w):016x}" for w in words]}
+
+
+def time_best(fn) -> float:
+    """Best wall time of RUNS runs"""
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    rng = np.random.default_rng(0)
+    query = random_hash(rng)
+
+    print(f"{'candidates':>12}{'per-pair (s)':>16}{'batch (s)':>12}{'batch cand/s':>16}{'speedup':>10}")
+    print("-" * 66)
+
+    for size in sizes:
+        candidates = rng.integers(0, 2**64, size=(size, FRAMES), dtype=np.uint64)
+
+        sample = min(size, PER_PAIR_SAMPLE)
+        sample_hashes = [
+            {"frame_hashes": [f"{int(w):016x}" for w in row]}
+            for row in candidates[:sample]
+        ]
+        per_pair = time_best(
+            lambda: [VideoProcessor.compare_hashes(h, query) for h in sample_hashes]
+        ) * size / sample
+
+        batch = time_best(lambda: VideoProcessor.compare_hashes_batch(query, candidates))
+
+        print(
+            f"{size:>12,}{per_pair:>16.3f}{batch:>12.3f}"
+            f"{size / batch:>16,.0f}{per_pair / batch:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
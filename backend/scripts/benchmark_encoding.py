@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Encoding Profile Benchmark
+
+Encodes each clip once per tier encoding profile (plus the pre-profile ffmpeg
+defaults) and reports encode fps and output size.
+
+Usage:
+    python3 scripts/benchmark_encoding.py [clip.mp4 ...]
+
+Without arguments, synthetic 1080p and 4K H.264 clips are generated with ffmpeg.
+Profiles come from ENCODING_PROFILES / the defaults in services/encoding_profiles.py.
+"""
+
+import json
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.encoding_profiles import encoding_profiles
+
+
+SYNTHETIC_CLIPS = {
+    "1080p": "1920x1080",
+    "4k": "3840x2160",
+}
+CLIP_SECONDS = 10
+
+
+def generate_clip(directory: str, label: str, size: str) -> str:
+    """Generate a synthetic H.264 test clip"""
+    path = os.path.join(directory, f"bench_{label}.mp4")
+    cmd = [
+        'ffmpeg',
+        '-f', 'lavfi',
+        '-i', f'testsrc2=size={size}:rate=30:duration={CLIP_SECONDS}',
+        '-c:v', 'libx264',
+        '-preset', 'ultrafast',
+        '-pix_fmt', 'yuv420p',
+        '-y',
+        path
+    ]
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return path
+
+
+def frame_count(path: str) -> int:
+    """Number of video frames (counted by decoding if the container doesn't say)"""
+    cmd = [
+        'ffprobe', '-v', 'quiet',
+        '-select_streams', 'v:0',
+        '-count_packets',
+        '-show_entries', 'stream=nb_read_packets',
+        '-print_format', 'json',
+        path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return int(json.loads(result.stdout)["streams"][0]["nb_read_packets"])
+
+
+def encode(source: str, output: str, video_args: list) -> float:
+    """Encode source to output, returning wall time in seconds"""
+    cmd = ['ffmpeg', '-v', 'error', '-i', source, *video_args, '-an', '-y', output]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    return time.perf_counter() - start
+
+
+def profile_args(profile) -> list:
+    """Video options for a profile (scale filter + encoder settings)"""
+    args = []
+    if profile.scale_filter():
+        args += ['-vf', profile.scale_filter()]
+    return args + profile.output_args()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            clips = {os.path.basename(path): path for path in sys.argv[1:]}
+        else:
+            print("Generating synthetic clips...")
+            clips = {
+                label: generate_clip(tmp, label, size)
+                for label, size in SYNTHETIC_CLIPS.items()
+            }
+
+        runs = {"defaults": []}
+        for tier in encoding_profiles.profiles:
+            runs[tier] = profile_args(encoding_profiles.get(tier))
+
+        print(f"\n{'clip':<16}{'profile':<12}{'settings':<28}{'fps':>10}{'MB':>10}")
+        print("-" * 76)
+
+        for label, path in clips.items():
+            frames = frame_count(path)
+
+            for name, args in runs.items():
+                output = os.path.join(tmp, f"out_{name}.mp4")
+                seconds = encode(path, output, args)
+                size_mb = os.path.getsize(output) / (1024 * 1024)
+
+                if name == "defaults":
+                    settings = "ffmpeg defaults"
+                else:
+                    profile = encoding_profiles.get(name)
+                    settings = f"{profile.preset} crf{profile.crf} <={profile.max_height or 'src'}p"
+
+                print(f"{label:<16}{name:<12}{settings:<28}{frames / seconds:>10.1f}{size_mb:>10.2f}")
+                os.remove(output)
+
+
+if __name__ == "__main__":
+    main()
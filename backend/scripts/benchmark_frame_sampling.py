@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Frame Sampling Benchmark
+
+Compares per-tier perceptual hash decode time for:
+1. Legacy: one decode pass per hash algorithm (full frame, then center region)
+2. Shared: one decode pass fanned out to every hasher (FrameSampler)
+
+Then compares the exact/sequential/keyframe sampling modes on the shared pass.
+
+Usage:
+    python3 scripts/benchmark_frame_sampling.py [clip.mp4 ...]
+
+Without arguments, synthetic 1080p and 4K H.264 clips are generated with ffmpeg.
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.enhanced_video_processor import enhanced_processor
+from services.frame_sampler import SAMPLING_MODES
+
+
+SYNTHETIC_CLIPS = {
+    "1080p": "1920x1080",
+    "4k": "3840x2160",
+}
+CLIP_SECONDS = 20
+RUNS = 3
+
+
+def generate_clip(directory: str, label: str, size: str) -> str:
+    """Generate a synthetic H.264 test clip"""
+    path = os.path.join(directory, f"bench_{label}.mp4")
+    cmd = [
+        'ffmpeg',
+        '-f', 'lavfi',
+        '-i', f'testsrc2=size={size}:rate=30:duration={CLIP_SECONDS}',
+        '-c:v', 'libx264',
+        '-preset', 'ultrafast',
+        '-g', '250',
+        '-pix_fmt', 'yuv420p',
+        '-y',
+        path
+    ]
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return path
+
+
+def time_best(fn) -> float:
+    """Best-of-N wall time in seconds"""
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def legacy_passes(video_path: str, tier: str):
+    """One decode pass per hasher (pre-FrameSampler behaviour)"""
+    for name, hasher in enhanced_processor.frame_hashers(tier).items():
+        enhanced_processor.frame_sampler.sample_and_hash(video_path, {name: hasher})
+
+
+def shared_pass(video_path: str, tier: str):
+    """Single decode pass fanned out to every hasher"""
+    enhanced_processor.frame_sampler.sample_and_hash(
+        video_path, enhanced_processor.frame_hashers(tier)
+    )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            clips = {os.path.basename(p): p for p in sys.argv[1:]}
+        else:
+            print("🎬 Generating synthetic clips...")
+            clips = {
+                label: generate_clip(tmp, label, size)
+                for label, size in SYNTHETIC_CLIPS.items()
+            }
+
+        print(f"\n{'clip':<12}{'tier':<12}{'legacy (s)':>12}{'shared (s)':>12}{'speedup':>10}")
+        print("-" * 58)
+
+        for label, path in clips.items():
+            for tier in ["free", "pro", "enterprise"]:
+                legacy = time_best(lambda: legacy_passes(path, tier))
+                shared = time_best(lambda: shared_pass(path, tier))
+                speedup = legacy / shared if shared > 0 else 0
+                print(f"{label:<12}{tier:<12}{legacy:>12.3f}{shared:>12.3f}{speedup:>9.2f}x")
+
+        print(f"\n{'clip':<12}" + "".join(f"{mode + ' (s)':>16}" for mode in SAMPLING_MODES))
+        print("-" * (12 + 16 * len(SAMPLING_MODES)))
+
+        original_mode = enhanced_processor.frame_sampler.mode
+        for label, path in clips.items():
+            row = f"{label:<12}"
+            for mode in SAMPLING_MODES:
+                enhanced_processor.frame_sampler.mode = mode
+                row += f"{time_best(lambda: shared_pass(path, 'pro')):>16.3f}"
+            print(row)
+        enhanced_processor.frame_sampler.mode = original_mode
+
+
+if __name__ == "__main__":
+    main()
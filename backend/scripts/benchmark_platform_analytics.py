@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Platform Analytics Benchmark
+
+Seeds a scratch database (rendr_benchmark_platform_analytics) with synthetic
+users, videos and verification attempts, then times GET /api/admin/analytics and
+GET /api/analytics/public three ways:
+1. Before: the sequential count_documents calls both endpoints used to make
+2. $facet: one aggregation per collection (cache cleared before every run)
+3. Cached: the endpoint with a warm result cache
+
+Seeding 1M videos takes a few minutes; pass --keep to leave the scratch
+database in place and reuse it on the next run.
+
+Usage:
+    python3 scripts/benchmark_platform_analytics.py [--users 100000] [--videos 1000000] [--runs 5] [--keep]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from api import admin, analytics
+
+SCRATCH_DB = "rendr_benchmark_platform_analytics"
+SEED_BATCH = 10000
+TIERS = ["free"] * 8 + ["pro", "enterprise", None]
+
+
+async def seed(db, users: int, videos: int):
+    """Fill the scratch collections unless they already hold the requested counts"""
+    if (await db.users.estimated_document_count() == users + 1
+            and await db.videos.estimated_document_count() == videos):
+        print(f"♻️  Reusing seeded data ({users} users, {videos} videos)")
+        return
+
+    await db.users.drop()
+    await db.videos.drop()
+    await db.verification_attempts.drop()
+
+    now = datetime.now(timezone.utc)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    start = time.perf_counter()
+
+    def user_doc(user_id: str):
+        doc = {
+            "_id": user_id,
+            "email": f"{user_id}@example.com",
+            "created_at": (now - timedelta(days=random.uniform(0, 365))).replace(tzinfo=None).isoformat(),
+            "interested_party": random.random() < 0.01
+        }
+        tier = random.choice(TIERS)
+        if tier:
+            doc["premium_tier"] = tier
+        return doc
+
+    docs = [user_doc(user_id) for user_id in user_ids]
+    # The caller of the admin endpoint must be an enterprise user or the CEO
+    docs.append({"_id": admin.CEO_USER_IDS[0], "email": "ceo@example.com",
+                 "created_at": now.replace(tzinfo=None).isoformat(), "premium_tier": "enterprise"})
+    for i in range(0, len(docs), SEED_BATCH):
+        await db.users.insert_many(docs[i:i + SEED_BATCH], ordered=False)
+
+    for i in range(0, videos, SEED_BATCH):
+        await db.videos.insert_many([{
+            "_id": str(uuid.uuid4()),
+            "user_id": random.choice(user_ids),
+            "verification_code": uuid.uuid4().hex,
+            "source": random.choice(("bodycam", "studio")),
+            "uploaded_at": now - timedelta(days=random.uniform(0, 365)),
+            "blockchain_signature": {"tx_hash": uuid.uuid4().hex} if random.random() < 0.6 else None
+        } for _ in range(min(SEED_BATCH, videos - i))], ordered=False)
+        print(f"   Seeded {min(i + SEED_BATCH, videos):,} videos", end="\r")
+
+    attempts = videos // 10
+    for i in range(0, attempts, SEED_BATCH):
+        await db.verification_attempts.insert_many([{
+            "_id": str(uuid.uuid4()),
+            "timestamp": now - timedelta(days=random.uniform(0, 365)),
+            "result": "verified"
+        } for _ in range(min(SEED_BATCH, attempts - i))], ordered=False)
+
+    # Same indexes as connect_db() creates
+    await db.users.create_index("email", unique=True)
+    await db.videos.create_index("verification_code", unique=True)
+    await db.videos.create_index("user_id")
+    print(f"\n✅ Seeded {users} users, {videos} videos, {attempts} verifications "
+          f"in {time.perf_counter() - start:.0f}s")
+
+
+async def sequential_platform(db):
+    """Queries of the admin endpoint before this change"""
+    now = datetime.now(timezone.utc)
+    thirty_days_ago, sixty_days_ago = now - timedelta(days=30), now - timedelta(days=60)
+    await db.users.count_documents({})
+    await db.videos.count_documents({})
+    await db.videos.distinct("user_id", {"uploaded_at": {"$gte": thirty_days_ago}})
+    await db.users.count_documents({"$or": [{"premium_tier": "free"}, {"premium_tier": {"$exists": False}}]})
+    await db.users.count_documents({"premium_tier": "pro"})
+    await db.users.count_documents({"premium_tier": "enterprise"})
+    await db.users.count_documents({"created_at": {"$gte": thirty_days_ago.isoformat()}})
+    await db.users.count_documents({"created_at": {"$gte": sixty_days_ago.isoformat(), "$lt": thirty_days_ago.isoformat()}})
+    await db.videos.count_documents({"source": "bodycam"})
+    await db.videos.count_documents({"source": "studio"})
+    await db.videos.count_documents({"blockchain_signature": {"$ne": None}})
+    await db.videos.count_documents({"uploaded_at": {"$gte": now.replace(hour=0, minute=0, second=0, microsecond=0)}})
+    await db.videos.count_documents({"uploaded_at": {"$gte": now - timedelta(days=7)}})
+
+
+async def sequential_public(db):
+    """Queries of the public endpoint before this change"""
+    now = datetime.now()
+    start_of_month = datetime(now.year, now.month, 1)
+    await db.users.count_documents({})
+    for tier in ("free", "pro", "enterprise"):
+        await db.users.count_documents({"premium_tier": tier})
+    await db.users.count_documents({"interested_party": True})
+    await db.users.count_documents({"created_at": {"$gte": start_of_month.isoformat()}})
+    await db.videos.count_documents({})
+    await db.videos.count_documents({"blockchain_signature": {"$exists": True}})
+    await db.videos.count_documents({"source": "bodycam"})
+    await db.videos.count_documents({"source": "studio"})
+    await db.videos.count_documents({"uploaded_at": {"$gte": start_of_month.isoformat()}})
+    await db.verification_attempts.count_documents({})
+    await db.verification_attempts.count_documents({"timestamp": {"$gte": start_of_month}})
+    await db.videos.find({"uploaded_at": {"$gte": start_of_month.isoformat()}}).to_list(length=10000)
+
+
+async def timed(runs: int, call, before=None) -> float:
+    """Median seconds per call over `runs` runs"""
+    durations = []
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        await call()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Platform analytics endpoint benchmark")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--videos", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded scratch database")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[SCRATCH_DB]
+    ceo = {"user_id": admin.CEO_USER_IDS[0]}
+
+    try:
+        await seed(db, args.users, args.videos)
+
+        endpoints = [
+            ("/api/admin/analytics", sequential_platform,
+             lambda: admin.get_platform_analytics(current_user=ceo, db=db), admin._analytics_cache),
+            ("/api/analytics/public", sequential_public,
+             lambda: analytics.get_public_analytics(db=db), analytics._public_cache),
+        ]
+
+        print(f"\n{'endpoint':<26}{'before':>12}{'$facet':>12}{'cached':>12}   (median of {args.runs})")
+        print("-" * 62)
+        for name, sequential, endpoint, cache in endpoints:
+            before = await timed(args.runs, lambda: sequential(db))
+            facet = await timed(args.runs, endpoint, before=cache.clear)
+            cached = await timed(args.runs, endpoint)
+            print(f"{name:<26}{before * 1000:>10.0f}ms{facet * 1000:>10.0f}ms{cached * 1000:>10.2f}ms")
+    finally:
+        if not args.keep:
+            await client.drop_database(SCRATCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
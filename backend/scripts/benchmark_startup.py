@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+
+Measures how long it takes to import the API (what every uvicorn worker pays on
+a cold start or fork) using `python -X importtime`, in a fresh interpreter per run:
+1. Wall time of the import (best of N)
+2. Slowest imported packages by cumulative import time
+3. Which heavy dependencies (OpenCV, web3, Twilio...) were imported at all -
+   with lazy service accessors (utils/lazy.py) none of them should be
+
+Usage:
+    python3 scripts/benchmark_startup.py [module ...] [--runs N] [--top N]
+
+Module defaults to `server`; e.g. `api.auth` measures a single router.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that should only load once a request needs them
+HEAVY_PACKAGES = ["cv2", "numpy", "imagehash", "PIL", "web3", "eth_account", "aiohttp", "twilio", "boto3"]
+
+
+def import_profile(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        (wall seconds, {module: cumulative import time in microseconds})
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(total)
+
+    # Service constructors print their config to stdout; the timing is the last line
+    return float(result.stdout.strip().splitlines()[-1]), cumulative
+
+
+def top_packages(cumulative: Dict[str, int], top: int) -> List[Tuple[str, int]]:
+    """Slowest top-level packages (nested imports are already in their parent's total)"""
+    totals = defaultdict(int)
+    for name, total in cumulative.items():
+        root = name.split(".")[0]
+        if name == root:
+            totals[root] += total
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import time")
+    parser.add_argument("modules", nargs="*", default=["server"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        wall, cumulative = min(runs, key=lambda run: run[0])
+
+        print(f"\n⏱️  import {module}: best {wall * 1000:.0f} ms of {args.runs} runs "
+              f"({len(cumulative)} modules)")
+
+        print(f"\n{'package':<32}{'cumulative (ms)':>16}")
+        print("-" * 48)
+        for name, total in top_packages(cumulative, args.top):
+            print(f"{name:<32}{total / 1000:>16.1f}")
+
+        loaded = [name for name in HEAVY_PACKAGES if name in cumulative]
+        if loaded:
+            print(f"\n⚠️ Heavy packages imported at startup: {', '.join(loaded)}")
+        else:
+            print("\n✅ No heavy packages imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Similarity Index Backfill
+
+Computes near-duplicate index keys (similarity_keys) for videos uploaded before
+the index existed. New uploads are indexed when they are saved, and deleting a
+video removes its keys with it.
+
+Run with --reindex after the key format changes (e.g. exact-match keys for the
+legacy SHA-256 hashes, capped audio keys) to rewrite the keys of every video.
+
+Usage:
+    python3 scripts/build_similarity_index.py [--reindex]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mongodb import connect_db, close_db
+from services.similarity_index import similarity_index
+
+
+async def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Build the near-duplicate similarity index")
+    parser.add_argument("--reindex", action="store_true", help="Recompute keys for every video")
+    args = parser.parse_args()
+
+    db = await connect_db()
+
+    try:
+        print("🔍 Indexing stored video hashes...")
+        updated = await similarity_index.backfill(db, reindex=args.reindex)
+        print(f"✅ Indexed {updated} videos")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
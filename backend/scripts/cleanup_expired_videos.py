@@ -23,6 +23,7 @@ sys.path.insert(0, '/app/backend')
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from services.notification_service import notification_service
+from services.storage import storage
 import asyncio
 
 
@@ -119,19 +120,9 @@ class VideoCleanupService:
             print(f"   Code: {video['verification_code']}")
             print(f"   Expired at: {video['storage']['expires_at']}")
             
-            # Delete video file
-            video_path = f"/app/backend/uploads/videos/{video_id}.mp4"
-            if os.path.exists(video_path):
-                os.remove(video_path)
-                print("   ✅ Video file deleted")
-            else:
-                print(f"   ⚠️ Video file not found: {video_path}")
-                
-            # Delete thumbnail
-            thumbnail_path = f"/app/backend/uploads/thumbnails/{video_id}.jpg"
-            if os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-                print("   ✅ Thumbnail deleted")
+            # Delete video file, HLS renditions and thumbnail (local or object storage)
+            await storage.delete_unshared_video_objects(self.db, video)
+            print("   ✅ Stored files deleted")
                 
             # Delete from database
             result = await self.db.videos.delete_one({"id": video_id})
@@ -160,7 +151,7 @@ class VideoCleanupService:
                 
             orphaned_count = 0
             
-            # Check video files
+            # Check video files (flat layout from before content-addressed storage)
             video_dir = Path("/app/backend/uploads/videos")
             if video_dir.exists():
                 for video_file in video_dir.glob("*.mp4"):
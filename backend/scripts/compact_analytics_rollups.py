@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollup Compaction
+
+Rebuilds the hourly/daily analytics rollups from raw analytics_events: backfills
+events tracked before rollups existed and repairs buckets whose live $inc
+update failed. Only closed buckets are rewritten, so it is safe to run while the
+API is ingesting (e.g. nightly from cron).
+
+Usage:
+    python3 scripts/compact_analytics_rollups.py [--days 2 | --all]
+
+By default the last 2 days are rebuilt; --all rebuilds from the oldest event.
+Days older than the raw event retention (ANALYTICS_RETENTION_DAYS) are never
+rewritten: their rollups are the only record left.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mongodb import connect_db, close_db
+from services.analytics_buffer import analytics_buffer
+from services.analytics_rollups import analytics_rollups, _parse_time, LEGACY_TIME_FIELDS
+
+# Buckets younger than this may still receive live increments from a batch in flight
+INGEST_LAG = timedelta(minutes=10)
+
+
+async def oldest_event(db) -> datetime:
+    """Earliest timestamp in analytics_events (either schema)"""
+    oldest = datetime.now(timezone.utc)
+    for field in ("timestamp",) + LEGACY_TIME_FIELDS:
+        doc = await db.analytics_events.find_one(
+            {field: {"$exists": True, "$ne": None}}, {field: 1}, sort=[(field, 1)]
+        )
+        parsed = _parse_time(doc[field]) if doc else None
+        if parsed and parsed < oldest:
+            oldest = parsed
+    return oldest
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics rollups from raw events")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--all", action="store_true")
+    args = parser.parse_args()
+
+    db = await connect_db()
+
+    try:
+        await analytics_rollups.ensure_indexes(db)
+
+        until = datetime.now(timezone.utc) - INGEST_LAG
+        since = await oldest_event(db) if args.all else until - timedelta(days=args.days)
+
+        since = max(since, analytics_rollups.first_complete_day(analytics_buffer.retention_days))
+
+        print(f"📊 Rebuilding analytics rollups from {since:%Y-%m-%d} to {until:%Y-%m-%d %H:00}...")
+        total = await analytics_rollups.compact(db, since, until, analytics_buffer.retention_days)
+        print(f"✅ Rolled up {total} events")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
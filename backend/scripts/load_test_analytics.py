@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Analytics Ingestion Load Test
+
+Two modes:
+
+direct - compares the write paths in process against a scratch database
+         (rendr_loadtest_analytics, dropped afterwards):
+         1. Before: one insert_one per event (the old track_event)
+         2. After: AnalyticsBuffer (batched insert_many, ordered=False)
+         Events/sec counts events accepted by the endpoint's write call; the
+         buffered run also waits for its final flush and reports what landed.
+
+http   - drives POST /api/analytics/events/track on a running API and reports
+         events/sec and latency percentiles (run it against a build from before
+         and after this change to compare end to end)
+
+Usage:
+    python3 scripts/load_test_analytics.py direct [--events 50000] [--concurrency 200]
+    python3 scripts/load_test_analytics.py http --url http://localhost:8001 [--duration 15]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.analytics_buffer import AnalyticsBuffer
+from utils.metrics import metrics
+
+SCRATCH_DB = "rendr_loadtest_analytics"
+EVENT_TYPES = ["showcase_view", "video_view", "social_click", "video_download"]
+CREATORS = [str(uuid.uuid4()) for _ in range(50)]
+
+
+def event_payload() -> Dict:
+    """Request body for one synthetic event"""
+    event_type = random.choice(EVENT_TYPES)
+    return {
+        "event_type": event_type,
+        "target_user_id": random.choice(CREATORS),
+        "video_id": str(uuid.uuid4()) if event_type in ("video_view", "video_download") else None,
+        "metadata": {"platform": "instagram"} if event_type == "social_click" else {},
+    }
+
+
+def event_doc() -> Dict:
+    """Stored document for one synthetic event (same shape as track_event builds)"""
+    payload = event_payload()
+    return {
+        "_id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc),
+        "meta": {"target_user_id": payload["target_user_id"], "event_type": payload["event_type"]},
+        "user_id": None,
+        "target_username": None,
+        "video_id": payload["video_id"],
+        "metadata": payload["metadata"],
+        "ip_address": f"10.0.{random.randint(0, 255)}.{random.randint(0, 255)}",
+        "user_agent": "load-test"
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_clients(total: int, concurrency: int, send) -> float:
+    """Send `total` events from `concurrency` concurrent clients; returns seconds taken"""
+    remaining = [total]
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            await send()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def direct(args):
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[SCRATCH_DB]
+    await db.analytics_events.drop()
+
+    try:
+        print(f"\n{'path':<28}{'events/s':>12}{'seconds':>10}{'stored':>10}{'dropped':>10}")
+        print("-" * 70)
+
+        # Before: one round trip per event
+        elapsed = await run_clients(args.events, args.concurrency, lambda: db.analytics_events.insert_one(event_doc()))
+        stored = await db.analytics_events.count_documents({})
+        print(f"{'insert_one per event':<28}{args.events / elapsed:>12.0f}{elapsed:>10.2f}{stored:>10}{0:>10}")
+        await db.analytics_events.drop()
+
+        # After: buffered batches
+        buffer = AnalyticsBuffer()
+        await buffer.start(db)
+        dropped_before = metrics.snapshot()["counters"].get("analytics.events.dropped", 0)
+
+        elapsed = await run_clients(args.events, args.concurrency, lambda: buffer.add(event_doc()))
+        await buffer.stop()
+
+        stored = await db.analytics_events.count_documents({})
+        dropped = metrics.snapshot()["counters"].get("analytics.events.dropped", 0) - dropped_before
+        print(f"{'AnalyticsBuffer':<28}{args.events / elapsed:>12.0f}{elapsed:>10.2f}{stored:>10}{dropped:>10}")
+    finally:
+        await client.drop_database(SCRATCH_DB)
+        client.close()
+
+
+async def http(args):
+    import httpx
+
+    url = args.url.rstrip("/") + "/api/analytics/events/track"
+    latencies, failures = [], [0]
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=args.concurrency)) as session:
+        async def client():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await session.post(url, json=event_payload())
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or not response.json().get("success"):
+                    failures[0] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    print(f"\n📈 {len(latencies)} events in {elapsed:.1f}s: {len(latencies) / elapsed:.0f} events/s "
+          f"({failures[0]} failed or dropped)")
+    print(f"   latency p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics ingestion load test")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    direct_parser = modes.add_parser("direct")
+    direct_parser.add_argument("--events", type=int, default=50000)
+    direct_parser.add_argument("--concurrency", type=int, default=200)
+
+    http_parser = modes.add_parser("http")
+    http_parser.add_argument("--url", default="http://localhost:8001")
+    http_parser.add_argument("--duration", type=float, default=15)
+    http_parser.add_argument("--concurrency", type=int, default=100)
+
+    args = parser.parse_args()
+    asyncio.run(direct(args) if args.mode == "direct" else http(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Analytics Time-Series Migration
+
+Moves analytics_events into a MongoDB time-series collection (BSON date
+timestamps, meta {target_user_id | username, event_type}, TTL retention) and
+converts ISO string timestamps in verification_attempts and admin_logs to dates.
+
+Steps:
+1. Rename the regular analytics_events to analytics_events_pre_timeseries
+2. Create the time-series analytics_events (see services/analytics_buffer.py)
+3. Move events across in batches, converting both legacy document shapes; each
+   batch is deleted from the old collection once inserted, so an interrupted run
+   can simply be restarted (at most one batch may be copied twice)
+4. Convert verification_attempts/admin_logs timestamps in place. These were
+   written with naive local datetime.now(), so --source-timezone must name the
+   zone the API server ran in (e.g. America/New_York, or UTC); strings that
+   carry their own offset are converted with it
+
+Events older than the retention period and documents without a usable time are
+left in analytics_events_pre_timeseries; drop it once you have checked them.
+
+Stop the API first: events tracked between steps 1 and 2 would otherwise
+recreate analytics_events as a regular collection.
+
+Usage:
+    python3 scripts/migrate_analytics_timeseries.py --source-timezone <Olson name or +HH:MM>
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mongodb import connect_db, close_db
+from services.analytics_buffer import analytics_buffer
+from services.analytics_rollups import _parse_time, LEGACY_TIME_FIELDS
+
+OLD_COLLECTION = "analytics_events_pre_timeseries"
+BATCH_SIZE = 5000
+
+# Set on events left behind (expired or undated)
+KEPT_FLAG = "_not_migrated"
+
+
+def convert(doc: Dict) -> Optional[Dict]:
+    """Time-series shape of a stored event (None if it has no usable time)"""
+    doc = dict(doc)
+
+    if "meta" in doc:
+        timestamp = doc.pop("timestamp", None)
+    elif "event_type" in doc:
+        # /api/analytics/events/track
+        doc["meta"] = {"target_user_id": doc.pop("target_user_id", None), "event_type": doc.pop("event_type")}
+        timestamp = doc.pop("timestamp", None)
+    else:
+        # /api/analytics/track/*
+        doc["meta"] = {"username": doc.pop("username", None), "event_type": doc.pop("type", None)}
+        times = [doc.pop(field, None) for field in LEGACY_TIME_FIELDS]
+        timestamp = next((t for t in times if t), None)
+
+    doc["timestamp"] = _parse_time(timestamp)
+    return doc if doc["timestamp"] is not None else None
+
+
+async def collection_type(db, name: str) -> Optional[str]:
+    info = await db.list_collections(filter={"name": name}).to_list(length=1)
+    return info[0].get("type", "collection") if info else None
+
+
+async def migrate_events(db):
+    current = await collection_type(db, "analytics_events")
+
+    if current == "collection":
+        print(f"📦 Renaming analytics_events to {OLD_COLLECTION}...")
+        await db.analytics_events.rename(OLD_COLLECTION)
+        current = None
+
+    if current is None:
+        await analytics_buffer.ensure_collection(db)
+        print(f"✅ Created time-series analytics_events (retention {analytics_buffer.retention_days} days)")
+
+    if await collection_type(db, OLD_COLLECTION) is None:
+        print("✅ No regular analytics_events to move")
+        return
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=analytics_buffer.retention_days)
+    moved = kept = 0
+
+    while True:
+        # Moved documents are deleted and kept ones flagged, so each batch is new
+        docs = await db[OLD_COLLECTION].find({KEPT_FLAG: {"$exists": False}}).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not docs:
+            break
+
+        converted = [(doc["_id"], convert(doc)) for doc in docs]
+        movable = [(_id, event) for _id, event in converted if event and event["timestamp"] >= cutoff]
+        kept_ids = [_id for _id, event in converted if not (event and event["timestamp"] >= cutoff)]
+
+        if movable:
+            await db.analytics_events.insert_many([event for _, event in movable], ordered=False)
+            await db[OLD_COLLECTION].delete_many({"_id": {"$in": [_id for _id, _ in movable]}})
+            moved += len(movable)
+        if kept_ids:
+            await db[OLD_COLLECTION].update_many({"_id": {"$in": kept_ids}}, {"$set": {KEPT_FLAG: True}})
+            kept += len(kept_ids)
+
+        print(f"   Moved {moved} events ({kept} kept back)")
+
+    print(f"✅ Moved {moved} events")
+    remaining = await db[OLD_COLLECTION].count_documents({})
+    if remaining:
+        print(f"   {remaining} expired or undated events remain in {OLD_COLLECTION} - drop it when done")
+    else:
+        await db[OLD_COLLECTION].drop()
+
+
+# ISO strings ending in an explicit offset ($dateFromString rejects a timezone for these)
+OFFSET_PATTERN = r"(Z|[+-]\d{2}:?\d{2})$"
+
+
+async def convert_timestamps(db, collection: str, source_timezone: str):
+    """ISO string timestamps to BSON dates, in place (naive strings are in source_timezone)"""
+    converted = 0
+    for matches_offset, options in ((True, {}), (False, {"timezone": source_timezone})):
+        pattern = {"$regex": OFFSET_PATTERN} if matches_offset else {"$not": {"$regex": OFFSET_PATTERN}}
+        result = await db[collection].update_many(
+            {"$and": [{"timestamp": {"$type": "string"}}, {"timestamp": pattern}]},
+            [{"$set": {"timestamp": {"$dateFromString": {
+                "dateString": "$timestamp", "onError": "$timestamp", **options
+            }}}}]
+        )
+        converted += result.modified_count
+
+    remaining = await db[collection].count_documents({"timestamp": {"$type": "string"}})
+    await db[collection].create_index("timestamp")
+    print(f"✅ {collection}: converted {converted} timestamps"
+          + (f" ({remaining} unparseable strings left as they were)" if remaining else ""))
+
+
+async def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Move analytics_events to a time-series collection")
+    parser.add_argument(
+        "--source-timezone", required=True,
+        help="zone the API server's local clock used (naive admin_logs/verification_attempts timestamps)"
+    )
+    args = parser.parse_args()
+
+    db = await connect_db()
+
+    try:
+        await migrate_events(db)
+        await convert_timestamps(db, "verification_attempts", args.source_timezone)
+        await convert_timestamps(db, "admin_logs", args.source_timezone)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Frame Hash Migration
+
+Backfills the v2 hash record (hashes.frames: per-frame 256-bit pHashes packed as
+BSON binary) for videos stored with only the legacy SHA-256 hashes, then rebuilds
+their similarity index keys.
+
+The pre-watermark upload is not kept, so frames are hashed from the stored
+(watermarked) file and recorded with hashes.frames_source = "watermarked".
+Their full-frame hashes are therefore neither indexed nor compared against
+uploads (see similarity_index.comparable_frames); the center region hash is
+unaffected by the watermark and is used as usual.
+
+Usage:
+    python3 scripts/migrate_frame_hashes.py [--limit N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add backend to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.mongodb import connect_db, close_db
+from services.enhanced_video_processor import enhanced_processor
+from services.similarity_index import FRAMES_SOURCE_WATERMARKED, similarity_index
+from services.storage import storage
+
+
+def _frame_hashes(backend, key: str, tier: str):
+    """Packed frame hashes of a stored video and the sampling mode that picked them"""
+    with backend.open_local(key) as video_path:
+        return enhanced_processor.calculate_packed_frame_hashes(video_path, tier)
+
+
+async def migrate(db, limit: int) -> dict:
+    stats = {"migrated": 0, "missing_file": 0, "failed": 0}
+
+    cursor = db.videos.find(
+        {"hashes.frames": {"$exists": False}},
+        {"hashes": 1, "original_hash": 1, "center_region_hash": 1,
+         "perceptual_hash": 1, "storage": 1, "id": 1}
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+
+    async for video in cursor:
+        video_id = video.get("id") or str(video["_id"])
+        backend, key = storage.video_object(video)
+
+        if not await asyncio.to_thread(backend.exists, key):
+            print(f"   ⚠️ File not found for {video_id}")
+            stats["missing_file"] += 1
+            continue
+
+        tier = video.get("storage", {}).get("tier", "free")
+
+        try:
+            frames, sampling_mode = await asyncio.to_thread(_frame_hashes, backend, key, tier)
+        except Exception as e:
+            print(f"   ❌ {video_id}: {e}")
+            stats["failed"] += 1
+            continue
+
+        if not frames:
+            print(f"   ⚠️ No frames decoded for {video_id}")
+            stats["failed"] += 1
+            continue
+
+        video.setdefault("hashes", {}).update(frames=frames, frames_source=FRAMES_SOURCE_WATERMARKED)
+
+        await db.videos.update_one(
+            {"_id": video["_id"]},
+            {"$set": {
+                "hashes.frames": frames,
+                "hashes.frames_source": FRAMES_SOURCE_WATERMARKED,
+                # Effective mode (keyframe sampling may fall back to sequential)
+                "hashes.sampling_mode": sampling_mode,
+                "hashes.version": 2,
+                "similarity_keys": similarity_index.keys_for_video(video)
+            }}
+        )
+        stats["migrated"] += 1
+        print(f"   ✅ {video_id}")
+
+    return stats
+
+
+async def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Backfill packed per-frame hashes")
+    parser.add_argument("--limit", type=int, default=0, help="Max videos to migrate (0 = all)")
+    args = parser.parse_args()
+
+    db = await connect_db()
+
+    try:
+        print("🔄 Migrating video hashes to packed frame format...")
+        stats = await migrate(db, args.limit)
+        print(f"\n✅ Migrated: {stats['migrated']}")
+        print(f"   Missing files: {stats['missing_file']}")
+        print(f"   Failed: {stats['failed']}")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
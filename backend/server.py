@@ -3,8 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from api import auth, videos, verification, blockchain, notifications, users, folders, admin, analytics, showcase_folders, payments, password_reset, analytics_events
+from api import auth, videos, verification, blockchain, notifications, users, folders, admin, analytics, showcase_folders, payments, password_reset, analytics_events, media
 from database.mongodb import connect_db, close_db
+from services.job_queue import job_queue
+from services.upload_pipeline import upload_pipeline
+from services.hls_packager import hls_packager
+from services.anchor_queue import anchor_queue, blockchain_service
+from services.analytics_buffer import analytics_buffer
+from utils.lazy import loaded
 
 app = FastAPI(
     title="Rendr API",
@@ -24,11 +30,29 @@ app.add_middleware(
 # Database lifecycle
 @app.on_event("startup")
 async def startup():
-    await connect_db()
+    db = await connect_db()
+    
+    # Background processing (uploads survive restarts via the processing_jobs collection)
+    job_queue.register("video_upload", upload_pipeline.process)
+    job_queue.register("video_hls", hls_packager.process)
+    await job_queue.start(db)
+    
+    # Batched blockchain anchoring (Merkle root per transaction)
+    await anchor_queue.start(db)
+    
+    # Batched analytics event writes
+    await analytics_buffer.start(db)
+    
     print("🚀 Rendr API started")
 
 @app.on_event("shutdown")
 async def shutdown():
+    await job_queue.stop()
+    await anchor_queue.stop()
+    if loaded(blockchain_service):
+        await blockchain_service.close()
+    upload_pipeline.shutdown()
+    await analytics_buffer.stop()
     await close_db()
 
 # Create uploads directories
@@ -38,7 +62,7 @@ os.makedirs("uploads/thumbnails", exist_ok=True)
 os.makedirs("uploads/profile_pictures", exist_ok=True)
 os.makedirs("uploads/banners", exist_ok=True)
 
-# Serve static files (thumbnails, profile pictures, banners)
+# Serve static files stored before the storage layer (see services/storage.py)
 app.mount("/api/thumbnails", StaticFiles(directory="uploads/thumbnails"), name="thumbnails")
 app.mount("/api/profile_pictures", StaticFiles(directory="uploads/profile_pictures"), name="profile_pictures")
 app.mount("/api/banners", StaticFiles(directory="uploads/banners"), name="banners")
@@ -67,6 +91,7 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"]
 app.include_router(analytics_events.router, prefix="/api/analytics/events", tags=["Analytics Events"])
 app.include_router(payments.router, prefix="/api/payments", tags=["Payments"])
 app.include_router(password_reset.router, prefix="/api/password", tags=["Password Reset"])
+app.include_router(media.router, prefix="/api/media", tags=["Media"])
 
 @app.get("/")
 async def root():
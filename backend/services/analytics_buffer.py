@@ -0,0 +1,265 @@
+"""
+Analytics Ingestion Buffer
+Coalesces tracked analytics events in process and writes them with one
+insert_many per batch instead of one insert_one per request, then adds each
+batch to the hourly/daily rollups (see services/analytics_rollups.py)
+
+analytics_events is a MongoDB time-series collection:
+
+    {_id, timestamp: BSON date, meta: {target_user_id, event_type}, ...}
+
+Legacy /api/analytics/track/* events use meta {username, event_type}. Raw events
+expire after ANALYTICS_RETENTION_DAYS; the rollups keep their counts.
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+from database.mongodb import get_db
+from services.analytics_rollups import analytics_rollups
+from utils.metrics import metrics
+
+
+class AnalyticsBuffer:
+    """
+    Bounded in-memory queue of analytics event documents with a background flusher.
+
+    A batch is written when it reaches `flush_size` events or `flush_interval`
+    seconds after its first event, whichever comes first. Writes are unordered,
+    so one bad document does not block the rest of its batch.
+
+    Time-series collections do not enforce unique ids, so a retry cannot rely on
+    duplicate key errors: a write that timed out may still have landed. Every
+    document gets its _id before the first attempt, and a retry first looks up
+    which of those ids are already stored and only sends the rest.
+
+    When Mongo is slow the queue fills up: `add` then waits up to `enqueue_timeout`
+    for room (backpressure on the tracking request) and drops the event after that.
+    Events are best-effort - drops are counted, never raised to the client.
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv("ANALYTICS_BUFFER_SIZE", "10000"))
+        self.flush_size = int(os.getenv("ANALYTICS_FLUSH_SIZE", "500"))
+        self.flush_interval = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0"))
+        self.enqueue_timeout = float(os.getenv("ANALYTICS_ENQUEUE_TIMEOUT", "0.05"))
+        # A batch that keeps failing is dropped after this many attempts
+        self.max_attempts = int(os.getenv("ANALYTICS_FLUSH_ATTEMPTS", "3"))
+        self.retention_days = int(os.getenv("ANALYTICS_RETENTION_DAYS", "400"))
+
+        self.db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch: List[Dict] = []  # Taken off the queue, not yet written
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self, db):
+        """Create the events collection and rollup indexes, and start the flusher"""
+        self.db = db
+        await self.ensure_collection(db)
+        await analytics_rollups.ensure_indexes(db)
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._loop())
+        print(f"📊 Analytics buffer started (batch {self.flush_size}, every {self.flush_interval:.1f}s)")
+
+    async def ensure_collection(self, db):
+        """
+        Create analytics_events as a time-series collection with TTL retention
+        (an existing regular collection is left for scripts/migrate_analytics_timeseries.py)
+        """
+        info = await db.list_collections(filter={"name": "analytics_events"}).to_list(length=1)
+        expire_after = self.retention_days * 86400
+
+        if not info:
+            try:
+                await db.create_collection(
+                    "analytics_events",
+                    timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+                    expireAfterSeconds=expire_after
+                )
+            except CollectionInvalid:
+                pass  # Another worker created it first
+        elif info[0].get("type") != "timeseries":
+            print("⚠️ analytics_events is not a time-series collection - run scripts/migrate_analytics_timeseries.py")
+            return
+        elif info[0].get("options", {}).get("expireAfterSeconds") != expire_after:
+            await db.command({"collMod": "analytics_events", "expireAfterSeconds": expire_after})
+
+        await db.analytics_events.create_index([("meta.target_user_id", 1), ("timestamp", -1)])
+        await db.analytics_events.create_index([("meta.username", 1), ("timestamp", -1)])
+
+    async def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        # A batch interrupted mid-write is resumed: only its unwritten events are sent
+        interrupted, self._batch = self._batch, []
+        batch = interrupted or self._drain(self.flush_size)
+        remaining = 0
+        while batch:
+            remaining += len(batch)
+            await self._flush(batch, resume=batch is interrupted)
+            batch = self._drain(self.flush_size)
+
+        if remaining:
+            print(f"📊 Analytics buffer flushed {remaining} events on shutdown")
+
+    async def add(self, event_doc: Dict) -> bool:
+        """
+        Buffer one event document
+
+        Returns:
+            False if the event was dropped (buffer full for longer than enqueue_timeout)
+        """
+        if not self.running:
+            # Not started (scripts): write through
+            db = get_db()
+            await analytics_rollups.apply(db, await self._insert(db, [event_doc]))
+            return True
+
+        try:
+            self._queue.put_nowait(event_doc)
+        except asyncio.QueueFull:
+            metrics.increment("analytics.buffer.full")
+            try:
+                await asyncio.wait_for(self._queue.put(event_doc), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                metrics.increment("analytics.events.dropped")
+                return False
+
+        metrics.increment("analytics.events.buffered")
+        return True
+
+    @staticmethod
+    async def _insert(db, docs: List[Dict]) -> List[Dict]:
+        """
+        Unordered bulk insert (duplicate key errors only occur on a regular,
+        not yet migrated collection and mean the document is already stored)
+
+        Returns:
+            The documents written by this call
+        """
+        try:
+            await db.analytics_events.insert_many(docs, ordered=False)
+            return docs
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            # Anything other than a duplicate key means those documents were lost
+            failed = [err for err in errors if err.get("code") != 11000]
+            if failed:
+                metrics.increment("analytics.events.dropped", len(failed))
+                print(f"⚠️ Analytics: {len(failed)} events rejected ({failed[0].get('errmsg')})")
+            skipped = {err["index"] for err in errors}
+            return [doc for index, doc in enumerate(docs) if index not in skipped]
+
+    @staticmethod
+    async def _written(db, docs: List[Dict]) -> List[Dict]:
+        """Documents of a batch already stored (by _id, within the batch's time range)"""
+        timestamps = [doc["timestamp"] for doc in docs]
+        cursor = db.analytics_events.find(
+            {
+                "_id": {"$in": [doc["_id"] for doc in docs]},
+                # Lets the time-series bucket index narrow the search
+                "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)}
+            },
+            {"_id": 1}
+        )
+        stored = {doc["_id"] async for doc in cursor}
+        return [doc for doc in docs if doc["_id"] in stored]
+
+    def _drain(self, limit: int) -> List[Dict]:
+        """Take up to `limit` queued events without waiting"""
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _next_batch(self) -> List[Dict]:
+        """Wait for an event, then collect until flush_size or flush_interval"""
+        loop = asyncio.get_running_loop()
+        batch = self._batch
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.flush_size:
+            batch.extend(self._drain(self.flush_size - len(batch)))
+            if len(batch) >= self.flush_size:
+                break
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _flush(self, batch: List[Dict], resume: bool = False):
+        """
+        Write one batch, retrying transient failures with backoff, then roll it up
+
+        Args:
+            resume: An earlier write of this batch may have landed (interrupted flush)
+        """
+        for doc in batch:
+            doc.setdefault("_id", ObjectId())
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with metrics.timer("analytics.flush"):
+                    written = []
+                    pending = batch
+                    if resume or attempt > 1:
+                        written = await self._written(self.db, batch)
+                        ids = {doc["_id"] for doc in written}
+                        pending = [doc for doc in batch if doc["_id"] not in ids]
+                    inserted = await self._insert(self.db, pending) if pending else []
+                metrics.increment("analytics.events.inserted", len(inserted))
+                # Events from an earlier attempt that landed were never rolled up
+                inserted = written + inserted
+                if batch is self._batch:
+                    # Written: a shutdown from here on must not resume this batch
+                    self._batch = []
+                break
+            except Exception as e:
+                metrics.increment("analytics.flush.errors")
+                if attempt == self.max_attempts:
+                    metrics.increment("analytics.events.dropped", len(batch))
+                    print(f"⚠️ Analytics: dropped {len(batch)} events after {attempt} attempts: {e}")
+                    return
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+        # Raw events are the source of truth: a failed rollup update is repaired by
+        # scripts/compact_analytics_rollups.py rather than retried (it would double count)
+        try:
+            with metrics.timer("analytics.rollup"):
+                await analytics_rollups.apply(self.db, inserted)
+        except Exception as e:
+            metrics.increment("analytics.rollup.errors")
+            print(f"⚠️ Analytics rollup update failed: {e}")
+
+    async def _loop(self):
+        while True:
+            batch = await self._next_batch()
+            await self._flush(batch)
+            self._batch = []
+
+
+# Global instance
+analytics_buffer = AnalyticsBuffer()
@@ -0,0 +1,453 @@
+"""
+Blockchain Anchor Queue
+Batches video hashes into one Merkle root per transaction, off the upload path:
+uploads queue a leaf, a background loop anchors batches and confirms receipts
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from utils.lazy import LazyService
+from utils.merkle import build_levels, leaf_hash, merkle_proof, verify_proof
+from utils.ttl_cache import TTLCache
+
+# web3 is imported on the first anchor or verification, not at startup
+blockchain_service = LazyService("services.blockchain_service", "blockchain_service")
+
+
+def leaf_data(video_id: str, perceptual_hash: str, file_sha256: Optional[str], timestamp_ms: int) -> Dict:
+    """Fields a video's Merkle leaf commits to (stored on the video so anyone can rehash it)"""
+    return {
+        "app": "Rendr",
+        "vid": video_id,
+        "h": perceptual_hash,
+        "fh": file_sha256,
+        "t": timestamp_ms,
+    }
+
+
+def leaf_bytes(data: Dict) -> bytes:
+    """Canonical encoding of leaf data (sorted keys, no whitespace)"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+class AnchorQueue:
+    """
+    Background anchoring of video hashes on the blockchain.
+
+    Videos are saved with blockchain_anchor.status "pending". Every interval the
+    loop claims up to batch_size pending videos, anchors their Merkle root in one
+    transaction, and stores each video's inclusion proof on its document. Receipts
+    are polled on later ticks; a confirmed batch fills in blockchain_signature, a
+    failed or timed-out one returns its videos to "pending" for the next batch.
+
+    Batches live in the anchor_batches collection. Claims are atomic per video, so
+    several API workers can run the loop without anchoring a video twice. The
+    signed transaction is stored on its batch before it is broadcast: a batch left
+    "building" by a crash is reconciled with the node rather than re-queued.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("ANCHOR_BATCH_SIZE", "256"))
+        self.interval = float(os.getenv("ANCHOR_INTERVAL_SECONDS", "60"))
+        self.confirmations = int(os.getenv("ANCHOR_CONFIRMATIONS", "1"))
+        self.confirm_timeout = int(os.getenv("ANCHOR_CONFIRM_TIMEOUT", "1800"))
+        # Batches stuck between claim and send (worker died) are released after this
+        self.build_timeout = int(os.getenv("ANCHOR_BUILD_TIMEOUT", "300"))
+
+        self.db = None
+        self._task = None
+
+        # Mined transactions never change: decoded anchor txs are cached in process
+        # and persisted on their batch, so verification rarely touches the RPC
+        self._tx_cache = TTLCache(maxsize=4096, ttl=int(os.getenv("ANCHOR_TX_CACHE_TTL", "86400")))
+
+    @property
+    def enabled(self) -> bool:
+        """Anchoring needs a wallet key (read from the environment so checking it does not load web3)"""
+        return bool(os.getenv("BLOCKCHAIN_PRIVATE_KEY"))
+
+    def pending_anchor(self, video_id: str, perceptual_hash: str, file_sha256: Optional[str]) -> Optional[Dict]:
+        """blockchain_anchor record for a new video (None when anchoring is disabled)"""
+        if not self.enabled:
+            return None
+
+        now = datetime.now(timezone.utc)
+        data = leaf_data(video_id, perceptual_hash, file_sha256, int(now.timestamp() * 1000))
+        return {
+            "status": "pending",
+            "leaf": leaf_hash(leaf_bytes(data)).hex(),
+            "leaf_data": data,
+            "queued_at": now,
+        }
+
+    async def start(self, db):
+        """Create indexes and start the anchor loop"""
+        self.db = db
+
+        await db.videos.create_index("blockchain_anchor.status", sparse=True)
+        await db.videos.create_index("blockchain_anchor.batch_id", sparse=True)
+        await db.anchor_batches.create_index([("status", 1), ("created_at", 1)])
+        await db.anchor_batches.create_index("tx_hash", sparse=True)
+
+        if not self.enabled:
+            print("⛓️ Anchor queue disabled (no blockchain key)")
+            return
+
+        self._task = asyncio.create_task(self._loop())
+        print(f"⛓️ Anchor queue started (batch {self.batch_size}, every {self.interval:.0f}s)")
+
+    async def stop(self):
+        """Stop the loop (claimed-but-unsent batches are released by the next run)"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Anchor queue: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        """One tick: release stuck batches, confirm sent ones, anchor pending videos"""
+        await self._release_stale()
+        await self._confirm_batches()
+
+        while await self._anchor_batch() >= self.batch_size:
+            pass  # Full batch - more may be waiting
+
+    async def _release(self, batch_id: str, status: str, error: str):
+        """Mark a batch failed and return its videos to the pending pool"""
+        await self.db.anchor_batches.update_one(
+            {"_id": batch_id},
+            {"$set": {"status": status, "error": error, "updated_at": datetime.now(timezone.utc)}}
+        )
+        await self.db.videos.update_many(
+            {"blockchain_anchor.batch_id": batch_id},
+            {
+                "$set": {"blockchain_anchor.status": "pending"},
+                "$unset": {
+                    "blockchain_anchor.batch_id": "",
+                    "blockchain_anchor.root": "",
+                    "blockchain_anchor.proof": "",
+                    "blockchain_anchor.tx_hash": "",
+                }
+            }
+        )
+
+    async def _release_stale(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.build_timeout)
+        async for batch in self.db.anchor_batches.find(
+            {"status": "building", "created_at": {"$lt": cutoff}}
+        ):
+            if batch.get("signed_tx"):
+                await self._reconcile(batch)
+            else:
+                await self._release(batch["_id"], "abandoned", "Worker stopped before sending")
+
+    async def _reconcile(self, batch: Dict):
+        """
+        Finish a batch whose transaction was signed but never recorded as sent
+
+        The transaction may have been broadcast, so its videos cannot simply be
+        re-queued. If the node does not know it, it is broadcast again; only when
+        its nonce was taken by another transaction (so it can never be mined) are
+        the videos released.
+        """
+        signed = batch["signed_tx"]
+        known = await blockchain_service.get_transaction_data(signed["tx_hash"]) is not None
+        if not known:
+            try:
+                known = await blockchain_service.rebroadcast(signed["raw"])
+            except Exception as e:
+                print(f"⚠️ Anchor batch {batch['_id']}: could not rebroadcast {signed['tx_hash']} ({e})")
+                return  # Try again next tick
+
+        if not known:
+            await self._release(batch["_id"], "abandoned", "Nonce used by another transaction before sending")
+            return
+
+        videos = await self.db.videos.find(
+            {"blockchain_anchor.batch_id": batch["_id"]},
+            {"_id": 1, "blockchain_anchor.leaf": 1}
+        ).sort("_id", 1).to_list(length=None)
+        levels = build_levels([bytes.fromhex(v["blockchain_anchor"]["leaf"]) for v in videos]) if videos else None
+        if not levels or levels[-1][0].hex() != batch["root"]:
+            print(f"❌ Anchor batch {batch['_id']}: claimed videos no longer match the signed root")
+            return
+
+        print(f"⛓️ Recovered anchor batch {batch['_id']}: {signed['tx_hash']}")
+        await self._mark_submitted(batch["_id"], videos, levels, signed["tx_hash"])
+
+    async def _anchor_batch(self) -> int:
+        """
+        Claim pending videos, send their Merkle root and store their proofs
+
+        Returns:
+            Number of videos anchored
+        """
+        candidates = await self.db.videos.find(
+            {"blockchain_anchor.status": "pending"},
+            {"_id": 1}
+        ).sort("blockchain_anchor.queued_at", 1).limit(self.batch_size).to_list(length=self.batch_size)
+
+        if not candidates:
+            return 0
+
+        batch_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        await self.db.anchor_batches.insert_one({
+            "_id": batch_id,
+            "status": "building",
+            "created_at": now,
+            "updated_at": now,
+        })
+
+        # Atomic per video: another worker's concurrent claim gets the rest
+        await self.db.videos.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, "blockchain_anchor.status": "pending"},
+            {"$set": {"blockchain_anchor.status": "batching", "blockchain_anchor.batch_id": batch_id}}
+        )
+        videos = await self.db.videos.find(
+            {"blockchain_anchor.batch_id": batch_id},
+            {"_id": 1, "blockchain_anchor.leaf": 1}
+        ).sort("_id", 1).to_list(length=self.batch_size)
+
+        if not videos:
+            await self.db.anchor_batches.delete_one({"_id": batch_id})
+            return 0
+
+        levels = build_levels([bytes.fromhex(v["blockchain_anchor"]["leaf"]) for v in videos])
+        root = levels[-1][0].hex()
+        await self.db.anchor_batches.update_one(
+            {"_id": batch_id},
+            {"$set": {"root": root, "video_ids": [v["_id"] for v in videos], "leaf_count": len(videos)}}
+        )
+
+        async def record_signed(signed: Dict):
+            # Persisted before the broadcast, so a crash after it is reconciled, not re-queued
+            await self.db.anchor_batches.update_one(
+                {"_id": batch_id},
+                {"$set": {"signed_tx": signed, "updated_at": datetime.now(timezone.utc)}}
+            )
+
+        try:
+            sent = await blockchain_service.send_anchor(root, len(videos), on_signed=record_signed)
+        except Exception as e:
+            batch = await self.db.anchor_batches.find_one({"_id": batch_id}, {"signed_tx": 1})
+            if batch and batch.get("signed_tx"):
+                # The transaction may still have reached the node - _release_stale reconciles it
+                await self.db.anchor_batches.update_one({"_id": batch_id}, {"$set": {"error": str(e)}})
+            else:
+                await self._release(batch_id, "failed", str(e))
+            raise
+
+        print(f"⛓️ Anchored {len(videos)} videos in one transaction: {sent['tx_hash']}")
+
+        await self._mark_submitted(batch_id, videos, levels, sent["tx_hash"])
+        return len(videos)
+
+    async def _mark_submitted(self, batch_id: str, videos: List[Dict], levels: List[List[bytes]], tx_hash: str):
+        """Record a batch's transaction and store each video's inclusion proof"""
+        root = levels[-1][0].hex()
+        await self.db.anchor_batches.update_one(
+            {"_id": batch_id},
+            {"$set": {
+                "status": "submitted",
+                "root": root,
+                "tx_hash": tx_hash,
+                "video_ids": [v["_id"] for v in videos],
+                "leaf_count": len(videos),
+                "submitted_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc),
+            }}
+        )
+        await self.db.videos.bulk_write([
+            UpdateOne(
+                {"_id": video["_id"]},
+                {"$set": {
+                    "blockchain_anchor.status": "submitted",
+                    "blockchain_anchor.root": root,
+                    "blockchain_anchor.index": index,
+                    "blockchain_anchor.proof": merkle_proof(levels, index),
+                    "blockchain_anchor.tx_hash": tx_hash,
+                }}
+            )
+            for index, video in enumerate(videos)
+        ], ordered=False)
+
+    async def _confirm_batches(self):
+        """Poll receipts of submitted batches"""
+        async for batch in self.db.anchor_batches.find({"status": "submitted"}):
+            receipt = await blockchain_service.get_receipt(batch["tx_hash"])
+
+            if receipt is None:
+                age = datetime.now(timezone.utc) - batch["submitted_at"].replace(tzinfo=timezone.utc)
+                if age.total_seconds() > self.confirm_timeout:
+                    print(f"⚠️ Anchor batch {batch['_id']} not mined - re-queueing its videos")
+                    await self._release(batch["_id"], "expired", "No receipt before timeout")
+                continue
+
+            if receipt["status"] != 1:
+                print(f"❌ Anchor batch {batch['_id']} reverted - re-queueing its videos")
+                await self._release(batch["_id"], "failed", "Transaction reverted")
+                continue
+
+            if receipt["confirmations"] < self.confirmations:
+                continue
+
+            await self._mark_confirmed(batch, receipt)
+
+    async def _mark_confirmed(self, batch: Dict, receipt: Dict):
+        now = datetime.now(timezone.utc)
+        cost_pol = None
+        if receipt.get("effective_gas_price"):
+            cost_pol = receipt["gas_used"] * receipt["effective_gas_price"] / 1e18
+
+        await self.db.anchor_batches.update_one(
+            {"_id": batch["_id"]},
+            {"$set": {
+                "status": "confirmed",
+                "block_number": receipt["block_number"],
+                "gas_used": receipt["gas_used"],
+                "cost_pol": cost_pol,
+                "confirmed_at": now,
+                "updated_at": now,
+            }}
+        )
+
+        # Same shape as the per-video signatures written before batching
+        await self.db.videos.update_many(
+            {"blockchain_anchor.batch_id": batch["_id"]},
+            {"$set": {
+                "blockchain_anchor.status": "confirmed",
+                "blockchain_anchor.block_number": receipt["block_number"],
+                "blockchain_signature": {
+                    "tx_hash": batch["tx_hash"],
+                    "block_number": receipt["block_number"],
+                    "gas_used": receipt["gas_used"],
+                    "cost_pol": cost_pol / batch["leaf_count"] if cost_pol else None,
+                    "explorer_url": blockchain_service.explorer_tx_url(batch["tx_hash"]),
+                    "timestamp": now.isoformat(),
+                    "chain_id": blockchain_service.chain_id,
+                    "status": "confirmed",
+                    "merkle_root": batch["root"],
+                    "batch_size": batch["leaf_count"],
+                }
+            }}
+        )
+        print(f"✅ Anchor batch {batch['_id']} confirmed in block {receipt['block_number']}")
+
+
+    async def onchain_record(self, db, tx_hash: str) -> Optional[Dict]:
+        """
+        Decoded anchor transaction (see BlockchainService.get_transaction_data),
+        from the process cache, then the batch document, then the RPC
+
+        Returns:
+            Record, or None if the transaction is unknown to the node
+        """
+        record = self._tx_cache.get(tx_hash)
+        if record is not None:
+            return record
+
+        batch = await db.anchor_batches.find_one(
+            {"tx_hash": tx_hash, "onchain": {"$exists": True}},
+            {"onchain": 1}
+        )
+        if batch:
+            record = batch["onchain"]
+        else:
+            record = await blockchain_service.get_transaction_data(tx_hash)
+            if record is None or record["block_number"] is None:
+                return record  # Unknown or still pending - look again next time
+            await db.anchor_batches.update_many({"tx_hash": tx_hash}, {"$set": {"onchain": record}})
+
+        self._tx_cache.set(tx_hash, record)
+        return record
+
+    async def verify(self, db, video: Dict) -> Dict:
+        """
+        Check a video's blockchain anchor: the leaf data names this video with its
+        stored perceptual hash and file SHA-256, the leaf rehashes from that data,
+        the Merkle proof leads from the leaf to the root, and the root is the one
+        carried by the anchor transaction, sent from our wallet and mined.
+
+        Videos timestamped before batching (one transaction per video) are checked
+        against the video id and hash prefix in their transaction instead.
+        """
+        anchor = video.get("blockchain_anchor") or {}
+        signature = video.get("blockchain_signature") or {}
+        tx_hash = anchor.get("tx_hash") or signature.get("tx_hash")
+
+        result = {
+            "anchored": bool(tx_hash),
+            "status": anchor.get("status") or signature.get("status") or "not_anchored",
+            "verified": False,
+            "checks": {},
+            "tx_hash": tx_hash,
+            "chain_id": signature.get("chain_id", blockchain_service.chain_id),
+            "explorer_url": blockchain_service.explorer_tx_url(tx_hash) if tx_hash else None,
+        }
+        if not tx_hash:
+            return result
+
+        checks = result["checks"]
+        video_id = video.get("id") or video["_id"]
+        original_hash = (video.get("hashes") or {}).get("original") or ""
+        if anchor.get("proof") is not None:
+            # The leaf must describe this video as stored now, not just be in the root
+            recorded = anchor["leaf_data"]
+            checks["leaf_video_matches"] = recorded.get("vid") == video_id
+            checks["leaf_hash_matches"] = bool(original_hash) and recorded.get("h") == original_hash
+            checks["leaf_file_matches"] = recorded.get("fh") == (video.get("storage") or {}).get("file_sha256")
+
+            leaf = leaf_hash(leaf_bytes(recorded))
+            checks["leaf_matches"] = leaf.hex() == anchor["leaf"]
+            checks["proof_valid"] = verify_proof(leaf, anchor["proof"], bytes.fromhex(anchor["root"]))
+            result.update({
+                "merkle_root": anchor["root"],
+                "leaf": anchor["leaf"],
+                "leaf_data": anchor["leaf_data"],
+                "proof": anchor["proof"],
+                "batch_size": signature.get("batch_size"),
+            })
+
+        onchain = await self.onchain_record(db, tx_hash)
+        data = (onchain or {}).get("data") or {}
+        checks["tx_found"] = onchain is not None
+        checks["mined"] = bool(onchain and onchain["block_number"] is not None)
+
+        wallet = blockchain_service.get_account_address()
+        if wallet and onchain:
+            checks["sender_matches"] = onchain["from"].lower() == wallet.lower()
+
+        if anchor.get("proof") is not None:
+            checks["root_on_chain"] = data.get("root") == anchor["root"]
+        else:
+            checks["signature_on_chain"] = (
+                data.get("vid") == video_id[:16] and data.get("h") == original_hash[:32]
+            )
+
+        if onchain:
+            result["block_number"] = onchain["block_number"]
+            result["block_timestamp"] = onchain["block_timestamp"]
+
+        result["verified"] = all(checks.values())
+        return result
+
+
+# Global instance
+anchor_queue = AnchorQueue()
@@ -0,0 +1,202 @@
+"""
+Audio Fingerprinting
+Spectral band-energy fingerprint computed from PCM streamed out of ffmpeg in fixed windows,
+so memory stays bounded regardless of video length and re-encodes still match
+"""
+import os
+import subprocess
+import threading
+from typing import List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from services.hash_comparator import popcount
+
+# Analysis parameters (32-bit sub-fingerprint per frame, as in Haitsma & Kalker)
+SAMPLE_RATE = 5512
+FRAME_SIZE = 2048      # ~0.37s analysis window
+HOP_SIZE = 256         # ~46ms between sub-fingerprints
+BLOCK_HOPS = 256       # Hops decoded and transformed per block (~12s of audio)
+BANDS = 33             # Log-spaced bands -> 32 energy-difference bits
+MIN_FREQ = 300.0
+MAX_FREQ = 2000.0
+
+# Frames compared at each alignment must overlap by at least this many sub-fingerprints
+MIN_OVERLAP = 64
+
+
+def _band_matrix() -> np.ndarray:
+    """(BANDS, FFT bins) 0/1 matrix summing power into log-spaced bands"""
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    matrix = np.zeros((BANDS, len(freqs)), dtype=np.float32)
+    for band in range(BANDS):
+        matrix[band, (freqs >= edges[band]) & (freqs < edges[band + 1])] = 1.0
+    return matrix
+
+
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+_BAND_MATRIX = _band_matrix()
+_BIT_WEIGHTS = (np.uint32(1) << np.arange(BANDS - 2, -1, -1, dtype=np.uint32))
+
+
+def pack_fingerprint(fingerprint: np.ndarray) -> bytes:
+    """Sub-fingerprints -> raw big-endian bytes (stored as BSON binary)"""
+    return fingerprint.astype(">u4").tobytes()
+
+
+def unpack_fingerprint(packed: bytes) -> np.ndarray:
+    """Raw bytes -> uint32 sub-fingerprints"""
+    return np.frombuffer(packed, dtype=">u4").astype(np.uint32)
+
+
+class AudioFingerprinter:
+    """
+    Computes and compares audio fingerprints.
+
+    Each sub-fingerprint encodes the sign of the change (over time) of the energy
+    difference between adjacent frequency bands. The signs survive re-encoding, volume
+    changes and resampling, so two encodes of the same audio agree on most bits while
+    unrelated audio differs on about half of them.
+    """
+
+    def __init__(self):
+        # Audio analysed per video; bounds fingerprint size (~21 bytes/s) and CPU time
+        self.max_seconds = int(os.getenv("AUDIO_FINGERPRINT_MAX_SECONDS", "600"))
+        # Wall-clock limit for the ffmpeg decode; a stalled ffmpeg is killed
+        self.timeout = int(os.getenv("AUDIO_FINGERPRINT_TIMEOUT", "300"))
+        # Max bit error rate still considered the same audio (0.5 = unrelated)
+        self.max_bit_error_rate = float(os.getenv("AUDIO_MAX_BIT_ERROR_RATE", "0.35"))
+        # Alignment search range in sub-fingerprints (~3s either way)
+        self.max_offset = int(os.getenv("AUDIO_MAX_OFFSET_FRAMES", "64"))
+        # Sub-fingerprints from the start of the track considered for index keys,
+        # and how many of them are kept per video
+        self.index_frames = int(os.getenv("AUDIO_INDEX_FRAMES", "512"))
+        self.index_keys = int(os.getenv("AUDIO_INDEX_KEYS", "32"))
+
+    def fingerprint(self, video_path: str) -> Optional[np.ndarray]:
+        """
+        Fingerprint the audio track of a video
+
+        Returns:
+            uint32 array (one sub-fingerprint per hop), or None if there is no audio
+            or ffmpeg had to be killed at the timeout
+        """
+        cmd = [
+            'ffmpeg',
+            '-v', 'quiet',
+            '-i', video_path,
+            '-vn',  # No video
+            '-t', str(self.max_seconds),
+            '-ac', '1',  # Mono
+            '-ar', str(SAMPLE_RATE),
+            '-f', 's16le',  # Raw PCM on stdout
+            '-'
+        ]
+
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        # Killing ffmpeg closes its stdout, which unblocks the read below
+        deadline = threading.Timer(self.timeout, kill)
+        deadline.start()
+
+        chunks: List[np.ndarray] = []
+        tail = np.zeros(0, dtype=np.float32)
+        previous = None
+        block_bytes = BLOCK_HOPS * HOP_SIZE * 2
+
+        try:
+            while True:
+                raw = process.stdout.read(block_bytes)
+                if not raw:
+                    break
+
+                samples = np.frombuffer(raw[:len(raw) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+                buffer = np.concatenate([tail, samples])
+
+                frame_count = (len(buffer) - FRAME_SIZE) // HOP_SIZE + 1
+                if frame_count <= 0:
+                    tail = buffer
+                    continue
+
+                frames = sliding_window_view(buffer, FRAME_SIZE)[::HOP_SIZE][:frame_count]
+                power = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+                energy = power @ _BAND_MATRIX.T
+
+                # Energy difference between adjacent bands, then its change over time
+                band_diff = energy[:, :-1] - energy[:, 1:]
+                if previous is not None:
+                    band_diff = np.vstack([previous, band_diff])
+
+                bits = (band_diff[1:] - band_diff[:-1]) > 0
+                chunks.append((bits * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint32))
+
+                previous = band_diff[-1:]
+                tail = buffer[frame_count * HOP_SIZE:]
+        finally:
+            deadline.cancel()
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+        if timed_out.is_set():
+            print(f"❌ Audio fingerprint: ffmpeg killed after {self.timeout}s")
+            return None
+
+        fingerprint = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint32)
+        return fingerprint if len(fingerprint) else None
+
+    def bit_error_rate(self, a: np.ndarray, b: np.ndarray) -> float:
+        """
+        Lowest fraction of differing bits between two fingerprints over the
+        alignments within max_offset (1.0 if they cannot be aligned)
+        """
+        best = 1.0
+
+        for offset in range(-self.max_offset, self.max_offset + 1):
+            x = a[max(offset, 0):]
+            y = b[max(-offset, 0):]
+            overlap = min(len(x), len(y))
+            if overlap < MIN_OVERLAP:
+                continue
+
+            errors = popcount(x[:overlap] ^ y[:overlap]).sum()
+            best = min(best, float(errors) / (overlap * 32))
+
+        return best
+
+    def similarity(self, packed_a: Optional[bytes], packed_b: Optional[bytes]) -> float:
+        """Audio similarity (0.0 to 1.0); 0.0 if either fingerprint is missing"""
+        if not packed_a or not packed_b:
+            return 0.0
+
+        return 1.0 - self.bit_error_rate(unpack_fingerprint(packed_a), unpack_fingerprint(packed_b))
+
+    def index_values(self, packed: Optional[bytes]) -> List[int]:
+        """
+        Sub-fingerprints from the start of the track used as exact-match index keys:
+        re-encodes keep a share of sub-fingerprints bit-identical.
+
+        Only the index_keys values that rank lowest under a fixed hash are kept
+        (a bottom-k sample): two encodes sharing most values also share most of
+        their lowest-ranked ones, whatever their alignment.
+        """
+        if not packed:
+            return []
+
+        values = np.unique(unpack_fingerprint(packed)[:self.index_frames])
+        values = values[values != 0]  # 0 = silence
+        # Multiplicative hash (mod 2^32) so the ranking does not favour low-energy patterns
+        ranks = values.astype(np.uint64) * np.uint64(2654435761) & np.uint64(0xFFFFFFFF)
+        return [int(v) for v in values[np.argsort(ranks, kind="stable")[:self.index_keys]]]
+
+
+# Global instance
+audio_fingerprinter = AudioFingerprinter()
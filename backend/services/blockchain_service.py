@@ -1,19 +1,76 @@
-from web3 import Web3
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
+from web3.exceptions import TransactionNotFound
+from eth_account import Account
+import aiohttp
+import asyncio
 import json
 import os
 from datetime import datetime
-from typing import Dict, Optional
-import hashlib
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import metrics
+from utils.ttl_cache import TTLCache
+
+# Intrinsic gas of a plain transaction and per byte of input data (EIP-2028)
+TX_BASE_GAS = 21000
+TX_ZERO_BYTE_GAS = 4
+TX_NONZERO_BYTE_GAS = 16
+
+# Node errors meaning the local nonce is out of step with the chain
+NONCE_ERRORS = ("nonce too low", "nonce too high", "already known", "replacement transaction underpriced")
+
+
+def intrinsic_gas(data: bytes) -> int:
+    """Gas used by a data-carrying transfer to an account without code"""
+    zero_bytes = data.count(0)
+    return TX_BASE_GAS + zero_bytes * TX_ZERO_BYTE_GAS + (len(data) - zero_bytes) * TX_NONZERO_BYTE_GAS
+
+
+class NonceManager:
+    """
+    Allocates nonces locally so concurrent sends from one wallet never share one.
+
+    The pending transaction count is read from the node once and then incremented
+    in memory. After a failed send the counter is dropped and re-read, so a nonce
+    that was allocated but never broadcast is reused by the next transaction.
+    """
+
+    def __init__(self):
+        self._next: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, fetch_pending_count) -> int:
+        """Next nonce (awaits fetch_pending_count() only when not in sync)"""
+        async with self._lock:
+            if self._next is None:
+                self._next = await fetch_pending_count()
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def reset(self):
+        """Resync from the node on the next allocation"""
+        self._next = None
+
 
 class BlockchainService:
     """
     Polygon Amoy testnet blockchain service for video signature storage
+    
+    RPC goes through an async provider sharing one pooled keep-alive HTTP session;
+    every call is timed into the metrics endpoint as blockchain.rpc.<method>.
     """
     
     def __init__(self):
         self.rpc_url = os.getenv("POLYGON_RPC_URL", "https://rpc-amoy.polygon.technology/")
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
-        self.chain_id = 80002  # Polygon Amoy
+        self.rpc_timeout = float(os.getenv("BLOCKCHAIN_RPC_TIMEOUT", "30"))
+        self.rpc_pool_size = int(os.getenv("BLOCKCHAIN_RPC_POOL_SIZE", "10"))
+        self.w3 = AsyncWeb3(AsyncHTTPProvider(self.rpc_url))
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Polygon Amoy by default; point at a local Anvil/Hardhat node with
+        # POLYGON_RPC_URL=http://localhost:8545 BLOCKCHAIN_CHAIN_ID=31337
+        self.chain_id = int(os.getenv("BLOCKCHAIN_CHAIN_ID", "80002"))
+        self.explorer_url = os.getenv("BLOCKCHAIN_EXPLORER_URL", "https://amoy.polygonscan.com").rstrip("/")
         
         # Get private key from environment (for app-level wallet)
         self.private_key = os.getenv("BLOCKCHAIN_PRIVATE_KEY")
@@ -21,15 +78,46 @@ class BlockchainService:
         if self.private_key and not self.private_key.startswith('0x'):
             self.private_key = '0x' + self.private_key
         
+        self.nonces = NonceManager()
+        
+        # Gas price moves slowly next to our send rate; the balance is only a warning
+        self._gas_price_cache = TTLCache(maxsize=1, ttl=float(os.getenv("GAS_PRICE_TTL", "15")))
+        self._balance_cache = TTLCache(maxsize=1, ttl=float(os.getenv("BALANCE_TTL", "60")))
+        
         print(f"🔗 Blockchain service initialized")
         print(f"   RPC: {self.rpc_url}")
         print(f"   Chain ID: {self.chain_id}")
         print(f"   Key configured: {bool(self.private_key)}")
     
-    def is_connected(self) -> bool:
+    async def _connect(self):
+        """Hand the provider a pooled keep-alive session (once per process)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.rpc_pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.rpc_timeout)
+            )
+            await self.w3.provider.cache_async_session(self._session)
+    
+    async def close(self):
+        """Close the pooled HTTP session (on shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _rpc(self, method: str, call):
+        """Await call(), timing it as blockchain.rpc.<method>"""
+        await self._connect()
+        with metrics.timer(f"blockchain.rpc.{method}"):
+            try:
+                return await call()
+            except Exception:
+                metrics.increment(f"blockchain.rpc.{method}.errors")
+                raise
+    
+    async def is_connected(self) -> bool:
         """Check if connected to blockchain"""
         try:
-            return self.w3.is_connected()
+            return await self._rpc("is_connected", self.w3.is_connected)
         except Exception:
             return False
     
@@ -38,21 +126,195 @@ class BlockchainService:
         if not self.private_key:
             return None
         try:
-            account = self.w3.eth.account.from_key(self.private_key)
+            account = Account.from_key(self.private_key)
             return account.address
         except Exception:
             return None
     
-    def get_balance(self) -> float:
-        """Get wallet balance in POL"""
+    def explorer_tx_url(self, tx_hash: str) -> str:
+        """Block explorer link for a transaction"""
+        return f"{self.explorer_url}/tx/{tx_hash}"
+    
+    async def get_balance(self) -> float:
+        """Get wallet balance in POL (cached for BALANCE_TTL seconds)"""
         address = self.get_account_address()
         if not address:
             return 0.0
+        
+        balance = self._balance_cache.get("balance")
+        if balance is not None:
+            return balance
+        
         try:
-            balance_wei = self.w3.eth.get_balance(address)
-            return float(self.w3.from_wei(balance_wei, 'ether'))
+            balance_wei = await self._rpc("get_balance", lambda: self.w3.eth.get_balance(address))
         except Exception:
             return 0.0
+        
+        balance = float(Web3.from_wei(balance_wei, 'ether'))
+        self._balance_cache.set("balance", balance)
+        return balance
+    
+    async def get_gas_price(self) -> int:
+        """Current gas price in wei (cached for GAS_PRICE_TTL seconds)"""
+        gas_price = self._gas_price_cache.get("gas_price")
+        if gas_price is None:
+            gas_price = await self._rpc("gas_price", lambda: self.w3.eth.gas_price)
+            self._gas_price_cache.set("gas_price", gas_price)
+        return gas_price
+    
+    async def _pending_count(self, address: str) -> int:
+        """Transaction count including the node's pending pool"""
+        return await self._rpc(
+            "get_transaction_count",
+            lambda: self.w3.eth.get_transaction_count(address, 'pending')
+        )
+    
+    async def send_data(self, data: Dict, on_signed=None) -> Tuple[str, Dict]:
+        """
+        Sign and send a self-transaction carrying compact JSON in its input field.
+        Does not wait for the receipt.
+        
+        Args:
+            on_signed: Awaited with {tx_hash, nonce, raw} after signing and before
+                broadcasting (again if a nonce error forces a re-sign), so callers can
+                persist the transaction before it can land
+        
+        Returns:
+            (tx_hash hex, transaction)
+        """
+        address = self.get_account_address()
+        
+        # Check balance
+        balance = await self.get_balance()
+        if balance < 0.001:
+            print(f"⚠️ Low balance: {balance:.4f} POL")
+            # Continue anyway for testnet
+        
+        # Convert to compact JSON
+        data_bytes = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        
+        print(f"📝 Preparing blockchain transaction...")
+        print(f"   From: {address}")
+        print(f"   Data size: {len(data_bytes)} bytes")
+        
+        max_fee = await self.get_gas_price()
+        
+        # A transfer to an account without code only pays intrinsic gas, so there
+        # is nothing for eth_estimateGas to discover
+        gas = int(intrinsic_gas(data_bytes) * 1.1)
+        
+        for attempt in range(2):
+            nonce = await self.nonces.allocate(lambda: self._pending_count(address))
+            
+            # Send to self with data in input field
+            transaction = {
+                'nonce': nonce,
+                'to': address,  # Send to self
+                'value': 0,  # No POL transfer
+                'data': Web3.to_hex(data_bytes),
+                'chainId': self.chain_id,
+                'gas': gas,
+                'maxFeePerGas': max_fee,
+                'maxPriorityFeePerGas': min(Web3.to_wei(1, 'gwei'), max_fee)
+            }
+            
+            # Sign transaction
+            signed_txn = Account.sign_transaction(transaction, self.private_key)
+            if on_signed:
+                await on_signed({
+                    'tx_hash': Web3.to_hex(signed_txn.hash),
+                    'nonce': nonce,
+                    'raw': Web3.to_hex(signed_txn.rawTransaction)
+                })
+            
+            # Send transaction
+            print(f"📤 Sending transaction (nonce {nonce})...")
+            try:
+                tx_hash = await self._rpc(
+                    "send_raw_transaction",
+                    lambda: self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+                )
+                break
+            except Exception as e:
+                # Whatever went wrong, the chain decides the next nonce
+                self.nonces.reset()
+                if attempt == 0 and any(error in str(e).lower() for error in NONCE_ERRORS):
+                    print(f"   ⚠️ Nonce {nonce} rejected ({e}), resyncing")
+                    metrics.increment("blockchain.nonce.resync")
+                    continue
+                raise
+        
+        tx_hash_hex = Web3.to_hex(tx_hash)
+        cost_pol = Web3.from_wei(gas * max_fee, 'ether')
+        print(f"✅ Transaction sent!")
+        print(f"   TX Hash: {tx_hash_hex}")
+        print(f"   Max cost: {cost_pol:.6f} POL")
+        print(f"   Explorer: {self.explorer_tx_url(tx_hash_hex)}")
+        
+        return tx_hash_hex, transaction
+    
+    async def send_anchor(self, merkle_root: str, leaf_count: int, on_signed=None) -> Dict:
+        """
+        Anchor a batch Merkle root (see services/anchor_queue.py) without waiting
+        for confirmation (on_signed as in send_data)
+        
+        Returns:
+            Dict with tx_hash and the fee cap used
+        """
+        tx_hash, transaction = await self.send_data({
+            'v': '2.0',
+            'root': merkle_root,
+            'n': leaf_count,
+            't': int(datetime.now().timestamp() * 1000),
+            'app': 'Rendr'
+        }, on_signed=on_signed)
+        return {
+            'tx_hash': tx_hash,
+            'max_fee_per_gas': transaction['maxFeePerGas']
+        }
+    
+    async def rebroadcast(self, raw_transaction: str) -> bool:
+        """
+        Send an already signed transaction again (one that may never have reached the node)
+        
+        Returns:
+            True if the node accepted or already had it, False if its nonce was used by
+            another transaction (so it can never be mined); other errors are raised
+        """
+        try:
+            await self._rpc("send_raw_transaction", lambda: self.w3.eth.send_raw_transaction(raw_transaction))
+            return True
+        except Exception as e:
+            error = str(e).lower()
+            if "already known" in error:
+                return True
+            if "nonce too low" in error:
+                return False
+            raise
+    
+    async def get_receipt(self, tx_hash: str) -> Optional[Dict]:
+        """
+        Receipt of a sent transaction, or None while it is not mined yet
+        
+        Returns:
+            Dict with status (1 = success), block_number, gas_used and confirmations
+        """
+        try:
+            receipt = await self._rpc(
+                "get_transaction_receipt",
+                lambda: self.w3.eth.get_transaction_receipt(tx_hash)
+            )
+        except TransactionNotFound:
+            return None
+        
+        block_number = await self._rpc("block_number", lambda: self.w3.eth.block_number)
+        return {
+            'status': receipt['status'],
+            'block_number': receipt['blockNumber'],
+            'gas_used': receipt['gasUsed'],
+            'effective_gas_price': receipt.get('effectiveGasPrice'),
+            'confirmations': block_number - receipt['blockNumber'] + 1
+        }
     
     async def write_signature(self, video_id: str, perceptual_hash: str, metadata: Dict = None) -> Optional[Dict]:
         """
@@ -71,21 +333,11 @@ class BlockchainService:
             print("❌ Blockchain private key not configured")
             return None
         
-        if not self.is_connected():
+        if not await self.is_connected():
             print("❌ Not connected to blockchain")
             return None
         
         try:
-            # Get account
-            account = self.w3.eth.account.from_key(self.private_key)
-            address = account.address
-            
-            # Check balance
-            balance = self.get_balance()
-            if balance < 0.001:
-                print(f"⚠️ Low balance: {balance:.4f} POL")
-                # Continue anyway for testnet
-            
             # Prepare compact data (minimize size for lower gas costs)
             data_to_store = {
                 'v': '1.0',  # version
@@ -102,64 +354,17 @@ class BlockchainService:
                 if metadata.get('duration'):
                     data_to_store['dur'] = int(metadata['duration'])
             
-            # Convert to compact JSON
-            data_json = json.dumps(data_to_store, separators=(',', ':'))
-            
-            # Convert to hex
-            data_hex = '0x' + data_json.encode('utf-8').hex()
-            
-            print(f"📝 Preparing blockchain transaction...")
-            print(f"   From: {address}")
-            print(f"   Data size: {len(data_json)} bytes")
-            
-            # Build transaction
-            nonce = self.w3.eth.get_transaction_count(address)
-            
-            # Send to self with data in input field
-            transaction = {
-                'nonce': nonce,
-                'to': address,  # Send to self
-                'value': 0,  # No POL transfer
-                'data': data_hex,
-                'chainId': self.chain_id,
-                'gas': 100000,  # Initial estimate
-                'maxFeePerGas': self.w3.eth.gas_price,
-                'maxPriorityFeePerGas': self.w3.to_wei(1, 'gwei')
-            }
-            
-            # Estimate gas
-            try:
-                gas_estimate = self.w3.eth.estimate_gas(transaction)
-                transaction['gas'] = int(gas_estimate * 1.2)  # Add 20% buffer
-                print(f"   Gas estimate: {gas_estimate}")
-            except Exception as e:
-                print(f"   Could not estimate gas: {e}")
-                # Use default
-            
-            # Calculate cost
-            gas_price_gwei = self.w3.from_wei(transaction['maxFeePerGas'], 'gwei')
-            cost_pol = self.w3.from_wei(transaction['gas'] * transaction['maxFeePerGas'], 'ether')
-            print(f"   Gas price: {gas_price_gwei:.2f} Gwei")
-            print(f"   Estimated cost: {cost_pol:.6f} POL")
-            
-            # Sign transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            
-            # Send transaction
-            print(f"📤 Sending transaction...")
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
-            tx_hash_hex = self.w3.to_hex(tx_hash)
-            
-            print(f"✅ Transaction sent!")
-            print(f"   TX Hash: {tx_hash_hex}")
-            print(f"   Explorer: https://amoy.polygonscan.com/tx/{tx_hash_hex}")
+            tx_hash_hex, transaction = await self.send_data(data_to_store)
             
             # Wait for confirmation (with timeout)
             print(f"⏳ Waiting for confirmation...")
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            tx_receipt = await self._rpc(
+                "wait_for_transaction_receipt",
+                lambda: self.w3.eth.wait_for_transaction_receipt(tx_hash_hex, timeout=120)
+            )
             
             if tx_receipt['status'] == 1:
-                actual_cost = self.w3.from_wei(tx_receipt['gasUsed'] * transaction['maxFeePerGas'], 'ether')
+                actual_cost = Web3.from_wei(tx_receipt['gasUsed'] * transaction['maxFeePerGas'], 'ether')
                 
                 print(f"✅ Transaction confirmed!")
                 print(f"   Block: {tx_receipt['blockNumber']}")
@@ -171,7 +376,7 @@ class BlockchainService:
                     'block_number': tx_receipt['blockNumber'],
                     'gas_used': tx_receipt['gasUsed'],
                     'cost_pol': float(actual_cost),
-                    'explorer_url': f"https://amoy.polygonscan.com/tx/{tx_hash_hex}",
+                    'explorer_url': self.explorer_tx_url(tx_hash_hex),
                     'timestamp': datetime.now().isoformat(),
                     'chain_id': self.chain_id,
                     'status': 'confirmed'
@@ -179,7 +384,7 @@ class BlockchainService:
             else:
                 print(f"❌ Transaction failed!")
                 return None
-                
+        
         except Exception as e:
             print(f"❌ Blockchain error: {e}")
             import traceback
@@ -200,19 +405,14 @@ class BlockchainService:
             print(f"🔍 Reading transaction: {tx_hash}")
             
             # Get transaction
-            tx = self.w3.eth.get_transaction(tx_hash)
+            tx = await self._rpc("get_transaction", lambda: self.w3.eth.get_transaction(tx_hash))
             
             print(f"   From: {tx['from']}")
             print(f"   Block: {tx['blockNumber']}")
             
             # Decode data
-            data_hex = tx['input']
-            if data_hex and data_hex != '0x':
-                # Remove 0x prefix and decode
-                data_bytes = bytes.fromhex(data_hex[2:])
-                data_str = data_bytes.decode('utf-8')
-                data_json = json.loads(data_str)
-                
+            data_json = self._decode_input(tx['input'])
+            if data_json:
                 print(f"✅ Data retrieved!")
                 print(f"   Video ID: {data_json.get('vid', 'N/A')}")
                 print(f"   Hash: {data_json.get('h', 'N/A')}")
@@ -221,26 +421,65 @@ class BlockchainService:
             else:
                 print(f"⚠️ No data found in transaction")
                 return None
-                
+        
         except Exception as e:
             print(f"❌ Error reading transaction: {e}")
             return None
     
-    def get_connection_status(self) -> Dict:
+    def _decode_input(self, data) -> Optional[Dict]:
+        """JSON payload of a transaction's input field (None if empty)"""
+        data_hex = Web3.to_hex(data) if isinstance(data, (bytes, bytearray)) else data
+        if not data_hex or data_hex == '0x':
+            return None
+        
+        # Remove 0x prefix and decode
+        data_bytes = bytes.fromhex(data_hex[2:])
+        return json.loads(data_bytes.decode('utf-8'))
+    
+    async def get_transaction_data(self, tx_hash: str) -> Optional[Dict]:
+        """
+        Decoded payload of a transaction with its sender, block and block time
+        
+        Returns:
+            Dict (block_number is None while pending), or None if the tx is unknown
+        """
+        try:
+            tx = await self._rpc("get_transaction", lambda: self.w3.eth.get_transaction(tx_hash))
+        except TransactionNotFound:
+            return None
+        
+        block_timestamp = None
+        if tx['blockNumber'] is not None:
+            block = await self._rpc("get_block", lambda: self.w3.eth.get_block(tx['blockNumber']))
+            block_timestamp = block['timestamp']
+        
+        try:
+            data = self._decode_input(tx['input'])
+        except ValueError:
+            data = None
+        
+        return {
+            'data': data,
+            'from': tx['from'],
+            'block_number': tx['blockNumber'],
+            'block_timestamp': block_timestamp
+        }
+    
+    async def get_connection_status(self) -> Dict:
         """Get detailed connection status"""
         status = {
-            'connected': self.is_connected(),
+            'connected': await self.is_connected(),
             'rpc_url': self.rpc_url,
             'chain_id': self.chain_id,
             'has_key': bool(self.private_key),
             'address': self.get_account_address(),
-            'balance': self.get_balance()
+            'balance': await self.get_balance()
         }
         
         if status['connected']:
             try:
-                status['block_number'] = self.w3.eth.block_number
-                status['gas_price_gwei'] = float(self.w3.from_wei(self.w3.eth.gas_price, 'gwei'))
+                status['block_number'] = await self._rpc("block_number", lambda: self.w3.eth.block_number)
+                status['gas_price_gwei'] = float(Web3.from_wei(await self.get_gas_price(), 'gwei'))
             except Exception:
                 pass
         
@@ -0,0 +1,160 @@
+"""
+Encoding Profiles
+Per-tier x264 settings for watermarked output, adjustable at runtime by admins
+"""
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Optional
+
+# Settings document holding admin overrides
+SETTINGS_ID = "encoding_profiles"
+
+# Seconds between reloads of admin overrides in each worker
+REFRESH_SECONDS = int(os.getenv("ENCODING_PROFILES_REFRESH_SECONDS", "60"))
+
+X264_PRESETS = [
+    "ultrafast", "superfast", "veryfast", "faster", "fast",
+    "medium", "slow", "slower", "veryslow"
+]
+
+
+@dataclass
+class EncodingProfile:
+    """Video encoder settings for one tier"""
+    preset: str = "veryfast"
+    crf: int = 23
+    # Cap on the short edge (the height of landscape video, e.g. 720 for 720p), so
+    # portrait uploads keep the same quality; None = keep source resolution
+    max_height: Optional[int] = None
+    threads: int = 0                  # 0 = let the encoder decide
+
+    def validate(self):
+        """Raise ValueError on settings ffmpeg would reject"""
+        if self.preset not in X264_PRESETS:
+            raise ValueError(f"Unknown preset '{self.preset}'")
+        if not 0 <= self.crf <= 51:
+            raise ValueError("crf must be between 0 and 51")
+        if self.max_height is not None and self.max_height < 144:
+            raise ValueError("max_height must be at least 144")
+        if self.threads < 0:
+            raise ValueError("threads must be 0 (auto) or more")
+
+    def scale_filter(self) -> Optional[str]:
+        """
+        Downscale filter capping the short edge at max_height (never upscales, keeps
+        aspect ratio; -2 keeps the long edge even)
+        """
+        if not self.max_height:
+            return None
+        landscape = "gte(iw\\,ih)"
+        return (
+            f"scale='if({landscape}\\,-2\\,min(iw\\,{self.max_height}))'"
+            f":'if({landscape}\\,min(ih\\,{self.max_height})\\,-2)'"
+        )
+
+    def output_args(self) -> List[str]:
+        """ffmpeg output options for the watermarked MP4"""
+        return [
+            '-c:v', 'libx264',
+            '-preset', self.preset,
+            '-crf', str(self.crf),
+            '-threads', str(self.threads),
+            '-pix_fmt', 'yuv420p',         # Plays everywhere
+            '-movflags', '+faststart',     # moov atom first so playback starts before download ends
+        ]
+
+
+DEFAULT_PROFILES = {
+    "free": EncodingProfile(preset="veryfast", crf=26, max_height=720),
+    "pro": EncodingProfile(preset="fast", crf=23, max_height=1080),
+    "enterprise": EncodingProfile(preset="medium", crf=20, max_height=None),
+}
+
+
+class EncodingProfiles:
+    """
+    Current profile per tier.
+
+    Defaults can be overridden with the ENCODING_PROFILES env var (JSON, same shape as
+    the admin endpoint) and at runtime through the admin API, which stores overrides in
+    the settings collection. Each worker reloads overrides at most every REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[str, EncodingProfile] = {
+            tier: EncodingProfile(**asdict(profile))
+            for tier, profile in DEFAULT_PROFILES.items()
+        }
+        self._loaded_at = 0.0
+
+        env_profiles = os.getenv("ENCODING_PROFILES")
+        if env_profiles:
+            self.apply(json.loads(env_profiles))
+
+    def get(self, tier: str) -> EncodingProfile:
+        """Profile for a tier (free profile for unknown tiers)"""
+        return self.profiles.get(tier, self.profiles["free"])
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """Profiles as plain dicts (API / settings document shape)"""
+        return {tier: asdict(profile) for tier, profile in self.profiles.items()}
+
+    def apply(self, overrides: Dict[str, Dict]):
+        """
+        Merge per-tier overrides into the current profiles
+
+        Raises:
+            ValueError: Unknown tier/setting or invalid value (nothing is applied)
+        """
+        allowed = {field.name for field in fields(EncodingProfile)}
+        updated = {}
+
+        for tier, values in overrides.items():
+            if tier not in DEFAULT_PROFILES:
+                raise ValueError(f"Unknown tier '{tier}'")
+
+            unknown = set(values) - allowed
+            if unknown:
+                raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+            profile = EncodingProfile(**{**asdict(self.profiles[tier]), **values})
+            try:
+                profile.validate()
+            except TypeError:
+                raise ValueError(f"Invalid setting types for '{tier}'")
+            updated[tier] = profile
+
+        self.profiles.update(updated)
+
+    async def refresh(self, db, force: bool = False):
+        """Reload admin overrides if the cached copy is older than REFRESH_SECONDS"""
+        if not force and time.monotonic() - self._loaded_at < REFRESH_SECONDS:
+            return
+
+        settings = await db.settings.find_one({"_id": SETTINGS_ID})
+        if settings:
+            try:
+                self.apply(settings.get("profiles", {}))
+            except ValueError as e:
+                print(f"⚠️ Ignoring invalid encoding profiles: {e}")
+
+        self._loaded_at = time.monotonic()
+
+    async def update(self, db, overrides: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Validate, apply and persist admin overrides; returns the resulting profiles"""
+        self.apply(overrides)
+
+        await db.settings.update_one(
+            {"_id": SETTINGS_ID},
+            {"$set": {"profiles": self.as_dict()}},
+            upsert=True
+        )
+        self._loaded_at = time.monotonic()
+
+        return self.as_dict()
+
+
+# Global instance
+encoding_profiles = EncodingProfiles()
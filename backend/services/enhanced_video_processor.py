@@ -10,7 +10,13 @@ import json
 import hashlib
 import subprocess
 from typing import Dict, List, Tuple, Optional
-import os
+
+from services.frame_sampler import FrameSampler, FrameHasher, same_sampled_frames
+from services.similarity_index import comparable_frames
+from services.hash_comparator import (
+    FRAME_HASH_BITS, batch_frame_distances, frame_similarity, pack_frame_hashes, unpack_frame_hashes
+)
+from services.audio_fingerprint import audio_fingerprinter, pack_fingerprint
 
 class EnhancedVideoProcessor:
     """
@@ -20,6 +26,7 @@ class EnhancedVideoProcessor:
     
     def __init__(self):
         self.sample_frame_count = 10  # Frames to sample for hash
+        self.frame_sampler = FrameSampler(self.sample_frame_count)
     
     def calculate_all_hashes(
         self, 
@@ -42,31 +49,56 @@ class EnhancedVideoProcessor:
             "original_hash": None,
             "center_region_hash": None,
             "audio_hash": None,
+            "audio_fingerprint": None,
             "metadata_hash": None,
+            "frame_hashes": {},
             "frame_count": 0,
             "duration": 0,
-            "resolution": None
+            "resolution": None,
+            "sampling_mode": self.frame_sampler.mode
         }
         
         # Get video metadata (all tiers)
         metadata = self._get_video_metadata(video_path)
         result["metadata_hash"] = self._hash_metadata(metadata)
-        result["frame_count"] = metadata.get("frame_count", 0)
+        # Decoder frame count, not ffprobe nb_frames: the media pipeline and thumbnail
+        # fallback sample from this count, so they must see the frames hashed here
+        result["frame_count"] = self.frame_sampler.frame_count(video_path)
         result["duration"] = metadata.get("duration", 0)
         result["resolution"] = metadata.get("resolution")
         
-        # Calculate original perceptual hash (all tiers)
-        result["original_hash"] = self._calculate_perceptual_hash(video_path)
+        # Perceptual hashes (original for all tiers, center region for Pro/Enterprise)
+        # share a single decode pass over the sampled frames. The recorded mode is the
+        # one that picked them (keyframe mode may fall back to sequential).
+        frame_indices = self.frame_sampler.sample_indices(result["frame_count"])
+        plan = self.frame_sampler.sampling_plan(video_path, frame_indices)
+        result["sampling_mode"] = plan[0]
+        frame_hashes = self._sample_frame_hashes(
+            video_path,
+            self.frame_hashers(tier),
+            frame_indices,
+            plan
+        )
+        
+        # Per-frame pHashes packed as raw bits (locality-preserving, compared bit by bit)
+        result["frame_hashes"] = {
+            name: pack_frame_hashes(hashes)
+            for name, hashes in frame_hashes.items()
+        }
+        
+        # Legacy SHA-256 of the concatenated hex (exact-match only, kept for compatibility)
+        result["original_hash"] = self._combine_frame_hashes(frame_hashes["original"])
         print(f"✅ Original hash: {result['original_hash'][:32]}...")
         
-        # Center region hash for Pro and Enterprise
-        if tier in ["pro", "enterprise"]:
-            result["center_region_hash"] = self._calculate_center_hash(video_path)
+        if "center_region" in frame_hashes:
+            result["center_region_hash"] = self._combine_frame_hashes(frame_hashes["center_region"])
             print(f"✅ Center region hash: {result['center_region_hash'][:32]}...")
         
         # Audio fingerprint for Enterprise only
         if tier == "enterprise":
-            result["audio_hash"] = self._calculate_audio_hash(video_path)
+            fingerprint = self._calculate_audio_fingerprint(video_path)
+            result["audio_fingerprint"] = fingerprint
+            result["audio_hash"] = hashlib.sha256(fingerprint).hexdigest() if fingerprint else "no_audio"
             print(f"✅ Audio hash: {result['audio_hash'][:32]}...")
         
         return result
@@ -119,142 +151,157 @@ class EnhancedVideoProcessor:
         metadata_str = json.dumps(stable_data, sort_keys=True)
         return hashlib.sha256(metadata_str.encode()).hexdigest()
     
-    def _calculate_perceptual_hash(self, video_path: str) -> str:
+    def frame_hashers(self, tier: str = "free") -> Dict[str, FrameHasher]:
         """
-        Calculate perceptual hash from full video frames
-        (Current implementation - already exists in video_processor.py)
+        Per-frame hashers enabled for a tier.
+        All of them share a single decode pass in the frame sampler.
         """
-        try:
-            cap = cv2.VideoCapture(video_path)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames == 0:
-                print("⚠️ Video has no frames")
-                return "0" * 64
-            
-            # Sample frames evenly throughout video
-            frame_indices = np.linspace(0, total_frames - 1, 
-                                       min(self.sample_frame_count, total_frames), 
-                                       dtype=int)
-            
-            frame_hashes = []
-            
-            for idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # Convert to PIL Image
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    # Calculate perceptual hash
-                    frame_hash = imagehash.phash(pil_image, hash_size=16)
-                    frame_hashes.append(str(frame_hash))
-            
-            cap.release()
-            
-            # Combine all frame hashes
-            combined = ''.join(frame_hashes)
-            final_hash = hashlib.sha256(combined.encode()).hexdigest()
-            
-            return final_hash
+        hashers = {"original": self._phash_full_frame}
         
-        except Exception as e:
-            print(f"❌ Perceptual hash failed: {e}")
-            return "0" * 64
+        # Center region hash for Pro and Enterprise
+        if tier in ["pro", "enterprise"]:
+            hashers["center_region"] = self._phash_center_region
+        
+        return hashers
     
-    def _calculate_center_hash(self, video_path: str) -> str:
+    @staticmethod
+    def _phash_full_frame(frame: np.ndarray) -> str:
+        """Perceptual hash of a full BGR frame"""
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(frame_rgb)
+        
+        return str(imagehash.phash(pil_image, hash_size=16))
+    
+    @staticmethod
+    def _phash_center_region(frame: np.ndarray) -> str:
         """
-        Calculate hash from center 60% of video (excludes edges where watermark is)
+        Perceptual hash of the center 60% of a BGR frame (excludes edges where watermark is)
         This detects videos even if watermark is cropped out
         """
-        try:
-            cap = cv2.VideoCapture(video_path)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames == 0:
-                return "0" * 64
-            
-            frame_indices = np.linspace(0, total_frames - 1, 
-                                       min(self.sample_frame_count, total_frames), 
-                                       dtype=int)
-            
-            frame_hashes = []
-            
-            for idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # Crop to center 60% (removes edges where watermark typically is)
-                    h, w = frame.shape[:2]
-                    crop_margin_h = int(h * 0.2)  # 20% margin top/bottom
-                    crop_margin_w = int(w * 0.2)  # 20% margin left/right
-                    
-                    center_frame = frame[
-                        crop_margin_h:h-crop_margin_h,
-                        crop_margin_w:w-crop_margin_w
-                    ]
-                    
-                    # Convert to PIL and hash
-                    frame_rgb = cv2.cvtColor(center_frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    frame_hash = imagehash.phash(pil_image, hash_size=16)
-                    frame_hashes.append(str(frame_hash))
-            
-            cap.release()
-            
-            combined = ''.join(frame_hashes)
-            final_hash = hashlib.sha256(combined.encode()).hexdigest()
-            
-            return final_hash
+        h, w = frame.shape[:2]
+        crop_margin_h = int(h * 0.2)  # 20% margin top/bottom
+        crop_margin_w = int(w * 0.2)  # 20% margin left/right
         
-        except Exception as e:
-            print(f"❌ Center hash failed: {e}")
+        center_frame = frame[
+            crop_margin_h:h-crop_margin_h,
+            crop_margin_w:w-crop_margin_w
+        ]
+        
+        frame_rgb = cv2.cvtColor(center_frame, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(frame_rgb)
+        
+        return str(imagehash.phash(pil_image, hash_size=16))
+    
+    @staticmethod
+    def _combine_frame_hashes(frame_hashes: List[str]) -> str:
+        """Combine per-frame hashes into a single video hash (legacy SHA-256 format)"""
+        if not frame_hashes:
             return "0" * 64
+        
+        combined = ''.join(frame_hashes)
+        return hashlib.sha256(combined.encode()).hexdigest()
     
-    def _calculate_audio_hash(self, video_path: str) -> str:
+    def _sample_frame_hashes(
+        self,
+        video_path: str,
+        hashers: Dict[str, FrameHasher],
+        frame_indices: Optional[List[int]] = None,
+        plan: Optional[Tuple[str, List[int]]] = None
+    ) -> Dict[str, List[str]]:
         """
-        Calculate audio fingerprint
-        Detects duplicate even if video is cropped/edited but audio is same
+        Decode sampled frames once and run every hasher over them
+        
+        Returns:
+            Dictionary of hasher name -> per-frame hex hashes (empty on failure)
         """
         try:
-            # Extract audio to temp file
-            temp_audio = f"/tmp/audio_{os.path.basename(video_path)}.wav"
-            
-            cmd = [
-                'ffmpeg',
-                '-i', video_path,
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',  # PCM audio
-                '-ar', '16000',  # 16kHz sample rate
-                '-ac', '1',  # Mono
-                '-y',
-                temp_audio
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, timeout=60)
-            
-            if result.returncode != 0 or not os.path.exists(temp_audio):
+            return self.frame_sampler.sample_and_hash(video_path, hashers, frame_indices, plan)
+        except Exception as e:
+            print(f"❌ Frame hashing failed: {e}")
+            return {name: [] for name in hashers}
+    
+    def _calculate_frame_hashes(
+        self,
+        video_path: str,
+        hashers: Dict[str, FrameHasher]
+    ) -> Dict[str, str]:
+        """
+        Decode sampled frames once and run every hasher over them
+        
+        Returns:
+            Dictionary of hasher name -> combined video hash
+        """
+        return {
+            name: self._combine_frame_hashes(hashes)
+            for name, hashes in self._sample_frame_hashes(video_path, hashers).items()
+        }
+    
+    def _calculate_perceptual_hash(self, video_path: str) -> str:
+        """Calculate perceptual hash from full video frames"""
+        hashers = {"original": self._phash_full_frame}
+        return self._calculate_frame_hashes(video_path, hashers)["original"]
+    
+    def _calculate_center_hash(self, video_path: str) -> str:
+        """Calculate hash from center 60% of video (excludes edges where watermark is)"""
+        hashers = {"center_region": self._phash_center_region}
+        return self._calculate_frame_hashes(video_path, hashers)["center_region"]
+    
+    def calculate_packed_frame_hashes(self, video_path: str, tier: str = "free") -> Tuple[Dict[str, bytes], str]:
+        """
+        Per-frame pHashes for every hasher of the tier, packed as raw bits
+        (used to backfill videos stored before the packed format existed)
+        
+        Returns:
+            (hasher name -> packed hashes, sampling mode that picked the frames)
+        """
+        frame_indices = self.frame_sampler.sample_indices(self.frame_sampler.frame_count(video_path))
+        plan = self.frame_sampler.sampling_plan(video_path, frame_indices)
+        frame_hashes = self._sample_frame_hashes(video_path, self.frame_hashers(tier), frame_indices, plan)
+        
+        packed = {
+            name: pack_frame_hashes(hashes)
+            for name, hashes in frame_hashes.items()
+            if hashes
+        }
+        return packed, plan[0]
+    
+    def hash_full_frame(self, frame: np.ndarray) -> str:
+        """Full-frame pHash of one BGR frame (the hasher behind the original/watermarked hashes)"""
+        return self._phash_full_frame(frame)
+    
+    def combine_frame_hashes(self, frame_hashes: List[str]) -> str:
+        """Video hash from per-frame hashes, as stored in hashes.original/hashes.watermarked"""
+        return self._combine_frame_hashes(frame_hashes)
+    
+    def calculate_watermarked_hash(self, video_path: str) -> str:
+        """
+        Calculate only the full-frame perceptual hash (used for the watermarked output,
+        where center region and audio hashes would be identical to the original)
+        """
+        return self._calculate_perceptual_hash(video_path)
+    
+    def _calculate_audio_fingerprint(self, video_path: str) -> Optional[bytes]:
+        """
+        Calculate audio fingerprint (streamed, bounded memory)
+        Detects duplicate even if video is cropped/edited/re-encoded but audio is same
+        """
+        try:
+            fingerprint = audio_fingerprinter.fingerprint(video_path)
+            if fingerprint is None:
                 print("⚠️ No audio track found")
-                return "no_audio"
-            
-            # Read audio and create simple fingerprint
-            # (In production, use chromaprint or similar)
-            with open(temp_audio, 'rb') as f:
-                audio_data = f.read()
-                audio_hash = hashlib.sha256(audio_data).hexdigest()
-            
-            # Clean up
-            os.remove(temp_audio)
-            
-            return audio_hash
+                return None
+            return pack_fingerprint(fingerprint)
         
         except Exception as e:
-            print(f"⚠️ Audio hash failed: {e}")
-            return "no_audio"
+            print(f"⚠️ Audio fingerprint failed: {e}")
+            return None
+    
+    def _calculate_audio_hash(self, video_path: str) -> str:
+        """
+        Calculate audio hash (SHA-256 of the packed fingerprint, exact match only)
+        """
+        fingerprint = self._calculate_audio_fingerprint(video_path)
+        return hashlib.sha256(fingerprint).hexdigest() if fingerprint else "no_audio"
     
     def calculate_similarity_score(self, hash1: str, hash2: str) -> float:
         """
@@ -278,6 +325,64 @@ class EnhancedVideoProcessor:
         
         return similarity
     
+    @staticmethod
+    def _batch_frame_similarity(new_hashes: Dict, candidates: List[Dict], name: str) -> Dict[int, float]:
+        """
+        frame_similarity() of the new video against every candidate with comparable
+        packed frames (same frame count, compatible sampling mode), in one vectorised call
+        
+        Returns:
+            {candidate position: similarity}; candidates left out go through _best_similarity
+        """
+        packed = new_hashes.get("frame_hashes", {}).get(name)
+        if not packed:
+            return {}
+        query = unpack_frame_hashes(packed)
+        if query.size == 0:
+            return {}
+        
+        positions, rows = [], []
+        for position, existing in enumerate(candidates):
+            hashes = existing.get("hashes", {})
+            existing_packed = comparable_frames(hashes).get(name)
+            if not existing_packed or not same_sampled_frames(new_hashes.get("sampling_mode"), hashes.get("sampling_mode")):
+                continue
+            matrix = unpack_frame_hashes(existing_packed)
+            if matrix.shape == query.shape:
+                positions.append(position)
+                rows.append(matrix)
+        
+        if not rows:
+            return {}
+        
+        distances = batch_frame_distances(query, np.stack(rows))
+        similarity = 1.0 - distances.sum(axis=1) / (distances.shape[1] * FRAME_HASH_BITS)
+        return dict(zip(positions, similarity.tolist()))
+    
+    def _best_similarity(
+        self,
+        new_hashes: Dict,
+        existing: Dict,
+        name: str,
+        new_hex: str,
+        existing_hex: str
+    ) -> float:
+        """
+        Similarity for one hash type, preferring packed per-frame bits (bit-level Hamming)
+        and falling back to the legacy hex comparison for videos not yet migrated, or
+        whose frames were sampled in a mode that picks different frames
+        """
+        new_frames = new_hashes.get("frame_hashes", {}).get(name)
+        existing_frames = comparable_frames(existing.get("hashes", {})).get(name)
+        modes_match = same_sampled_frames(
+            new_hashes.get("sampling_mode"), existing.get("hashes", {}).get("sampling_mode")
+        )
+        
+        if new_frames and existing_frames and modes_match:
+            return frame_similarity(new_frames, existing_frames)
+        
+        return self.calculate_similarity_score(new_hex, existing_hex)
+    
     def smart_duplicate_detection(
         self,
         new_hashes: Dict,
@@ -287,12 +392,22 @@ class EnhancedVideoProcessor:
         """
         Smart detection with tier-appropriate matching
         
+        existing_videos should be the candidates returned by
+        similarity_index.find_candidates(), not a full scan of stored videos.
+        
         Returns:
             (is_duplicate, matching_video, confidence_score)
         """
         print(f"🔍 Smart detection: Checking {len(existing_videos)} existing videos...")
         
-        for existing in existing_videos:
+        # Packed per-frame comparisons for all candidates at once; the loop only
+        # falls back to per-pair scoring for candidates the batch could not cover
+        batch_original = self._batch_frame_similarity(new_hashes, existing_videos, "original")
+        batch_center = {}
+        if tier in ["pro", "enterprise"] and new_hashes.get("center_region_hash"):
+            batch_center = self._batch_frame_similarity(new_hashes, existing_videos, "center_region")
+        
+        for position, existing in enumerate(existing_videos):
             # Always check original hash (check both new and legacy formats)
             existing_original_hash = (
                 existing.get("hashes", {}).get("original") or  # New format
@@ -300,10 +415,12 @@ class EnhancedVideoProcessor:
                 existing.get("perceptual_hash", {}).get("combined_hash", "")  # Very old format
             )
             
-            original_similarity = self.calculate_similarity_score(
-                new_hashes["original_hash"],
-                existing_original_hash
-            )
+            original_similarity = batch_original.get(position)
+            if original_similarity is None:
+                original_similarity = self._best_similarity(
+                    new_hashes, existing, "original",
+                    new_hashes["original_hash"], existing_original_hash
+                )
             
             if original_similarity >= 0.95:
                 print(f"✅ Exact match found (original hash): {original_similarity:.2%}")
@@ -316,10 +433,12 @@ class EnhancedVideoProcessor:
                     existing.get("center_region_hash", "")              # Legacy format
                 )
                 
-                center_similarity = self.calculate_similarity_score(
-                    new_hashes["center_region_hash"],
-                    existing_center_hash
-                )
+                center_similarity = batch_center.get(position)
+                if center_similarity is None:
+                    center_similarity = self._best_similarity(
+                        new_hashes, existing, "center_region",
+                        new_hashes["center_region_hash"], existing_center_hash
+                    )
                 
                 if center_similarity >= 0.95:
                     print(f"✅ Match found (center hash): {center_similarity:.2%}")
@@ -337,6 +456,17 @@ class EnhancedVideoProcessor:
                     print("✅ Match found (audio fingerprint)")
                     print("   (Video edited but audio identical)")
                     return (True, existing, 1.0)
+                
+                # Spectral fingerprint comparison (survives re-encoding)
+                audio_similarity = audio_fingerprinter.similarity(
+                    new_hashes.get("audio_fingerprint"),
+                    existing.get("hashes", {}).get("audio_fingerprint")
+                )
+                
+                if audio_similarity >= 1.0 - audio_fingerprinter.max_bit_error_rate:
+                    print(f"✅ Match found (audio fingerprint): {audio_similarity:.2%}")
+                    print("   (Video edited but audio matches)")
+                    return (True, existing, audio_similarity)
             
             # Check for "possible duplicate" (85-95% similar)
             if 0.85 <= original_similarity < 0.95:
@@ -0,0 +1,258 @@
+"""
+Frame Sampling Engine
+Decodes each sampled frame exactly once and fans it out to every registered hasher
+"""
+import cv2
+import numpy as np
+import bisect
+import os
+import subprocess
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# A hasher receives one decoded BGR frame and returns its hash string
+FrameHasher = Callable[[np.ndarray], str]
+
+# Sampling modes:
+#   exact      - seek to each exact frame index (original behaviour, backward-compatible hashes)
+#   sequential - decode forward once with grab()/retrieve(), same frames as exact without re-seeking
+#   keyframe   - snap sample points to the nearest keyframes, cost scales with sample count
+#                (videos with fewer keyframes than samples are sampled sequentially, and
+#                recorded as such - see sampling_plan)
+SAMPLING_MODES = ("exact", "sequential", "keyframe")
+
+
+def same_sampled_frames(mode_a: Optional[str], mode_b: Optional[str]) -> bool:
+    """
+    Whether two sampling modes pick the same frames, so per-frame hashes line up
+    (hashes stored without a mode were taken in exact mode)
+    """
+    frames = {"exact": "index", "sequential": "index", "keyframe": "keyframe"}
+    return frames.get(mode_a or "exact") == frames.get(mode_b or "exact")
+
+
+class FrameSampler:
+    """
+    Shared frame decoder for all per-frame hash algorithms.
+
+    Hashers are registered per call as a name -> callable mapping, so adding a
+    new algorithm (full-frame pHash, center crop, ...) does not add a decode pass.
+    """
+
+    def __init__(self, sample_frame_count: int = 10, mode: Optional[str] = None):
+        self.sample_frame_count = sample_frame_count
+        self.mode = mode or os.getenv("FRAME_SAMPLING_MODE", "exact")
+
+        if self.mode not in SAMPLING_MODES:
+            print(f"⚠️ Unknown frame sampling mode '{self.mode}' - using exact")
+            self.mode = "exact"
+
+    def sample_indices(self, total_frames: int) -> List[int]:
+        """Evenly spaced frame indices across the video"""
+        if total_frames <= 0:
+            return []
+
+        return np.linspace(
+            0, total_frames - 1,
+            min(self.sample_frame_count, total_frames),
+            dtype=int
+        ).tolist()
+
+    @staticmethod
+    def frame_count(video_path: str) -> int:
+        """
+        Frame count as the decoder reports it - the count sample_indices() is applied
+        to for every hash, so the same frames are picked wherever a video is sampled
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            cap.release()
+
+    def sampling_plan(
+        self,
+        video_path: str,
+        frame_indices: List[int],
+        fps: Optional[float] = None
+    ) -> Tuple[str, List[int]]:
+        """
+        Mode that actually picks a video's frames, and the frame indices it decodes
+
+        Keyframe mode snaps every sample to its nearest keyframe, so each seek lands
+        on an independently decodable frame. A video with fewer keyframes than
+        samples falls back to sequential decoding of the requested indices - and is
+        reported as "sequential", since those are index-sampled frames.
+        """
+        if self.mode != "keyframe":
+            return self.mode, frame_indices
+
+        if fps is None:
+            cap = cv2.VideoCapture(video_path)
+            try:
+                fps = cap.get(cv2.CAP_PROP_FPS)
+            finally:
+                cap.release()
+
+        keyframes = self._keyframe_indices(video_path, fps)
+
+        snapped = []
+        for idx in frame_indices:
+            keyframe = self._nearest(keyframes, idx)
+            if keyframe is not None and keyframe not in snapped:
+                snapped.append(keyframe)
+
+        if len(snapped) < len(frame_indices):
+            return "sequential", frame_indices
+        return "keyframe", snapped
+
+    def iter_frames(
+        self,
+        video_path: str,
+        frame_indices: Optional[List[int]] = None,
+        plan: Optional[Tuple[str, List[int]]] = None
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield (frame_index, BGR frame) for every sampled frame.
+        Frames that fail to decode are skipped.
+
+        Args:
+            video_path: Path to video file
+            frame_indices: Frames to sample (defaults to evenly spaced indices)
+            plan: Result of sampling_plan, when the caller needs to record the mode
+        """
+        cap = cv2.VideoCapture(video_path)
+
+        try:
+            if plan is None:
+                if frame_indices is None:
+                    frame_indices = self.sample_indices(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+                plan = self.sampling_plan(video_path, frame_indices, cap.get(cv2.CAP_PROP_FPS))
+
+            mode, indices = plan
+            if mode == "sequential":
+                yield from self._iter_sequential(cap, indices)
+            else:
+                # Keyframe plans hold the snapped keyframe indices
+                yield from self._iter_exact(cap, indices)
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _iter_exact(cap, frame_indices: List[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """Seek to every index (each seek decodes from the previous keyframe)"""
+        for idx in frame_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+
+            if ret:
+                yield idx, frame
+
+    @staticmethod
+    def _iter_sequential(cap, frame_indices: List[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decode forward once, only retrieving (color converting) the sampled frames.
+        Yields the same frames as exact mode without per-sample seeks.
+        """
+        position = 0
+        last_idx, last_frame = None, None
+
+        for idx in sorted(frame_indices):
+            # Repeated indices (very short videos) reuse the previous frame
+            if idx == last_idx:
+                if last_frame is not None:
+                    yield idx, last_frame
+                continue
+
+            while position < idx:
+                if not cap.grab():
+                    return
+                position += 1
+
+            ret, frame = cap.read()
+            position += 1
+            last_idx, last_frame = idx, frame if ret else None
+
+            if ret:
+                yield idx, frame
+
+    @staticmethod
+    def _keyframe_indices(video_path: str, fps: float) -> List[int]:
+        """
+        Frame indices of the video's keyframes.
+        Reads packet flags only (demux, no decode) via ffprobe.
+        """
+        if fps <= 0:
+            return []
+
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            video_path
+        ]
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        except Exception as e:
+            print(f"⚠️ Keyframe probe failed: {e}")
+            return []
+
+        times = []
+        for line in result.stdout.splitlines():
+            parts = line.split(',')
+            if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+                times.append(float(parts[0]))
+
+        if not times:
+            return []
+
+        start = min(times)
+        return sorted({int(round((t - start) * fps)) for t in times})
+
+    @staticmethod
+    def _nearest(sorted_values: List[int], target: int) -> Optional[int]:
+        """Closest value to target in a sorted list"""
+        if not sorted_values:
+            return None
+
+        pos = bisect.bisect_left(sorted_values, target)
+        candidates = sorted_values[max(0, pos - 1):pos + 1]
+        return min(candidates, key=lambda v: abs(v - target))
+
+    @staticmethod
+    def hash_frames(
+        frames: Iterable[np.ndarray],
+        hashers: Dict[str, FrameHasher]
+    ) -> Dict[str, List[str]]:
+        """Run every hasher over each frame, decoding nothing itself"""
+        results = {name: [] for name in hashers}
+
+        for frame in frames:
+            for name, hasher in hashers.items():
+                results[name].append(hasher(frame))
+
+        return results
+
+    def sample_and_hash(
+        self,
+        video_path: str,
+        hashers: Dict[str, FrameHasher],
+        frame_indices: Optional[List[int]] = None,
+        plan: Optional[Tuple[str, List[int]]] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Decode the sampled frames of a video once and hash them with every hasher
+
+        Returns:
+            Dictionary of hasher name -> list of per-frame hashes (in frame order)
+        """
+        return self.hash_frames(
+            (frame for _, frame in self.iter_frames(video_path, frame_indices, plan)),
+            hashers
+        )
+
+
+# Global instance
+frame_sampler = FrameSampler()
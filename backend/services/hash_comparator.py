@@ -0,0 +1,109 @@
+"""
+Packed Perceptual Hash Comparator
+Stores per-frame pHashes as raw bits and compares them with vectorised NumPy popcount,
+one pair at a time or one query against N candidates in a single call
+"""
+import numpy as np
+from typing import List, Optional
+
+# Bits in one 16x16 pHash frame hash
+FRAME_HASH_BITS = 256
+
+# Candidates compared per chunk in batch mode (bounds temporary memory)
+BATCH_CHUNK_SIZE = 65536
+
+# Set-bit count for every byte value (NumPy 1.x has no native popcount)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_frame_hashes(frame_hashes: List[str]) -> bytes:
+    """Pack per-frame hex pHashes into raw bytes (stored as BSON binary)"""
+    return b"".join(bytes.fromhex(h) for h in frame_hashes)
+
+
+def unpack_frame_hashes(packed: bytes, bits_per_frame: int = FRAME_HASH_BITS) -> np.ndarray:
+    """Packed bytes -> (frames, words) uint64 matrix"""
+    words_per_frame = bits_per_frame // 64
+    return np.frombuffer(packed, dtype=">u8").astype(np.uint64).reshape(-1, words_per_frame)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each uint64 element"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    counts = _POPCOUNT_TABLE[values.view(np.uint8)]
+    return counts.reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint32)
+
+
+def frame_distances(packed_a: bytes, packed_b: bytes, bits_per_frame: int = FRAME_HASH_BITS) -> Optional[np.ndarray]:
+    """
+    Per-frame Hamming distances between two packed hashes
+
+    Returns:
+        Array of distances (one per frame), or None if frame counts differ
+    """
+    a = unpack_frame_hashes(packed_a, bits_per_frame)
+    b = unpack_frame_hashes(packed_b, bits_per_frame)
+
+    if a.shape != b.shape or a.size == 0:
+        return None
+
+    return popcount(a ^ b).sum(axis=-1)
+
+
+def frame_similarity(packed_a: Optional[bytes], packed_b: Optional[bytes], bits_per_frame: int = FRAME_HASH_BITS) -> float:
+    """
+    Bit-level similarity between two packed hashes (0.0 to 1.0)
+
+    Returns:
+        1 - (differing bits / total bits); 0.0 if either hash is missing or frame counts differ
+    """
+    if not packed_a or not packed_b:
+        return 0.0
+
+    distances = frame_distances(packed_a, packed_b, bits_per_frame)
+    if distances is None:
+        return 0.0
+
+    return 1.0 - float(distances.sum()) / (distances.size * bits_per_frame)
+
+
+def hex_frames_to_matrix(frame_hashes: List[str], bits_per_frame: int) -> np.ndarray:
+    """Per-frame hex hashes -> (frames, words) uint64 matrix"""
+    return unpack_frame_hashes(pack_frame_hashes(frame_hashes), bits_per_frame)
+
+
+def batch_frame_distances(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    chunk_size: int = BATCH_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    Per-frame Hamming distances of one query against N candidates
+
+    Args:
+        query: (frames, words) uint64 matrix
+        candidates: (N, frames, words) uint64 array, or (N, frames) for 64-bit frame hashes
+
+    Returns:
+        (N, frames) uint32 distances
+    """
+    query = np.asarray(query, dtype=np.uint64)
+    candidates = np.asarray(candidates, dtype=np.uint64)
+
+    if candidates.ndim == 2:
+        candidates = candidates[:, :, np.newaxis]
+    if query.ndim == 1:
+        query = query[:, np.newaxis]
+
+    if candidates.shape[1:] != query.shape:
+        raise ValueError(
+            f"Candidate frame shape {candidates.shape[1:]} does not match query {query.shape}"
+        )
+
+    distances = np.empty(candidates.shape[:2], dtype=np.uint32)
+
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        distances[start:start + len(chunk)] = popcount(chunk ^ query).sum(axis=-1, dtype=np.uint32)
+
+    return distances
@@ -0,0 +1,269 @@
+"""
+HLS Packaging
+Adaptive bitrate ladder (segments + master playlist) for showcase playback,
+produced by a background job after the upload is stored
+"""
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from services.job_queue import JobContext
+from services.storage import storage
+
+# Scratch space for ffmpeg output before it is published to storage
+WORK_DIR = "/app/backend/uploads/temp"
+
+MASTER_PLAYLIST = "master.m3u8"
+
+# Files the HLS endpoint may serve: master, variant playlists and segments, under
+# their packaging version ("v<12 hex>/")
+HLS_FILE_PATTERN = re.compile(r"^v[0-9a-f]{12}/(master\.m3u8|\d+/(index\.m3u8|seg_\d{5}\.ts))$")
+
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+@dataclass
+class Rendition:
+    """
+    One rung of the ladder (height None = source resolution)
+
+    height is the short edge - the height of landscape video, the width of
+    portrait video - so both orientations get the same rungs.
+    """
+    name: str
+    height: Optional[int]
+    video_bitrate: str
+    max_rate: str
+    buffer_size: str
+    audio_bitrate: str
+
+
+LADDER = [
+    Rendition("360p", 360, "800k", "856k", "1200k", "96k"),
+    Rendition("720p", 720, "2800k", "2996k", "4200k", "128k"),
+    Rendition("source", None, "5000k", "5350k", "7500k", "128k"),
+]
+
+
+class HLSPackager:
+    """
+    Packages a stored video into an HLS ladder with a single ffmpeg run
+    (one decode, one encode per rendition).
+
+    Renditions at or above the source's short edge are dropped, so small sources get
+    fewer rungs. Each packaging run is published under a new version directory
+    of the video's storage prefix (storage.hls_prefix) and recorded on the video
+    document as `hls`, so every published path is immutable and a re-packaged
+    ladder gets new URLs instead of overwriting cached ones.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("HLS_ENABLED", "false").lower() == "true"
+        self.tiers = [t.strip() for t in os.getenv("HLS_TIERS", "free,pro,enterprise").split(",")]
+        self.segment_seconds = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+        self.timeout = int(os.getenv("HLS_TIMEOUT", "1800"))
+
+    def should_package(self, tier: str) -> bool:
+        """True if uploads of this tier get an HLS ladder"""
+        return self.enabled and tier in self.tiers
+
+    def object_key(self, video_id: str, name: str) -> Optional[str]:
+        """Storage key of a servable HLS file, or None if the name is not one we produce"""
+        if not HLS_FILE_PATTERN.match(name):
+            return None
+        return f"{storage.hls_prefix(video_id)}/{name}"
+
+    def playlist_path(self, hls: Optional[Dict]) -> Optional[str]:
+        """Master playlist path (relative to the HLS endpoint) of a ready ladder"""
+        if not hls or hls.get("status") != "ready":
+            return None
+        return f"{hls['version']}/{MASTER_PLAYLIST}"
+
+    def remove(self, video_id: str, version: Optional[str] = None):
+        """Delete a video's HLS output (or one packaging version of it)"""
+        prefix = storage.hls_prefix(video_id)
+        storage.backend.delete_prefix(f"{prefix}/{version}" if version else prefix)
+
+    @staticmethod
+    def _probe(video_path: str) -> Dict:
+        """Source short edge (height of landscape, width of portrait video) and whether it has audio"""
+        cmd = [
+            'ffprobe', '-v', 'quiet',
+            '-print_format', 'json',
+            '-show_streams',
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30, check=True)
+        streams = json.loads(result.stdout).get("streams", [])
+
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        return {
+            "short_edge": min(int(video.get("width") or 0), int(video.get("height") or 0)),
+            "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        }
+
+    def ladder_for(self, source_short_edge: int) -> List[Rendition]:
+        """Renditions below the source's short edge, plus the source itself"""
+        return [
+            r for r in LADDER
+            if r.height is None or (source_short_edge and r.height < source_short_edge)
+        ]
+
+    @staticmethod
+    def scale_filter(rendition: Rendition) -> str:
+        """Scale the short edge to the rendition's height (-2 keeps the long edge even)"""
+        if not rendition.height:
+            return "null"
+        landscape = "gte(iw\\,ih)"
+        return (
+            f"scale='if({landscape}\\,-2\\,{rendition.height})'"
+            f":'if({landscape}\\,{rendition.height}\\,-2)'"
+        )
+
+    def build_command(self, video_path: str, out_dir: str, ladder: List[Rendition], has_audio: bool) -> List[str]:
+        """ffmpeg command producing every rendition, its playlist and the master playlist"""
+        count = len(ladder)
+        outputs = "".join(f"[v{i}]" for i in range(count))
+        graph = [f"[0:v]split={count}{outputs}"]
+
+        for i, rendition in enumerate(ladder):
+            graph.append(f"[v{i}]{self.scale_filter(rendition)}[v{i}out]")
+
+        cmd = [
+            'ffmpeg', '-v', 'error',
+            '-i', video_path,
+            '-filter_complex', ';'.join(graph),
+        ]
+
+        stream_map = []
+        for i, rendition in enumerate(ladder):
+            cmd += [
+                '-map', f'[v{i}out]',
+                f'-c:v:{i}', 'libx264',
+                f'-b:v:{i}', rendition.video_bitrate,
+                f'-maxrate:v:{i}', rendition.max_rate,
+                f'-bufsize:v:{i}', rendition.buffer_size,
+            ]
+            if has_audio:
+                cmd += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', rendition.audio_bitrate]
+                stream_map.append(f"v:{i},a:{i},name:{i}")
+            else:
+                stream_map.append(f"v:{i},name:{i}")
+
+        cmd += [
+            '-preset', 'veryfast',
+            '-pix_fmt', 'yuv420p',
+            # Keyframe at every segment boundary so all renditions switch cleanly
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})',
+            '-sc_threshold', '0',
+            '-f', 'hls',
+            '-hls_time', str(self.segment_seconds),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(out_dir, '%v', 'seg_%05d.ts'),
+            '-master_pl_name', MASTER_PLAYLIST,
+            '-var_stream_map', ' '.join(stream_map),
+            os.path.join(out_dir, '%v', 'index.m3u8'),
+        ]
+        return cmd
+
+    def package(self, video_id: str, video_path: str) -> Dict:
+        """
+        Produce the ladder for a stored video
+
+        Returns:
+            hls record for the video document
+
+        Raises:
+            RuntimeError: ffmpeg failed
+        """
+        probe = self._probe(video_path)
+        ladder = self.ladder_for(probe["short_edge"])
+        version = f"v{uuid.uuid4().hex[:12]}"
+
+        os.makedirs(WORK_DIR, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f"hls_{video_id}_", dir=WORK_DIR)
+        for i in range(len(ladder)):
+            os.makedirs(os.path.join(temp_dir, str(i)), exist_ok=True)
+
+        cmd = self.build_command(video_path, temp_dir, ladder, probe["has_audio"])
+        result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+
+        if result.returncode != 0:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise RuntimeError(f"HLS packaging failed: {result.stderr.decode(errors='replace')[-500:]}")
+
+        # Publish only complete output so players never see a half-written ladder
+        try:
+            storage.backend.put_directory(temp_dir, f"{storage.hls_prefix(video_id)}/{version}")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return {
+            "status": "ready",
+            "version": version,
+            "master": MASTER_PLAYLIST,
+            "renditions": [r.name for r in ladder],
+            "segment_seconds": self.segment_seconds,
+        }
+
+    def package_stored(self, video_id: str, backend, key: str) -> Dict:
+        """Package a video held in storage (fetched to a local file if needed)"""
+        with backend.open_local(key) as video_path:
+            return self.package(video_id, video_path)
+
+    async def process(self, ctx: JobContext) -> Dict:
+        """
+        Job handler for "video_hls" jobs
+
+        Payload:
+            video_id
+        """
+        db = ctx.queue.db
+        video_id = ctx.job["payload"]["video_id"]
+
+        video = await db.videos.find_one({"id": video_id}, {"id": 1, "storage.video_key": 1, "hls.version": 1})
+        backend, key = storage.video_object(video or {"id": video_id})
+
+        if not video or not await asyncio.to_thread(backend.exists, key):
+            # Deleted or expired before packaging ran
+            return {"video_id": video_id, "status": "skipped"}
+
+        await ctx.progress(10, "packaging", "Packaging HLS renditions")
+
+        try:
+            hls = await asyncio.to_thread(self.package_stored, video_id, backend, key)
+        except Exception:
+            if ctx.is_last_attempt:
+                await db.videos.update_one({"id": video_id}, {"$set": {"hls.status": "failed"}})
+            raise
+
+        result = await db.videos.update_one({"id": video_id}, {"$set": {"hls": hls}})
+        if result.matched_count == 0:
+            # Video was deleted while packaging
+            await asyncio.to_thread(self.remove, video_id)
+            return {"video_id": video_id, "status": "skipped"}
+
+        # Drop the ladder this one replaces
+        previous = (video.get("hls") or {}).get("version")
+        if previous and previous != hls["version"]:
+            try:
+                await asyncio.to_thread(self.remove, video_id, previous)
+            except Exception as e:
+                print(f"⚠️ Could not remove previous HLS ladder {previous} of {video_id}: {e}")
+
+        print(f"📺 HLS ready for {video_id}: {', '.join(hls['renditions'])}")
+        return {"video_id": video_id, **hls}
+
+
+# Global instance
+hls_packager = HLSPackager()
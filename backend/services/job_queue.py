@@ -0,0 +1,310 @@
+"""
+Background Job Queue
+MongoDB-backed queue so long-running work (video processing) runs off the request path
+and survives worker restarts
+"""
+import asyncio
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+
+class JobContext:
+    """
+    Handle passed to job handlers for reporting progress and saving checkpoints.
+    Checkpointed state is persisted on the job, so a retried job can skip finished steps.
+    """
+
+    def __init__(self, queue: "JobQueue", job: Dict):
+        self.queue = queue
+        self.job = job
+        self.job_id = job["_id"]
+        self.state = job.get("state") or {}
+
+    @property
+    def is_last_attempt(self) -> bool:
+        """True when a failure now will not be retried"""
+        return self.job["attempts"] >= self.job.get("max_attempts", self.queue.max_attempts)
+
+    async def progress(self, percent: int, step: str, message: Optional[str] = None):
+        """Report progress (0-100) for the status endpoint"""
+        await self.queue.db.processing_jobs.update_one(
+            {"_id": self.job_id},
+            {"$set": {
+                "progress": percent,
+                "step": step,
+                "message": message,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+
+    async def checkpoint(self, **values):
+        """Persist intermediate results so a retry resumes after them"""
+        self.state.update(values)
+        await self.queue.db.processing_jobs.update_one(
+            {"_id": self.job_id},
+            {"$set": {f"state.{key}": value for key, value in values.items()}}
+        )
+
+
+JobHandler = Callable[[JobContext], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    Durable job queue stored in the processing_jobs collection.
+
+    Workers claim jobs atomically with a lease. A job whose worker dies stops
+    renewing its lease and is picked up again by any worker once it expires,
+    so jobs are never lost across restarts. Failed jobs are retried with
+    exponential backoff.
+    """
+
+    def __init__(self):
+        self.concurrency = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+        self.lease_seconds = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        # A failed job waits retry_backoff * 2**attempts seconds before it can run again
+        self.retry_backoff = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "15"))
+        # How often a worker sweeps for jobs lost on their last attempt
+        self.lost_job_interval = float(os.getenv("JOB_LOST_SWEEP_INTERVAL", "60"))
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+        self.db = None
+        self.handlers: Dict[str, JobHandler] = {}
+        self._workers = []
+        self._wakeup = asyncio.Event()
+        self._next_lost_sweep = 0.0
+
+    def register(self, job_type: str, handler: JobHandler):
+        """Register the coroutine that processes jobs of a type"""
+        self.handlers[job_type] = handler
+
+    async def start(self, db):
+        """Create indexes and start worker tasks"""
+        self.db = db
+
+        await db.processing_jobs.create_index([("status", 1), ("created_at", 1)])
+        await db.processing_jobs.create_index("user_id")
+
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i))
+            for i in range(self.concurrency)
+        ]
+        print(f"⚙️ Job queue started ({self.concurrency} workers, id {self.worker_id})")
+
+    async def stop(self):
+        """Stop workers; interrupted jobs are released for another worker"""
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self.db is not None:
+            await self.db.processing_jobs.update_many(
+                {"status": "running", "worker_id": self.worker_id},
+                {"$set": {"status": "queued", "lease_expires_at": None}}
+            )
+
+    async def enqueue(self, db, job_type: str, payload: Dict, **fields) -> str:
+        """
+        Add a job to the queue
+
+        Args:
+            db: Database handle
+            job_type: Registered handler name
+            payload: Handler input
+            fields: Extra top-level fields stored on the job (e.g. user_id, video_id)
+
+        Returns:
+            Job ID
+        """
+        job_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+
+        await db.processing_jobs.insert_one({
+            "_id": job_id,
+            "id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "payload": payload,
+            "state": {},
+            "progress": 0,
+            "step": "queued",
+            "message": None,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "available_at": None,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
+            **fields
+        })
+
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, db, job_id: str) -> Optional[Dict]:
+        """Fetch a job document"""
+        return await db.processing_jobs.find_one({"_id": job_id})
+
+    def _attempts_left(self) -> Dict:
+        """$expr: the job has attempts remaining (per-job max_attempts overrides the default)"""
+        return {"$lt": ["$attempts", {"$ifNull": ["$max_attempts", self.max_attempts]}]}
+
+    async def _fail_lost_jobs(self, now: datetime):
+        """
+        Fail jobs whose lease expired on their last attempt. A job that crashes or
+        OOM-kills its worker never reaches the except branch of _run, so without
+        this it would be reclaimed, and take down a worker, forever.
+        """
+        result = await self.db.processing_jobs.update_many(
+            {
+                "type": {"$in": list(self.handlers)},
+                "status": "running",
+                "lease_expires_at": {"$lt": now},
+                "$expr": {"$not": [self._attempts_left()]}
+            },
+            {"$set": {
+                "status": "failed",
+                "error": "Worker lost on the last attempt",
+                "lease_expires_at": None,
+                "updated_at": now
+            }}
+        )
+        if result.modified_count:
+            print(f"❌ Failed {result.modified_count} job(s) whose worker was lost on the last attempt")
+
+    async def _claim(self) -> Optional[Dict]:
+        """
+        Atomically claim the oldest queued job whose retry backoff has passed
+        (or one with an expired lease)
+        """
+        now = datetime.now(timezone.utc)
+
+        # The sweep is an update_many over running jobs; run it on its own interval
+        # rather than on every poll of every worker
+        if time.monotonic() >= self._next_lost_sweep:
+            self._next_lost_sweep = time.monotonic() + self.lost_job_interval
+            await self._fail_lost_jobs(now)
+
+        return await self.db.processing_jobs.find_one_and_update(
+            {
+                "type": {"$in": list(self.handlers)},
+                "$or": [
+                    {
+                        "status": "queued",
+                        "$or": [{"available_at": None}, {"available_at": {"$lte": now}}]
+                    },
+                    {
+                        "status": "running",
+                        "lease_expires_at": {"$lt": now},
+                        "$expr": self._attempts_left()
+                    }
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _renew_lease(self, job_id: str):
+        """Keep the lease alive while a long job runs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self.db.processing_jobs.update_one(
+                {"_id": job_id, "worker_id": self.worker_id},
+                {"$set": {
+                    "lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+                }}
+            )
+
+    async def _worker_loop(self, index: int):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Job worker {index}: claim failed: {e}")
+                job = None
+
+            if not job:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict):
+        job_id = job["_id"]
+        handler = self.handlers[job["type"]]
+        lease = asyncio.create_task(self._renew_lease(job_id))
+
+        print(f"⚙️ Job {job_id} ({job['type']}) started, attempt {job['attempts']}")
+
+        try:
+            result = await handler(JobContext(self, job))
+
+            await self.db.processing_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": "completed",
+                    "progress": 100,
+                    "step": "completed",
+                    "result": result,
+                    "error": None,
+                    "lease_expires_at": None,
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+            print(f"✅ Job {job_id} completed")
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            traceback.print_exc()
+            retry = not JobContext(self, job).is_last_attempt
+            now = datetime.now(timezone.utc)
+            backoff = self.retry_backoff * 2 ** job["attempts"]
+
+            await self.db.processing_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": "queued" if retry else "failed",
+                    "error": str(e),
+                    "available_at": now + timedelta(seconds=backoff) if retry else None,
+                    "lease_expires_at": None,
+                    "updated_at": now
+                }}
+            )
+            print(f"❌ Job {job_id} failed: {e} ({f'retrying in {backoff:.0f}s' if retry else 'giving up'})")
+
+        finally:
+            lease.cancel()
+
+
+# Global instance
+job_queue = JobQueue()
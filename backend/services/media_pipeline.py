@@ -0,0 +1,251 @@
+"""
+Combined Media Pipeline
+One ffmpeg filter graph per upload: decodes the source once, encodes the watermarked
+MP4 once, and emits the sampled frames for the watermarked hash as an extra output of
+the same graph - the best scoring of them is rendered as the thumbnail set
+"""
+import os
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.encoding_profiles import EncodingProfile, encoding_profiles
+from services.enhanced_video_processor import enhanced_processor
+from services.thumbnail_service import frame_score, thumbnail_service
+from utils.watermark import watermark_processor
+
+# Sampled frames are piped as BMP images: lossless BGR at the output resolution, and
+# each image carries its own size so no probe of the scaled dimensions is needed.
+# They are taken from the filter graph before x264 encodes them, so their hash is not
+# the one calculate_watermarked_hash gives for the finished MP4. hashes.watermarked is
+# kept as a record only: duplicate detection and verification never match against it.
+BMP_HEADER_SIZE = 14
+
+
+@dataclass
+class MediaResult:
+    """Outputs of one pipeline run"""
+    video_path: str
+    frame_indices: List[int]
+    thumbnail_frame: Optional[int]  # Best scoring sampled frame (see thumbnail_service)
+    thumbnails: Optional[Dict]      # That frame rendered (see ThumbnailService.render)
+    watermarked_hash: Optional[str]
+
+
+class MediaPipeline:
+    """
+    Watermarks, transcodes and samples frames in a single ffmpeg run.
+
+    The overlay output is split two ways: the MP4 encoder, and a select filter that
+    pipes the sampled frames to us as BMP images, hashed and scored as they arrive.
+    Memory holds the current frame and the best scoring one so far, which becomes
+    the thumbnail without decoding anything again.
+    """
+
+    def __init__(self):
+        self.timeout = int(os.getenv("MEDIA_PIPELINE_TIMEOUT", "600"))
+
+    def _frame_select(self, frame_indices: List[int]) -> str:
+        """select filter expression passing only the sampled frame numbers"""
+        return "+".join(f"eq(n\\,{i})" for i in frame_indices)
+
+    def build_command(
+        self,
+        input_path: str,
+        overlay_path: str,
+        output_path: str,
+        position: str,
+        frame_indices: List[int],
+        profile: EncodingProfile
+    ) -> List[str]:
+        """ffmpeg command for one pipeline run (sampled frames go to stdout)"""
+        x_position, y_position = watermark_processor.overlay_position(position)
+
+        # Downscale before the overlay so the watermark keeps its size
+        source = "[0:v]"
+        graph = ["[1:v]format=rgba[wm]"]
+        if profile.scale_filter():
+            graph.append(f"[0:v]{profile.scale_filter()}[src]")
+            source = "[src]"
+
+        graph += [
+            f"{source}[wm]overlay={x_position}:{y_position},split=2[out][fr]",
+        ]
+
+        if frame_indices:
+            graph.append(
+                f"[fr]select='{self._frame_select(frame_indices)}',format=bgr24[frames]"
+            )
+        else:
+            graph.append("[fr]nullsink")
+
+        cmd = [
+            'ffmpeg',
+            '-v', 'error',
+            '-i', input_path,
+            '-i', overlay_path,
+            '-filter_complex', ';'.join(graph),
+
+            # Watermarked video
+            '-map', '[out]', '-map', '0:a?',
+            *profile.output_args(),
+            '-codec:a', 'copy',  # Copy audio without re-encoding
+            '-y', output_path,
+        ]
+
+        if frame_indices:
+            cmd += [
+                '-map', '[frames]',
+                '-fps_mode', 'passthrough',  # One output frame per selected frame
+                '-f', 'image2pipe', '-codec:v', 'bmp',
+                'pipe:1'
+            ]
+
+        return cmd
+
+    @staticmethod
+    def _read_frame(stream) -> Optional[np.ndarray]:
+        """Next BMP image from ffmpeg's stdout as a BGR frame (None at end of stream)"""
+        header = stream.read(BMP_HEADER_SIZE)
+        if len(header) < BMP_HEADER_SIZE:
+            return None
+        if header[:2] != b"BM":
+            raise RuntimeError("Unexpected frame data from ffmpeg")
+
+        size = int.from_bytes(header[2:6], "little")
+        body = stream.read(size - BMP_HEADER_SIZE)
+        if len(body) < size - BMP_HEADER_SIZE:
+            return None
+        return cv2.imdecode(np.frombuffer(header + body, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def _run(self, cmd: List[str], hash_frames: bool) -> Optional[Tuple[List[str], List[float], Optional[np.ndarray]]]:
+        """
+        Run ffmpeg, hashing and scoring frames from stdout as they arrive
+
+        The whole run is bounded by the timeout: a stalled ffmpeg is killed even
+        while we are blocked reading its output.
+
+        Returns:
+            (per-frame hex hashes, per-frame thumbnail scores, best scoring frame),
+            or None if ffmpeg failed
+        """
+        frame_hashes = []
+        frame_scores = []
+        best, best_score = None, 0.0
+
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+            timed_out = threading.Event()
+
+            def kill():
+                timed_out.set()
+                process.kill()
+
+            deadline = threading.Timer(self.timeout, kill)
+            deadline.start()
+
+            try:
+                while hash_frames:
+                    frame = self._read_frame(process.stdout)
+                    if frame is None:
+                        break
+                    frame_hashes.append(enhanced_processor.hash_full_frame(frame))
+                    frame_scores.append(frame_score(frame))
+                    # First of equal scores, as thumbnail_service.best_frame picks
+                    if best is None or frame_scores[-1] > best_score:
+                        best, best_score = frame, frame_scores[-1]
+
+                process.stdout.close()
+                returncode = process.wait()
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+            finally:
+                deadline.cancel()
+
+            if returncode != 0:
+                if timed_out.is_set():
+                    print(f"❌ FFmpeg killed after {self.timeout}s")
+                stderr.seek(0)
+                print(f"❌ FFmpeg error: {stderr.read().decode(errors='replace')}")
+                return None
+
+        return frame_hashes, frame_scores, best
+
+    def process(
+        self,
+        input_path: str,
+        output_path: str,
+        video_id: str,
+        username: str,
+        position: str,
+        tier: str,
+        verification_code: str,
+        frame_count: int
+    ) -> Optional[MediaResult]:
+        """
+        Produce the watermarked video, its watermarked hash and its thumbnail set
+
+        Returns:
+            MediaResult, or None if ffmpeg failed (the caller falls back to separate steps)
+        """
+        if position not in watermark_processor.get_allowed_positions(tier):
+            position = "left"
+
+        frame_indices = enhanced_processor.frame_sampler.sample_indices(frame_count)
+        overlay_path = watermark_processor.create_watermark_overlay(username, position, tier, verification_code)
+
+        profile = encoding_profiles.get(tier)
+        print(f"🎞️ Encoding profile ({tier}): {profile}")
+
+        cmd = self.build_command(
+            input_path, overlay_path, output_path, position, frame_indices, profile
+        )
+
+        try:
+            frames = self._run(cmd, hash_frames=bool(frame_indices))
+        except Exception as e:
+            print(f"❌ Media pipeline failed: {e}")
+            return None
+        finally:
+            if watermark_processor.is_temporary_overlay(overlay_path) and os.path.exists(overlay_path):
+                os.remove(overlay_path)
+
+        if frames is None:
+            return None
+
+        frame_hashes, frame_scores, best = frames
+        print(f"✅ Watermarked video and {len(frame_hashes)} hash frames from one ffmpeg pass")
+
+        # Thumbnails from the best frame already in memory (None: the caller falls back)
+        thumbnails = None
+        thumbnail_frame = thumbnail_service.best_frame(frame_indices, frame_scores)
+        if best is not None and thumbnail_frame is not None:
+            try:
+                thumbnails = thumbnail_service.render(best, video_id)
+                thumbnails["frame"] = thumbnail_frame
+            except Exception as e:
+                print(f"⚠️ Thumbnail render failed: {e}")
+
+        # Fewer frames than requested (e.g. the frame count overstated): hash from the output instead
+        watermarked_hash = None
+        if frame_indices and len(frame_hashes) == len(frame_indices):
+            watermarked_hash = enhanced_processor.combine_frame_hashes(frame_hashes)
+
+        return MediaResult(
+            video_path=output_path,
+            frame_indices=frame_indices,
+            thumbnail_frame=thumbnail_frame,
+            thumbnails=thumbnails,
+            watermarked_hash=watermarked_hash
+        )
+
+
+# Global instance
+media_pipeline = MediaPipeline()
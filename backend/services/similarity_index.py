@@ -0,0 +1,220 @@
+"""
+Near-Duplicate Similarity Index
+Multi-index hashing over bit-level Hamming distance, stored as a MongoDB multikey index
+"""
+import os
+from typing import Dict, List, Optional
+
+from utils.lazy import LazyService
+
+# NumPy is only needed once there is audio to index
+audio_fingerprinter = LazyService("services.audio_fingerprint", "audio_fingerprinter")
+
+# Stored hash fields that take part in near-duplicate search
+# (index key prefix -> key in calculate_all_hashes() output)
+INDEXED_HASHES = {
+    "original": "original_hash",
+    "center_region": "center_region_hash",
+}
+
+NO_HASH = "0" * 64
+
+# hashes.frames_source of frames backfilled from the stored, watermarked file
+# (scripts/migrate_frame_hashes.py); uploads hash the unwatermarked original
+FRAMES_SOURCE_WATERMARKED = "watermarked"
+
+
+def comparable_frames(hashes: Dict) -> Dict[str, bytes]:
+    """
+    Stored packed frame hashes that can be compared with an upload's frames
+
+    Full-frame hashes taken from a watermarked file would match watermarked
+    re-uploads against unwatermarked ones, so they are left out. The center
+    region excludes the edges where the watermark sits and is kept.
+    """
+    frames = dict(hashes.get("frames") or {})
+    if hashes.get("frames_source") == FRAMES_SOURCE_WATERMARKED:
+        frames.pop("original", None)
+    return frames
+
+
+class SimilarityIndex:
+    """
+    Sub-linear "anything within Hamming distance d" search over stored video hashes.
+
+    Each per-frame pHash record of n bits is split into d + 1 bands. By the pigeonhole principle two
+    hashes within distance d share at least one identical band, so exact lookups of
+    the band keys (stored on each video in the indexed `similarity_keys` array) return
+    every candidate within distance d. Candidates are then scored exactly.
+
+    Because the keys live on the video document, the index is kept in sync by
+    insert/delete of the video itself - there is no separate structure to update.
+    """
+
+    def __init__(self):
+        # Max fraction of differing bits still considered a duplicate
+        # (matches the 0.95 similarity threshold of smart_duplicate_detection)
+        self.max_distance_ratio = float(os.getenv("DUPLICATE_MAX_DISTANCE_RATIO", "0.05"))
+        # "user" searches the uploader's own videos, "platform" searches every video
+        self.scope = os.getenv("DUPLICATE_SEARCH_SCOPE", "user")
+        self.candidate_limit = int(os.getenv("DUPLICATE_CANDIDATE_LIMIT", "100"))
+
+    def max_distance(self, n_bits: int) -> int:
+        """Largest Hamming distance (in bits) searched for a hash of n_bits"""
+        return int(n_bits * self.max_distance_ratio)
+
+    def band_keys(self, name: str, value: int, n_bits: int) -> List[str]:
+        """
+        Index keys for one n-bit hash value: "<name>:<n_bits>:<band>:<band value>"
+
+        The bit length is part of the key so hashes of different formats never collide.
+        """
+        bands = self.max_distance(n_bits) + 1
+        keys = []
+
+        start = 0
+        for band in range(bands):
+            # Spread the remainder so band widths differ by at most one bit
+            width = n_bits // bands + (1 if band < n_bits % bands else 0)
+            band_value = (value >> (n_bits - start - width)) & ((1 << width) - 1)
+            keys.append(f"{name}:{n_bits}:{band}:{band_value:x}")
+            start += width
+
+        return keys
+
+    def hex_keys(self, name: str, hex_hash: Optional[str]) -> List[str]:
+        """
+        Index key for a legacy hex hash: "<name>:sha256:<hex>"
+
+        These are SHA-256 digests, where a small Hamming distance means nothing,
+        so they are matched by equality only (no banding).
+        """
+        if not hex_hash or hex_hash == NO_HASH:
+            return []
+
+        return [f"{name}:sha256:{hex_hash.lower()}"]
+
+    def frame_keys(self, name: str, packed: Optional[bytes]) -> List[str]:
+        """
+        Index keys for packed per-frame pHash bits.
+        Distance is measured over all frames together, matching frame_similarity().
+        """
+        if not packed:
+            return []
+
+        return self.band_keys(name, int.from_bytes(packed, "big"), len(packed) * 8)
+
+    def audio_keys(self, packed: Optional[bytes]) -> List[str]:
+        """
+        Index keys for a packed audio fingerprint: exact sub-fingerprint values
+        (at most AUDIO_INDEX_KEYS of them, see AudioFingerprinter.index_values).
+        Candidates are then scored by bit error rate over the whole fingerprint.
+        """
+        return [f"audio:32:{value:x}" for value in audio_fingerprinter.index_values(packed)]
+
+    def keys_for_hashes(self, hashes: Dict) -> List[str]:
+        """All index keys for a calculate_all_hashes() result"""
+        keys = []
+        frames = hashes.get("frame_hashes") or {}
+
+        for name, field in INDEXED_HASHES.items():
+            keys.extend(self.hex_keys(name, hashes.get(field)))
+            keys.extend(self.frame_keys(name, frames.get(name)))
+
+        keys.extend(self.audio_keys(hashes.get("audio_fingerprint")))
+
+        return keys
+
+    def keys_for_video(self, video: Dict) -> List[str]:
+        """All index keys for a stored video document (new and legacy hash formats)"""
+        return self.keys_for_hashes({
+            "original_hash": (
+                video.get("hashes", {}).get("original") or  # New format
+                video.get("original_hash") or               # Legacy format
+                video.get("perceptual_hash", {}).get("combined_hash")  # Very old format
+            ),
+            "center_region_hash": (
+                video.get("hashes", {}).get("center_region") or  # New format
+                video.get("center_region_hash")                  # Legacy format
+            ),
+            "frame_hashes": comparable_frames(video.get("hashes", {})),
+            "audio_fingerprint": video.get("hashes", {}).get("audio_fingerprint"),
+        })
+
+    async def ensure_indexes(self, db):
+        """Create the multikey index backing the band lookups"""
+        await db.videos.create_index("similarity_keys")
+        await db.videos.create_index("hashes.audio", sparse=True)
+
+    async def find_candidates(
+        self,
+        db,
+        new_hashes: Dict,
+        user_id: str,
+        scope: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Videos that may be duplicates of new_hashes
+
+        Returns every stored video within the Hamming threshold on its per-frame hashes,
+        with an identical legacy hash, sharing an indexed audio sub-fingerprint, or with
+        an identical audio hash. Results still need exact scoring (smart_duplicate_detection).
+
+        Args:
+            db: Database handle
+            new_hashes: calculate_all_hashes() result for the upload
+            user_id: Uploader
+            scope: "user" or "platform" (defaults to DUPLICATE_SEARCH_SCOPE)
+        """
+        clauses = []
+
+        keys = self.keys_for_hashes(new_hashes)
+        if keys:
+            clauses.append({"similarity_keys": {"$in": keys}})
+
+        audio_hash = new_hashes.get("audio_hash")
+        if audio_hash and audio_hash != "no_audio":
+            clauses.append({"hashes.audio": audio_hash})
+
+        if not clauses:
+            return []
+
+        query = {"$or": clauses}
+        if (scope or self.scope) != "platform":
+            query["user_id"] = user_id
+
+        # Rank by number of shared bands so the closest videos survive the candidate limit
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"_shared_bands": {"$size": {
+                "$setIntersection": [{"$ifNull": ["$similarity_keys", []]}, keys]
+            }}}},
+            {"$sort": {"_shared_bands": -1}},
+            {"$limit": self.candidate_limit},
+            {"$project": {"_id": 0, "similarity_keys": 0, "_shared_bands": 0}},
+        ]
+
+        return await db.videos.aggregate(pipeline).to_list(length=self.candidate_limit)
+
+    async def backfill(self, db, reindex: bool = False) -> int:
+        """
+        Compute index keys for videos stored before the index existed
+
+        Args:
+            reindex: Recompute keys for every video (e.g. after a hash format migration)
+        """
+        updated = 0
+        query = {} if reindex else {"similarity_keys": {"$exists": False}}
+
+        async for video in db.videos.find(query):
+            await db.videos.update_one(
+                {"_id": video["_id"]},
+                {"$set": {"similarity_keys": self.keys_for_video(video)}}
+            )
+            updated += 1
+
+        return updated
+
+
+# Global instance
+similarity_index = SimilarityIndex()
@@ -2,7 +2,6 @@
 SMS notification service using Twilio
 """
 import os
-from twilio.rest import Client
 from typing import Optional
 
 class SMSService:
@@ -14,6 +13,7 @@ class SMSService:
         
         # Initialize client if credentials exist
         if self.account_sid and self.auth_token:
+            from twilio.rest import Client  # Only needed when SMS is configured
             self.client = Client(self.account_sid, self.auth_token)
             self.enabled = True
         else:
@@ -0,0 +1,391 @@
+"""
+Object Storage
+Pluggable backend (local filesystem or S3-compatible) for stored videos, thumbnails,
+HLS renditions and images, with content-addressed, sharded object keys
+"""
+import asyncio
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.upload_ingest import sha256_file
+
+# Root of the local store (also where files from before the storage layer live)
+LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "/app/backend/uploads")
+
+# Object key prefixes served publicly by /api/media (videos are access-checked)
+PUBLIC_PREFIXES = ("thumbnails/", "images/")
+
+# User document fields holding a stored image URL (current and legacy names)
+USER_IMAGE_FIELDS = ("profile_picture_url", "profile_picture", "banner_image_url", "banner_image")
+
+
+def shard_key(prefix: str, digest: str, extension: str = "") -> str:
+    """
+    Content-addressed key: "<prefix>/ab/cd/abcd...<extension>"
+
+    Two levels of two hex characters keep every directory (or S3 listing) small.
+    """
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def id_shard_key(prefix: str, object_id: str) -> str:
+    """Sharded key for per-object directories that are not content-addressed (HLS)"""
+    digest = hashlib.sha1(object_id.encode()).hexdigest()
+    return f"{prefix}/{digest[:2]}/{object_id}"
+
+
+class LocalStorage:
+    """Objects stored as files under a root directory"""
+
+    backend = "local"
+
+    def __init__(self, root: str = LOCAL_ROOT):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        """Filesystem path of a key (keys never escape the root)"""
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path for serving the object directly"""
+        return self.path(key)
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None, move: bool = True):
+        """
+        Store a local file under key
+
+        Args:
+            move: Move the source into the store (falls back to a copy across filesystems)
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if move:
+            try:
+                os.replace(source_path, path)
+                return
+            except OSError:
+                pass
+
+        temp_path = f"{path}.tmp"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+        if move:
+            os.remove(source_path)
+
+    def put_directory(self, source_dir: str, prefix: str):
+        """Store every file under source_dir below prefix (source is moved)"""
+        path = self.path(prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.rmtree(path, ignore_errors=True)
+        shutil.move(source_dir, path)
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    @contextmanager
+    def open_local(self, key: str) -> Iterator[str]:
+        """Local path of the object for tools that need a file (ffmpeg, OpenCV)"""
+        yield self.path(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        """Direct download URL; None means the API serves the file itself"""
+        return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix: str):
+        shutil.rmtree(self.path(prefix), ignore_errors=True)
+
+
+class S3Storage:
+    """
+    Objects stored in an S3-compatible bucket (AWS S3, MinIO).
+
+    Uploads stream from disk in multipart chunks, and reads are handed to clients
+    as presigned URLs so video bytes never pass through the API process.
+    """
+
+    backend = "s3"
+
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = os.getenv("S3_BUCKET", "rendr-media")
+        self.url_expiry = int(os.getenv("S3_PRESIGNED_EXPIRY", "3600"))
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,  # e.g. http://minio:9000
+            region_name=os.getenv("S3_REGION", "us-east-1"),
+            aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID") or None,
+            aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY") or None,
+            config=Config(
+                signature_version="s3v4",
+                # Path-style URLs work with MinIO and custom endpoints
+                s3={"addressing_style": os.getenv("S3_ADDRESSING_STYLE", "path")}
+            )
+        )
+        chunk_mb = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16"))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_mb * 1024 * 1024,
+            multipart_chunksize=chunk_mb * 1024 * 1024,
+            max_concurrency=int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+        )
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None, move: bool = True):
+        """Upload a local file (multipart above the chunk size)"""
+        extra_args = {"ContentType": content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        self.client.upload_file(source_path, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        if move:
+            os.remove(source_path)
+
+    def put_directory(self, source_dir: str, prefix: str):
+        """Upload every file under source_dir below prefix (source is removed)"""
+        self.delete_prefix(prefix)
+        for directory, _, files in os.walk(source_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, source_dir).replace(os.sep, "/")
+                self.put_file(path, f"{prefix}/{relative}", move=False)
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    @contextmanager
+    def open_local(self, key: str) -> Iterator[str]:
+        """Download the object to a temp file for tools that need a local path"""
+        suffix = os.path.splitext(key)[1]
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, key, path, Config=self.transfer_config)
+            yield path
+        finally:
+            os.remove(path)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        """Presigned GET URL (optionally forcing a download file name)"""
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_expiry)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_prefix(self, prefix: str):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{prefix}/"):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects})
+
+
+class StorageService:
+    """
+    Active storage backend plus helpers for locating a video's objects.
+
+    Videos stored before the storage layer have no keys on their document; their
+    files are found at the old flat local paths (videos/<id>.mp4, thumbnails/<id>.jpg).
+    """
+
+    def __init__(self):
+        self.backend_name = os.getenv("STORAGE_BACKEND", "local")
+        self._backend = None
+        self.legacy = LocalStorage(LOCAL_ROOT)
+
+    @property
+    def backend(self):
+        """Configured backend (created on first use so boto3 is only needed for S3)"""
+        if self._backend is None:
+            self._backend = S3Storage() if self.backend_name == "s3" else LocalStorage(LOCAL_ROOT)
+        return self._backend
+
+    def store_file(self, source_path: str, prefix: str, extension: str, content_type: str) -> Dict:
+        """
+        Store a finished file under its content-addressed key (the source is consumed)
+
+        Returns:
+            {"key", "sha256", "size"}
+        """
+        stored = self.content_key(source_path, prefix, extension)
+        self.put_content(source_path, stored, content_type)
+        return stored
+
+    def content_key(self, source_path: str, prefix: str, extension: str) -> Dict:
+        """
+        Content-addressed key of a file, without storing it
+
+        Callers that must survive a crash between the move and their own bookkeeping
+        record this first, then call put_content.
+
+        Returns:
+            {"key", "sha256", "size"}
+        """
+        digest = sha256_file(source_path)
+        size = os.path.getsize(source_path)
+        return {"key": shard_key(prefix, digest, extension), "sha256": digest, "size": size}
+
+    def put_content(self, source_path: str, stored: Dict, content_type: str):
+        """
+        Move a file into the store under a key from content_key (idempotent)
+
+        A missing source is fine if its object is already stored - an earlier
+        attempt got as far as the move.
+        """
+        key = stored["key"]
+        if not os.path.exists(source_path):
+            if self.backend.exists(key):
+                return
+            raise FileNotFoundError(f"{source_path} is gone and {key} was never stored")
+
+        if self.backend.exists(key):
+            # Identical bytes already stored
+            os.remove(source_path)
+        else:
+            self.backend.put_file(source_path, key, content_type)
+
+    def video_object(self, video: Dict) -> Tuple[object, str]:
+        """(backend, key) of a video's stored MP4"""
+        key = (video.get("storage") or {}).get("video_key")
+        if key:
+            return self.backend, key
+        return self.legacy, f"videos/{video.get('id') or video.get('_id')}.mp4"
+
+    def thumbnail_object(self, video: Dict) -> Tuple[object, str]:
+        """(backend, key) of a video's thumbnail"""
+        key = (video.get("storage") or {}).get("thumbnail_key")
+        if key:
+            return self.backend, key
+        return self.legacy, f"thumbnails/{video.get('id') or video.get('_id')}.jpg"
+
+    def hls_prefix(self, video_id: str) -> str:
+        """Key prefix of a video's HLS ladder"""
+        return id_shard_key("hls", video_id)
+
+    def media_url(self, key: str) -> str:
+        """Public API URL of a thumbnail/image object"""
+        return f"/api/media/{key}"
+
+    def media_key(self, url: Optional[str]) -> Optional[str]:
+        """Key behind a media_url (None for anything else, e.g. legacy static URLs)"""
+        prefix = self.media_url("")
+        if url and url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+    async def delete_unshared_image(self, db, url: Optional[str]):
+        """
+        Delete a replaced profile/banner image unless a user still references it
+
+        Image keys are content-addressed, so users who uploaded identical bytes (or one
+        user with the same avatar and banner) share one object.
+        """
+        key = self.media_key(url)
+        if not key:
+            return
+
+        in_use = await db.users.find_one(
+            {"$or": [{field: url} for field in USER_IMAGE_FIELDS]}, {"_id": 1}
+        )
+        if in_use:
+            return
+
+        try:
+            await asyncio.to_thread(self.backend.delete, key)
+        except Exception as e:
+            print(f"⚠️ Could not delete {key}: {e}")
+
+    def _video_objects(self, video: Dict) -> List[Tuple[object, str]]:
+        """(backend, key) of every stored file of a video except its HLS ladder"""
+        objects = [self.video_object(video), self.thumbnail_object(video)]
+        for sizes in (video.get("thumbnails") or {}).values():
+            objects += [(self.backend, sizes[f]) for f in ("webp", "jpg") if sizes.get(f)]
+        return objects
+
+    async def shared_keys(self, db, video: Dict) -> Set[str]:
+        """
+        Keys of this video's objects that another video document also references
+
+        Keys are content-addressed, so identical bytes (the same source stored
+        unwatermarked for two users, identical thumbnails) share one object.
+        """
+        video_id = video.get("id") or video.get("_id")
+        keys = list({key for backend, key in self._video_objects(video) if backend is self.backend})
+        if not keys:
+            return set()
+
+        fields = ["storage.video_key", "storage.thumbnail_key"] + [
+            f"thumbnails.{size}.{f}" for size in (video.get("thumbnails") or {}) for f in ("webp", "jpg")
+        ]
+        projection = {field: 1 for field in fields}
+        cursor = db.videos.find({
+            "$nor": [{"id": video_id}, {"_id": video_id}],
+            "$or": [{field: {"$in": keys}} for field in fields]
+        }, projection)
+
+        shared = set()
+        async for other in cursor:
+            shared.update(key for _, key in self._video_objects(other) if key in keys)
+        return shared
+
+    async def delete_unshared_video_objects(self, db, video: Dict):
+        """delete_video_objects, keeping objects another video still references"""
+        shared = await self.shared_keys(db, video)
+        await asyncio.to_thread(self.delete_video_objects, video, shared)
+
+    def delete_video_objects(self, video: Dict, keep: Optional[Set[str]] = None):
+        """
+        Remove a video's MP4, thumbnails and HLS ladder (new and legacy locations)
+
+        Objects may be shared between videos; callers holding a database handle
+        should use delete_unshared_video_objects, or pass the keys to `keep`.
+        """
+        video_id = video.get("id") or video.get("_id")
+        keep = keep or set()
+
+        for backend, key in self._video_objects(video):
+            if backend is self.backend and key in keep:
+                continue
+            try:
+                backend.delete(key)
+            except Exception as e:
+                print(f"⚠️ Could not delete {key}: {e}")
+
+        try:
+            self.backend.delete_prefix(self.hls_prefix(video_id))
+        except Exception as e:
+            print(f"⚠️ Could not delete HLS output for {video_id}: {e}")
+
+# Global instance
+storage = StorageService()
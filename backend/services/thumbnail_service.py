@@ -0,0 +1,221 @@
+"""
+Thumbnail Generation
+Picks a representative frame from the sampled hash frames and renders it at
+several sizes in WebP and JPEG, plus on-demand resizes of stored images
+"""
+import math
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from services.storage import storage
+from utils.disk_cache import DiskLRUCache
+
+# OpenCV/NumPy/Pillow are imported where frames are decoded or images rendered:
+# API workers import this module for thumbnail URLs and never touch pixels
+if TYPE_CHECKING:
+    import numpy as np
+
+# Longest edge per named size
+THUMBNAIL_SIZES = {
+    "grid": 320,
+    "card": 640,
+    "full": 1280,
+}
+
+# Pillow format, save options and content type per output format
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}, "image/webp"),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}, "image/jpeg"),
+}
+
+# Size whose JPEG is the video's primary thumbnail (storage.thumbnail_key)
+PRIMARY_SIZE = "full"
+
+# Widths the resize endpoint renders (requests snap up to the next one, bounding the cache)
+RESIZE_WIDTHS = (160, 240, 320, 480, 640, 960, 1280, 1920)
+
+SCRATCH_DIR = "/app/backend/uploads/thumbnails"
+RESIZE_CACHE_DIR = "/app/backend/uploads/resized"
+
+
+def frame_score(frame: "np.ndarray") -> float:
+    """
+    How well a BGR frame represents the video (higher is better)
+
+    Near-black, blown-out and flat frames (fades, title cards) score 0; otherwise
+    contrast and sharpness are rewarded, weighted towards mid-tone exposure.
+    """
+    import cv2
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    mean = float(gray.mean())
+    contrast = float(gray.std())
+
+    if mean < 16 or mean > 240 or contrast < 8:
+        return 0.0
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    exposure = 1.0 - abs(mean - 128) / 128
+    return contrast * math.log1p(sharpness) * (0.5 + exposure)
+
+
+class ThumbnailService:
+    """
+    Renders the thumbnail set for an upload and resized variants on request.
+
+    The frame is chosen from the frames already sampled for hashing: the combined
+    media pipeline scores them as they stream past and renders the best one from
+    memory. generate() is the fallback when that pass failed, at the cost of one
+    extra decode.
+    """
+
+    def __init__(self):
+        self._frame_sampler = None
+        self.resize_cache = DiskLRUCache(
+            RESIZE_CACHE_DIR,
+            max_bytes=int(os.getenv("THUMBNAIL_RESIZE_CACHE_MB", "512")) * 1024 * 1024
+        )
+
+    @property
+    def frame_sampler(self):
+        """Frame decoder (created on first use)"""
+        if self._frame_sampler is None:
+            from services.frame_sampler import FrameSampler
+            self._frame_sampler = FrameSampler()
+        return self._frame_sampler
+
+    @staticmethod
+    def best_frame(frame_indices: List[int], scores: List[float]) -> Optional[int]:
+        """Index of the highest scoring sampled frame (None if nothing was sampled)"""
+        if not frame_indices or len(scores) != len(frame_indices):
+            return None
+        return frame_indices[max(range(len(scores)), key=scores.__getitem__)]
+
+    def _pick_frame(self, video_path: str, frame_indices: List[int]) -> Optional["np.ndarray"]:
+        """Decode the sampled frames and return the highest scoring one"""
+        best, best_score = None, -1.0
+        for _, frame in self.frame_sampler.iter_frames(video_path, frame_indices or None):
+            score = frame_score(frame)
+            if score > best_score:
+                best, best_score = frame, score
+        return best
+
+    def render(self, frame: "np.ndarray", video_id: str) -> Dict:
+        """
+        Write every size/format of a frame to the scratch directory
+
+        Returns:
+            {size: {"width", "height", "webp": path, "jpg": path}}
+        """
+        import cv2
+        from PIL import Image
+
+        os.makedirs(SCRATCH_DIR, exist_ok=True)
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        rendered = {}
+
+        for size, max_dimension in THUMBNAIL_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_dimension, max_dimension), Image.LANCZOS)  # Never upscales
+
+            entry = {"width": resized.width, "height": resized.height}
+            for extension, (pil_format, options, _) in THUMBNAIL_FORMATS.items():
+                path = os.path.join(SCRATCH_DIR, f"{video_id}_{size}.{extension}")
+                resized.save(path, pil_format, **options)
+                entry[extension] = path
+            rendered[size] = entry
+
+        return rendered
+
+    def generate(
+        self,
+        video_path: str,
+        video_id: str,
+        frame_indices: List[int],
+        frame_index: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Render the thumbnail set for a video
+
+        Args:
+            frame_indices: Frames sampled for hashing
+            frame_index: Frame already chosen by the media pipeline; when None the
+                         sampled frames are decoded and scored here
+
+        Returns:
+            Rendered set (see render) plus "frame", or None if no frame could be decoded
+        """
+        if frame_index is not None:
+            frame = next((f for _, f in self.frame_sampler.iter_frames(video_path, [frame_index])), None)
+        else:
+            frame = self._pick_frame(video_path, frame_indices)
+
+        if frame is None:
+            return None
+
+        rendered = self.render(frame, video_id)
+        rendered["frame"] = frame_index
+        return rendered
+
+    def store(self, rendered: Dict) -> Dict:
+        """
+        Move a rendered set into storage
+
+        Returns:
+            {size: {"width", "height", "webp": key, "jpg": key}} for the video document
+        """
+        stored = {}
+        for size in THUMBNAIL_SIZES:
+            entry = dict(rendered[size])
+            for extension, (_, _, content_type) in THUMBNAIL_FORMATS.items():
+                entry[extension] = storage.store_file(
+                    entry[extension], "thumbnails", f".{extension}", content_type
+                )["key"]
+            stored[size] = entry
+        return stored
+
+    @staticmethod
+    def urls(video: Dict) -> Optional[Dict]:
+        """Public URLs of a video's thumbnail set: {size: {"width", "height", "webp", "jpg"}}"""
+        thumbnails = video.get("thumbnails")
+        if not thumbnails:
+            return None
+
+        return {
+            size: {
+                **entry,
+                **{ext: storage.media_url(entry[ext]) for ext in THUMBNAIL_FORMATS}
+            }
+            for size, entry in thumbnails.items()
+        }
+
+    @staticmethod
+    def snap_width(width: int) -> int:
+        """Smallest rendered width at least as wide as the request"""
+        return next((w for w in RESIZE_WIDTHS if w >= width), RESIZE_WIDTHS[-1])
+
+    def resized(self, key: str, width: int, extension: str) -> str:
+        """
+        Path of a stored image resized to `width` (snapped) in the given format,
+        rendered once and served from the disk LRU cache afterwards
+
+        Raises:
+            KeyError: Unsupported format
+        """
+        pil_format, options, _ = THUMBNAIL_FORMATS[extension]
+        width = self.snap_width(width)
+
+        def create(path: str):
+            from PIL import Image
+
+            with storage.backend.open_local(key) as source_path:
+                with Image.open(source_path) as image:
+                    image = image.convert("RGB")
+                    image.thumbnail((width, width * 4), Image.LANCZOS)
+                    image.save(path, pil_format, **options)
+
+        return self.resize_cache.get_or_create(f"{key}|{width}|{extension}", create)
+
+
+# Global instance
+thumbnail_service = ThumbnailService()
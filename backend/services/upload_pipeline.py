@@ -0,0 +1,528 @@
+"""
+Upload Processing Pipeline
+Runs the hash-first upload workflow as a background job:
+CPU-bound hashing in a process pool, ffmpeg/OpenCV media work under bounded concurrency
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from services.job_queue import JobContext, job_queue
+from services.anchor_queue import anchor_queue
+from services.encoding_profiles import encoding_profiles
+from services.hls_packager import hls_packager
+from services.similarity_index import similarity_index
+from services.storage import storage
+from services.thumbnail_service import PRIMARY_SIZE, thumbnail_service
+from utils.lazy import LazyService
+from utils.metrics import metrics
+
+# OpenCV/imagehash/Twilio are only imported once an upload needs them, which also
+# keeps spawned process-pool workers from importing more than the hashers
+video_processor = LazyService("services.video_processor", "video_processor")
+enhanced_processor = LazyService("services.enhanced_video_processor", "enhanced_processor")
+notification_service = LazyService("services.notification_service", "notification_service")
+media_pipeline = LazyService("services.media_pipeline", "media_pipeline")
+
+UPLOAD_DIR = "/app/backend/uploads/videos"
+
+# Storage duration per tier in hours (None = unlimited)
+STORAGE_DURATIONS = {
+    "free": 24,        # 24 hours
+    "pro": 168,        # 7 days
+    "enterprise": None  # Unlimited
+}
+
+
+def _compute_hashes(video_path: str, tier: str) -> Dict:
+    """Process-pool entry point: all tier hashes for a video"""
+    return enhanced_processor.calculate_all_hashes(video_path, tier)
+
+
+def _compute_watermarked_hash(video_path: str) -> str:
+    """Process-pool entry point: full-frame hash of the watermarked output"""
+    return enhanced_processor.calculate_watermarked_hash(video_path)
+
+
+def _run_coroutine_in_thread(coro):
+    """Run a coroutine that makes blocking calls (Web3, SMTP) on its own thread and loop"""
+    return asyncio.to_thread(asyncio.run, coro)
+
+
+class UploadPipeline:
+    """
+    Background processor for uploaded videos (steps 1-10 of the upload workflow)
+    """
+
+    def __init__(self):
+        self.cpu_workers = int(os.getenv("PIPELINE_CPU_WORKERS", "2"))
+        self.ffmpeg_concurrency = int(os.getenv("PIPELINE_FFMPEG_CONCURRENCY", "2"))
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._ffmpeg_slots: Optional[asyncio.Semaphore] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # spawn: forking a process that already runs Motor/asyncio threads is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    async def _run_cpu(self, fn, *args):
+        """Run a CPU-bound function in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), fn, *args)
+
+    async def _run_media(self, fn, *args):
+        """Run a blocking ffmpeg/OpenCV call on a thread, bounded by the ffmpeg slot count"""
+        if self._ffmpeg_slots is None:
+            self._ffmpeg_slots = asyncio.Semaphore(self.ffmpeg_concurrency)
+
+        async with self._ffmpeg_slots:
+            return await asyncio.to_thread(fn, *args)
+
+    def shutdown(self):
+        """Stop the process pool"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    @staticmethod
+    def _success_result(video_doc: Dict) -> Dict:
+        """Job result for a stored video"""
+        tier = video_doc["storage"]["tier"]
+        expires_at = video_doc["storage"].get("expires_at")
+        duration_hours = STORAGE_DURATIONS.get(tier)
+
+        return {
+            "video_id": video_doc["id"],
+            "verification_code": video_doc["verification_code"],
+            "status": "success",
+            "message": "Video uploaded and verified successfully",
+            "expires_at": expires_at.isoformat() if expires_at else None,
+            "storage_duration": f"{duration_hours} hours" if duration_hours else "unlimited",
+            "tier": tier,
+            "thumbnail_url": video_doc.get("thumbnail_path")
+        }
+
+    async def process(self, ctx: JobContext) -> Dict:
+        """
+        Job handler for "video_upload" jobs
+
+        Payload:
+            video_id, user_id, file_path, content_sha256, file_size, folder_id, source, tier
+        """
+        db = ctx.queue.db
+        payload = ctx.job["payload"]
+        file_path = payload["file_path"]
+
+        try:
+            return await self._process(ctx, db, payload)
+        except Exception:
+            # Keep the upload for a retry; only discard it once the job has failed for good
+            if ctx.is_last_attempt and os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+    async def find_exact_duplicate(self, db, content_sha256: str, user_id: str) -> Optional[Dict]:
+        """
+        Stored video with byte-identical upload content (same search scope as
+        near-duplicate detection)
+        """
+        query = {"content_sha256": content_sha256}
+        if similarity_index.scope != "platform":
+            query["user_id"] = user_id
+
+        with metrics.timer("upload.exact_duplicate.lookup"):
+            match = await db.videos.find_one(
+                query,
+                {"_id": 0, "hashes.frames": 0, "hashes.audio_fingerprint": 0, "similarity_keys": 0}
+            )
+
+        metrics.increment("upload.exact_duplicate.hit" if match else "upload.exact_duplicate.miss")
+        return match
+
+    async def resolve_exact_duplicate(
+        self,
+        db,
+        file_path: str,
+        content_sha256: str,
+        user_id: str,
+        tier: str
+    ) -> Optional[Dict]:
+        """
+        Fast path for re-uploads of an identical file: returns the duplicate result
+        (and discards the upload) without decoding anything, or None if the content is new
+        """
+        match = await self.find_exact_duplicate(db, content_sha256, user_id)
+        if not match:
+            return None
+
+        return await self._handle_duplicate(db, file_path, user_id, tier, match, 1.0)
+
+    async def _process(self, ctx: JobContext, db, payload: Dict) -> Dict:
+        video_id = payload["video_id"]
+        user_id = payload["user_id"]
+        file_path = payload["file_path"]
+        tier = payload["tier"]
+        final_path = f"{UPLOAD_DIR}/{video_id}.mp4"
+
+        # A previous attempt already saved the video - nothing left to do
+        existing = await db.videos.find_one({"id": video_id}, {"_id": 0})
+        if existing:
+            return self._success_result(existing)
+
+        user = await db.users.find_one({"_id": user_id}, {"_id": 0})
+
+        print(f"\n{'='*60}")
+        print("🎬 NEW VIDEO UPLOAD - Hash-First Workflow")
+        print(f"{'='*60}")
+        print(f"   User: {user.get('username')}")
+        print(f"   Tier: {tier}")
+        print(f"   Job: {ctx.job_id} (attempt {ctx.job['attempts']})")
+
+        # A previous attempt moved the finished video into place but crashed before
+        # recording it: the source may already be gone, so resume from final_path
+        # (steps 5 and 6 recompute the watermarked hash and thumbnail frame)
+        if not ctx.state.get("media_ready") and os.path.exists(final_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            await ctx.checkpoint(media_ready=True)
+
+        # STEP 0: Byte-identical content (an identical upload may have finished while this was queued)
+        content_sha256 = payload.get("content_sha256")
+        if content_sha256 and not ctx.state.get("media_ready"):
+            duplicate = await self.resolve_exact_duplicate(db, file_path, content_sha256, user_id, tier)
+            if duplicate:
+                return duplicate
+
+        # STEP 1: Calculate ORIGINAL hash (pre-watermark)
+        original_hashes = ctx.state.get("original_hashes")
+        if not original_hashes:
+            await ctx.progress(10, "hashing", "Calculating original hash")
+            print("\n🔍 STEP 1: Calculating original hash (pre-watermark)...")
+            original_hashes = await self._run_cpu(_compute_hashes, file_path, tier)
+            await ctx.checkpoint(original_hashes=original_hashes)
+
+        print(f"   ✅ Original hash: {original_hashes['original_hash'][:32]}...")
+        print(f"   ✅ Duration: {original_hashes['duration']}s")
+        print(f"   ✅ Frames: {original_hashes['frame_count']}")
+
+        # STEP 2: Smart Duplicate Detection
+        # Skipped on retries that already committed to a new video (watermark applied)
+        if not ctx.state.get("media_ready"):
+            await ctx.progress(25, "duplicate_check", "Checking for duplicates")
+            print("\n🔍 STEP 2: Smart duplicate detection...")
+
+            # Indexed lookup: only videos within the Hamming threshold are scored
+            candidates = await similarity_index.find_candidates(db, original_hashes, user_id)
+
+            is_duplicate, matching_video, confidence = enhanced_processor.smart_duplicate_detection(
+                new_hashes=original_hashes,
+                existing_videos=candidates,
+                tier=tier
+            )
+
+            if is_duplicate:
+                return await self._handle_duplicate(db, file_path, user_id, tier, matching_video, confidence)
+
+        # STEP 3: NEW VIDEO - Generate verification code
+        verification_code = ctx.state.get("verification_code")
+        if not verification_code:
+            print("\n✅ NEW VIDEO DETECTED")
+            print("\n🔐 STEP 3: Generating verification code...")
+            verification_code = video_processor.generate_verification_code()
+            await ctx.checkpoint(verification_code=verification_code)
+        print(f"   ✅ Code: {verification_code}")
+
+        # STEPS 4-6: Watermark, thumbnail and watermarked hash in one ffmpeg pass
+        if not ctx.state.get("media_ready"):
+            await ctx.progress(40, "watermarking", "Applying watermark")
+            print("\n💧 STEP 4: Applying watermark (with watermarked hash)...")
+            watermarked_path = f"{UPLOAD_DIR}/{video_id}_watermarked.mp4"
+
+            # Pick up encoding profile changes made through the admin API
+            await encoding_profiles.refresh(db)
+
+            media = await self._run_media(
+                media_pipeline.process,
+                file_path,
+                watermarked_path,
+                video_id,
+                user.get("username", "user"),
+                user.get("watermark_position", "left"),
+                tier,
+                verification_code,
+                original_hashes['frame_count']
+            )
+
+            if media:
+                os.rename(watermarked_path, final_path)    # Rename watermarked → final
+                os.remove(file_path)
+                print(f"✅ Watermarked video saved: {final_path}")
+            else:
+                if os.path.exists(watermarked_path):
+                    os.remove(watermarked_path)
+                os.rename(file_path, final_path)
+                print("   ⚠️ Watermark failed - using original")
+
+            # Thumbnails rendered from the best frame of the same pass (step 6 otherwise)
+            rendered_thumbnails = {}
+            if media and media.thumbnails:
+                try:
+                    rendered_thumbnails["thumbnails"] = await asyncio.to_thread(thumbnail_service.store, media.thumbnails)
+                except Exception as e:
+                    print(f"   ⚠️ Thumbnail storage failed: {e}")
+
+            await ctx.checkpoint(
+                media_ready=True,
+                watermarked_hash=media.watermarked_hash if media else None,
+                thumbnail_frame=media.thumbnail_frame if media else None,
+                **rendered_thumbnails
+            )
+
+        # STEP 5: Calculate watermarked hash (only if the combined pass could not)
+        watermarked_hash = ctx.state.get("watermarked_hash")
+        if not watermarked_hash:
+            await ctx.progress(60, "watermarked_hash", "Calculating watermarked hash")
+            print("\n🔐 STEP 5: Calculating watermarked hash...")
+            # Only the full-frame hash changes after watermarking - skip center/audio passes
+            watermarked_hash = await self._run_cpu(_compute_watermarked_hash, final_path)
+            await ctx.checkpoint(watermarked_hash=watermarked_hash)
+        print(f"   ✅ Watermarked hash: {watermarked_hash[:32]}...")
+
+        # STEP 6: Thumbnails (grid/card/full, WebP + JPEG) from the most representative
+        # sampled frame - rendered during the combined pass, or decoded here if it failed
+        if "thumbnails" not in ctx.state:
+            await ctx.progress(70, "thumbnail", "Generating thumbnails")
+            print("\n📸 STEP 6: Generating thumbnails...")
+            thumbnails = None
+            try:
+                rendered = await self._run_media(
+                    thumbnail_service.generate,
+                    final_path,
+                    video_id,
+                    enhanced_processor.frame_sampler.sample_indices(original_hashes['frame_count']),
+                    ctx.state.get("thumbnail_frame")
+                )
+                if rendered:
+                    thumbnails = await asyncio.to_thread(thumbnail_service.store, rendered)
+            except Exception as e:
+                print(f"   ⚠️ Thumbnail generation failed: {e}")
+            await ctx.checkpoint(thumbnails=thumbnails)
+        thumbnails = ctx.state.get("thumbnails")
+        print(f"   {'✅ Thumbnails saved' if thumbnails else '⚠️ No thumbnail'}")
+
+        # Move the finished video into storage under its content-addressed key. The
+        # SHA-256 doubles as the strong ETag for streaming/downloads. The key is
+        # checkpointed before the move, so a retry after the move still finds the object.
+        stored_video = ctx.state.get("stored_video")
+        if not stored_video:
+            await ctx.progress(75, "storing", "Storing video")
+            print("\n📦 Storing video...")
+            stored_video = await asyncio.to_thread(storage.content_key, final_path, "videos", ".mp4")
+            await ctx.checkpoint(stored_video=stored_video)
+        await asyncio.to_thread(storage.put_content, final_path, stored_video, "video/mp4")
+        print(f"   ✅ Stored as {stored_video['key']} ({storage.backend_name})")
+
+        # STEP 7: Calculate expiration
+        print("\n⏰ STEP 7: Setting storage expiration...")
+        uploaded_at = datetime.now(timezone.utc)
+        duration_hours = STORAGE_DURATIONS.get(tier)
+
+        if duration_hours:
+            expires_at = uploaded_at + timedelta(hours=duration_hours)
+            print(f"   ⏰ Tier: {tier} - Expires in {duration_hours} hours")
+            print(f"   ⏰ Expiration: {expires_at}")
+        else:
+            expires_at = None
+            print(f"   ♾️ Tier: {tier} - Unlimited storage")
+
+        # STEP 8: Blockchain (optional) - queued for the next Merkle batch, confirmed later
+        print("\n⛓️ STEP 8: Queueing blockchain anchor...")
+        blockchain_anchor = anchor_queue.pending_anchor(
+            video_id, original_hashes['original_hash'], stored_video["sha256"]
+        )
+        print(f"   {'✅ Queued for the next anchor batch' if blockchain_anchor else 'ℹ️ Blockchain disabled'}")
+
+        # STEP 9: Save to database
+        await ctx.progress(90, "saving", "Saving video")
+        print("\n💾 STEP 9: Saving to database...")
+
+        video_doc = {
+            "_id": video_id,
+            "id": video_id,
+            "user_id": user_id,
+            "verification_code": verification_code,
+            "source": payload["source"],
+            "uploaded_at": uploaded_at,
+
+            # SHA-256 of the uploaded (pre-watermark) file for the exact-duplicate fast path
+            "content_sha256": content_sha256,
+            "file_size": payload.get("file_size"),
+
+            # Enhanced hashes (NEW)
+            "hashes": {
+                "original": original_hashes['original_hash'],
+                # Record only, never matched against (see services/media_pipeline.py)
+                "watermarked": watermarked_hash,
+                "center_region": original_hashes.get('center_region_hash'),
+                "audio": original_hashes.get('audio_hash'),
+                # 32-bit spectral sub-fingerprints as packed bytes (BSON binary)
+                "audio_fingerprint": original_hashes.get('audio_fingerprint'),
+                "metadata": original_hashes['metadata_hash'],
+                "sampling_mode": original_hashes['sampling_mode'],
+                # Per-frame 256-bit pHashes as packed bytes (BSON binary)
+                "frames": original_hashes['frame_hashes'],
+                "version": 2
+            },
+
+            # Storage management (NEW)
+            "storage": {
+                "tier": tier,
+                "uploaded_at": uploaded_at,
+                "expires_at": expires_at,
+                "warned_at": None,
+                "download_count": 0,
+                "backend": storage.backend_name,
+                "video_key": stored_video["key"],
+                "thumbnail_key": thumbnails[PRIMARY_SIZE]["jpg"] if thumbnails else None,
+                "file_sha256": stored_video["sha256"],
+                "file_size": stored_video["size"]
+            },
+
+            # Legacy fields (keep for compatibility)
+            "perceptual_hash": {
+                "combined_hash": original_hashes['original_hash']
+            },
+            "video_metadata": {
+                "duration": original_hashes['duration'],
+                "frame_count": original_hashes['frame_count'],
+                "resolution": original_hashes['resolution']
+            },
+            "thumbnail_path": storage.media_url(thumbnails[PRIMARY_SIZE]["jpg"]) if thumbnails else None,
+            # Storage keys per size and format (see services/thumbnail_service.py)
+            "thumbnails": thumbnails,
+            "folder_id": payload.get("folder_id"),
+            "showcase_folder_id": payload.get("folder_id"),  # NEW: Also set showcase folder
+            "blockchain_signature": None,  # Filled in once the anchor batch confirms
+            "blockchain_anchor": blockchain_anchor,
+            "verification_status": "verified",
+            "is_public": True,  # NEW: Default to public for showcase
+
+            # Adaptive bitrate ladder, filled in by the "video_hls" job
+            "hls": {"status": "pending"} if hls_packager.should_package(tier) else None,
+
+            # Near-duplicate index keys (see services/similarity_index.py)
+            "similarity_keys": similarity_index.keys_for_hashes(original_hashes)
+        }
+
+        try:
+            await db.videos.insert_one(video_doc)
+        except DuplicateKeyError:
+            # Saved by an earlier attempt whose completion was not recorded...
+            saved = await db.videos.find_one({"id": video_id}, {"_id": 0})
+            if saved:
+                video_doc = saved
+            else:
+                # ...or an identical upload processed concurrently got there first
+                match = content_sha256 and await self.find_exact_duplicate(db, content_sha256, user_id)
+                if not match:
+                    raise
+                # Discard our copies, keeping any object the matching video shares
+                await storage.delete_unshared_video_objects(db, video_doc)
+                return await self._handle_duplicate(db, file_path, user_id, tier, match, 1.0)
+        print("   ✅ Saved to database")
+
+        # Optional post-processing: HLS ladder for showcase playback (runs as its own job)
+        if hls_packager.should_package(tier) and (video_doc.get("hls") or {}).get("status") == "pending":
+            try:
+                await job_queue.enqueue(db, "video_hls", {"video_id": video_id}, user_id=user_id, video_id=video_id)
+                print("   📺 HLS packaging queued")
+            except Exception as e:
+                print(f"   ⚠️ Could not queue HLS packaging: {e}")
+
+        # STEP 10: Send notification (if applicable)
+        print("\n📧 STEP 10: Checking notification preferences...")
+
+        should_notify = original_hashes['duration'] >= user.get('notify_video_length_threshold', 30)
+
+        if should_notify:
+            print(f"   📧 Video length ({original_hashes['duration']}s) exceeds threshold - sending notification")
+
+            download_url = f"https://rendr-studio-1.preview.emergentagent.com/dashboard?video={video_id}"
+
+            try:
+                notification_results = await _run_coroutine_in_thread(
+                    notification_service.send_video_ready_notification(
+                        user=user,
+                        verification_code=verification_code,
+                        download_url=download_url,
+                        video_duration=original_hashes['duration']
+                    )
+                )
+                print(f"   📧 Email sent: {notification_results.get('email', False)}")
+                print(f"   📱 SMS sent: {notification_results.get('sms', False)}")
+            except Exception as e:
+                print(f"   ⚠️ Notification failed: {e}")
+        else:
+            print(f"   ℹ️ Video too short ({original_hashes['duration']}s < threshold) - skipping notification")
+
+        print(f"\n{'='*60}")
+        print("✅ UPLOAD COMPLETE")
+        print(f"{'='*60}\n")
+
+        return self._success_result(video_doc)
+
+    async def _handle_duplicate(
+        self,
+        db,
+        file_path: str,
+        user_id: str,
+        tier: str,
+        matching_video: Dict,
+        confidence: float
+    ) -> Dict:
+        """Discard the upload and return the existing video's code"""
+        print("\n🚨 DUPLICATE DETECTED!")
+        print(f"   Confidence: {confidence:.2%}")
+        print(f"   Original code: {matching_video['verification_code']}")
+        print(f"   Original upload: {matching_video.get('uploaded_at')}")
+
+        # Delete temp file
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+        # Update expiration if needed (extend storage) - only for the uploader's own videos
+        if matching_video.get('user_id') == user_id and matching_video.get('storage', {}).get('expires_at'):
+            duration = STORAGE_DURATIONS.get(tier)
+
+            if duration:
+                new_expiration = datetime.now(timezone.utc) + timedelta(hours=duration)
+                await db.videos.update_one(
+                    {"id": matching_video['id']},
+                    {"$set": {"storage.expires_at": new_expiration}}
+                )
+                print(f"   ✅ Storage extended to: {new_expiration}")
+
+        uploaded_at = matching_video.get('uploaded_at')
+
+        return {
+            "video_id": matching_video['id'],
+            "verification_code": matching_video['verification_code'],
+            "status": "duplicate",
+            "message": "This video was already uploaded. Returning existing verification code.",
+            "duplicate_detected": True,
+            "confidence_score": confidence,
+            "original_upload_date": uploaded_at.isoformat() if isinstance(uploaded_at, datetime) else uploaded_at
+        }
+
+
+# Global instance
+upload_pipeline = UploadPipeline()
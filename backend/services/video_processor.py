@@ -1,5 +1,6 @@
 import cv2
 import imagehash
+import numpy as np
 from PIL import Image
 import uuid
 import random
@@ -7,11 +8,26 @@ import string
 import os
 from typing import Dict, List, Tuple
 
+from services.frame_sampler import FrameSampler, same_sampled_frames
+from services.hash_comparator import hex_frames_to_matrix, batch_frame_distances
+
+# Stored perceptual hashes were taken from the frames at their sample indices, so
+# verification samples by index whatever FRAME_SAMPLING_MODE is (sequential picks
+# the same frames as exact without re-seeking)
+index_sampler = FrameSampler(mode="sequential")
+
+
 class VideoProcessor:
     
     @staticmethod
-    def extract_frames(video_path: str, num_frames: int = 10):
-        """Extract evenly spaced frames from video"""
+    def extract_frames(video_path: str, num_frames: int = 10, sampling_mode: str = None):
+        """
+        Extract evenly spaced frames from video
+        
+        Args:
+            sampling_mode: Mode the hashes being compared against were sampled with
+                (None = index sampling, as for every stored perceptual_hash)
+        """
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
@@ -21,23 +37,23 @@ class VideoProcessor:
         fps = cap.get(cv2.CAP_PROP_FPS)
         duration = total_frames / fps if fps > 0 else 0
         
+        cap.release()
+        
         frame_indices = [int(i * total_frames / num_frames) for i in range(num_frames)]
         frames = []
         
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                pil_image = Image.fromarray(frame_rgb)
-                frames.append(pil_image)
-        
-        cap.release()
+        sampler = FrameSampler(mode="keyframe") if sampling_mode == "keyframe" else index_sampler
+        plan = sampler.sampling_plan(video_path, frame_indices, fps)
+        for _, frame in sampler.iter_frames(video_path, frame_indices, plan):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            pil_image = Image.fromarray(frame_rgb)
+            frames.append(pil_image)
         
         metadata = {
             "total_frames": total_frames,
             "fps": float(fps),
-            "duration_seconds": float(duration)
+            "duration_seconds": float(duration),
+            "sampling_mode": plan[0]
         }
         
         return frames, metadata
@@ -61,10 +77,75 @@ class VideoProcessor:
             "hash_size": 8
         }
     
+    @staticmethod
+    def frame_hash_matrix(hashes: List[Dict]) -> np.ndarray:
+        """
+        Stack stored perceptual hashes into an (N, frames) uint64 matrix
+        for compare_hashes_batch (8x8 pHash = one uint64 per frame)
+        """
+        return np.stack([
+            hex_frames_to_matrix(h['frame_hashes'], 64)[:, 0]
+            for h in hashes
+        ])
+    
+    @staticmethod
+    def compare_hashes_batch(query_hash: Dict, candidates: np.ndarray) -> Dict:
+        """
+        Compare one video hash against N stored hashes in one vectorised call
+        
+        Args:
+            query_hash: calculate_perceptual_hash() result
+            candidates: (N, frames) uint64 matrix of stored frame hashes (see frame_hash_matrix)
+        
+        Returns:
+            {
+                "distances": (N, frames) per-frame Hamming distances,
+                "frame_similarity": (N, frames) per-frame similarity (0-100),
+                "similarity_scores": (N,) percentage of matching frames (0-100)
+            }
+        """
+        candidates = np.asarray(candidates, dtype=np.uint64)
+        n_frames = len(query_hash['frame_hashes'])
+        
+        # No candidates or no frames: nothing matches (and no 0/0 scores)
+        if len(candidates) == 0 or n_frames == 0:
+            distances = np.zeros((len(candidates), n_frames), dtype=np.uint32)
+            return {
+                "distances": distances,
+                "frame_similarity": distances.astype(np.int64),
+                "similarity_scores": np.zeros(len(candidates))
+            }
+        
+        query = hex_frames_to_matrix(query_hash['frame_hashes'], 64)
+        distances = batch_frame_distances(query, candidates)
+        
+        # Same scoring as the per-pair comparison: 2 points per differing bit,
+        # a frame matches at >= 90% similarity
+        frame_similarity = np.maximum(0, 100 - distances.astype(np.int64) * 2)
+        matches = (frame_similarity >= 90).sum(axis=1)
+        
+        return {
+            "distances": distances,
+            "frame_similarity": frame_similarity,
+            "similarity_scores": matches / distances.shape[1] * 100
+        }
+    
     @staticmethod
     def compare_hashes(original_hash: Dict, new_hash: Dict) -> Dict:
-        """Compare two video hashes"""
-        if len(original_hash['frame_hashes']) != len(new_hash['frame_hashes']):
+        """
+        Compare two video hashes
+        
+        Raises:
+            ValueError: The hashes were taken from different frames (sampling modes
+                differ), so a frame-by-frame comparison would mean nothing
+        """
+        if not same_sampled_frames(original_hash.get('sampling_mode'), new_hash.get('sampling_mode')):
+            raise ValueError(
+                f"Hashes sampled in {original_hash.get('sampling_mode') or 'exact'} and "
+                f"{new_hash.get('sampling_mode') or 'exact'} mode are not comparable"
+            )
+        
+        if not new_hash['frame_hashes'] or len(original_hash['frame_hashes']) != len(new_hash['frame_hashes']):
             return {
                 "similarity_score": 0.0,
                 "confidence_level": "low",
@@ -72,27 +153,23 @@ class VideoProcessor:
                 "frame_comparison": []
             }
         
-        matches = 0
-        total = len(original_hash['frame_hashes'])
-        frame_comparison = []
+        batch = VideoProcessor.compare_hashes_batch(
+            new_hash,
+            VideoProcessor.frame_hash_matrix([original_hash])
+        )
         
-        for i, (h1, h2) in enumerate(zip(original_hash['frame_hashes'], new_hash['frame_hashes'])):
-            hash1_obj = imagehash.hex_to_hash(h1)
-            hash2_obj = imagehash.hex_to_hash(h2)
-            distance = hash1_obj - hash2_obj
-            
-            similarity = max(0, 100 - (distance * 2))
-            
-            if similarity >= 90:
-                matches += 1
-            
-            frame_comparison.append({
+        frame_comparison = [
+            {
                 "frame": i + 1,
                 "similarity": float(similarity),
                 "distance": int(distance)
-            })
+            }
+            for i, (similarity, distance) in enumerate(
+                zip(batch["frame_similarity"][0], batch["distances"][0])
+            )
+        ]
         
-        overall_similarity = (matches / total) * 100
+        overall_similarity = float(batch["similarity_scores"][0])
         
         # Determine result
         if overall_similarity >= 85:
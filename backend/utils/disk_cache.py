@@ -0,0 +1,127 @@
+"""
+Disk LRU Cache
+Stores generated files (overlays, resized images) under a directory with
+least-recently-used eviction by total size
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+# Eviction trims the cache to this fraction of max_bytes, so the directory scan
+# it needs runs once per ~10% of max_bytes written rather than on every miss
+EVICT_TARGET = 0.9
+
+# Other processes write to the same directory unseen by our size estimate, so
+# a miss also rescans when the last scan is older than this
+RESCAN_SECONDS = 60
+
+# Entries used this recently are never evicted: a path just returned by get()
+# (here or in another process) stays readable while its caller opens it
+EVICT_GRACE_SECONDS = 60
+
+
+class DiskLRUCache:
+    """
+    File cache keyed by arbitrary strings.
+
+    Entries are written atomically (temp file + rename), so concurrent readers never
+    see partial files. Recency is tracked through file mtimes, so the LRU order
+    survives restarts and is shared by every process using the same directory.
+
+    The total size is tracked incrementally between periodic scans; only
+    eviction lists the directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # Estimated bytes on disk (None until the first scan)
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        """File path an entry is stored at"""
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached entry (marked as recently used), or None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key: str, create: Callable[[str], None]) -> str:
+        """
+        Path of a cached entry, creating it with create(path) on a miss
+
+        create() writes the file at the path it is given.
+        """
+        path = self.get(key)
+        if path:
+            return path
+
+        path = self.path_for(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            create(temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            due = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.monotonic() - self._scanned_at > RESCAN_SECONDS
+            )
+        if due:
+            self._evict()
+        return path
+
+    def _evict(self):
+        """
+        Rescan the directory and, if it is over max_bytes, remove least recently
+        used entries until it is under EVICT_TARGET of it
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+
+            if total > self.max_bytes:
+                protected_after = time.time() - EVICT_GRACE_SECONDS
+                for path, size, mtime in entries:
+                    if total <= self.max_bytes * EVICT_TARGET or mtime > protected_after:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass  # Evicted by another process
+                    total -= size
+
+            self._size = total
+            self._scanned_at = time.monotonic()
+
+    def _entries(self):
+        """(path, size, mtime) for every cached file"""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process since it was listed
+            yield entry.path, stat.st_size, stat.st_mtime
@@ -0,0 +1,35 @@
+"""
+Faceted Counts
+Several counts over one collection in a single $facet aggregation: one round
+trip and one collection scan instead of a count_documents call per number.
+"""
+from typing import Dict, List, Union
+
+Facet = Union[Dict, List[Dict]]
+
+
+def count_pipeline(facets: Dict[str, Facet]) -> List[Dict]:
+    """
+    $facet pipeline counting each named facet
+
+    A facet is a query filter (same semantics as count_documents, {} counts the
+    whole collection) or a list of pipeline stages whose output is counted.
+    """
+    stages = {}
+    for name, facet in facets.items():
+        if isinstance(facet, dict):
+            facet = [{"$match": facet}] if facet else []
+        stages[name] = list(facet) + [{"$count": "n"}]
+    return [{"$facet": stages}]
+
+
+async def facet_counts(collection, facets: Dict[str, Facet]) -> Dict[str, int]:
+    """
+    Run count_pipeline() against a collection
+
+    Returns:
+        {facet name: count}
+    """
+    results = await collection.aggregate(count_pipeline(facets)).to_list(length=1)
+    result = results[0] if results else {}
+    return {name: result[name][0]["n"] if result.get(name) else 0 for name in facets}
@@ -0,0 +1,92 @@
+"""
+HyperLogLog
+Constant-memory distinct counting for unique visitors. Sketches merge by taking
+the per-register maximum, so daily sketches combine into any day range, and
+MongoDB can update stored registers atomically with $max.
+
+With the default precision (p=12, 4096 registers) the relative standard error is
+1.04 / sqrt(4096) = 1.6%: about 2 in 3 estimates are within 1.6% of the true
+count and about 19 in 20 within 3.3%. Small counts use linear counting and are
+near-exact.
+"""
+import hashlib
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+PRECISION = 12
+HASH_BITS = 64
+
+
+def register_update(value: str, p: int = PRECISION) -> Tuple[int, int]:
+    """
+    Register a value lands in and the rank it sets there
+
+    Returns:
+        (register index, rank) - rank is the position of the first 1 bit in the
+        remaining hash bits, 1-based
+    """
+    hashed = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+    index = hashed >> (HASH_BITS - p)
+    remainder = hashed & ((1 << (HASH_BITS - p)) - 1)
+    return index, (HASH_BITS - p) - remainder.bit_length() + 1
+
+
+class HyperLogLog:
+    """A sketch of 2^p one-byte registers"""
+
+    def __init__(self, p: int = PRECISION, registers: Optional[bytearray] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of count()"""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str):
+        index, rank = register_update(value, self.p)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog"):
+        """Union with another sketch of the same precision (in place)"""
+        if other.p != self.p:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def merge_registers(self, registers: Dict[str, int]):
+        """Union with sparse stored registers ({"<index>": rank}, see fields())"""
+        for index, rank in registers.items():
+            index = int(index)
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def fields(self) -> Dict[str, int]:
+        """Non-zero registers as {"<index>": rank} (for a MongoDB $max update)"""
+        return {str(index): rank for index, rank in enumerate(self.registers) if rank}
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+
+        # 64-bit hashes: no large-range correction needed at any realistic count
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(int(math.log2(len(data))), bytearray(data))
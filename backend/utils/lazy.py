@@ -0,0 +1,50 @@
+"""
+Lazy Services
+Stand-ins for module-level service instances that import their module (and its
+heavy dependencies: OpenCV, web3, Twilio...) on first use instead of at startup
+"""
+import importlib
+import threading
+from typing import Any, Optional
+
+
+class LazyService:
+    """
+    Proxy for `module.name`, resolved on first attribute access.
+
+        video_processor = LazyService("services.video_processor", "video_processor")
+        video_processor.generate_verification_code()  # imports the module here
+
+    Resolution is thread-safe (services are also used from worker threads).
+    """
+
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = getattr(importlib.import_module(self._module), self._name)
+        return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only reached for attributes not set in __init__
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyService {self._module}.{self._name} ({state})>"
+
+
+def loaded(service: Any) -> Optional[Any]:
+    """
+    The instance behind a service if it has been created, else None
+    (for shutdown hooks that should not import a service just to stop it)
+    """
+    if isinstance(service, LazyService):
+        return service._target
+    return service
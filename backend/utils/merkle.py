@@ -0,0 +1,78 @@
+"""
+Merkle Trees
+SHA-256 Merkle roots and inclusion proofs for batch-anchoring video hashes
+in a single blockchain transaction
+"""
+import hashlib
+from typing import Dict, List
+
+# Domain separation: a leaf can never be mistaken for an interior node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(data: bytes) -> bytes:
+    """Hash of one leaf's data"""
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """Hash of an interior node"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """
+    Every level of the tree, leaves first and root last
+
+    An odd node at the end of a level is promoted unchanged to the next level
+    (no duplication, so a batch cannot prove the same leaf twice).
+    """
+    if not leaves:
+        raise ValueError("Merkle tree needs at least one leaf")
+
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [
+            node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(leaves: List[bytes]) -> bytes:
+    """Root of a tree over already-hashed leaves"""
+    return build_levels(leaves)[-1][0]
+
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[Dict[str, str]]:
+    """
+    Inclusion proof for the leaf at index
+
+    Returns:
+        Sibling hashes from the leaf upwards: [{"side": "left"|"right", "hash": hex}]
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                "side": "left" if sibling < index else "right",
+                "hash": level[sibling].hex()
+            })
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: bytes, proof: List[Dict[str, str]], root: bytes) -> bool:
+    """True if the proof connects the leaf hash to the root"""
+    current = leaf
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        if step["side"] == "left":
+            current = node_hash(sibling, current)
+        else:
+            current = node_hash(current, sibling)
+    return current == root
@@ -0,0 +1,61 @@
+"""
+In-Process Metrics
+Counters and timings for hot paths, exposed through the admin metrics endpoint.
+Values are per worker process and reset on restart.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe counters and timing summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.time()
+
+    def increment(self, name: str, value: int = 1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        """Record one duration"""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time a block: `with metrics.timer("name"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict:
+        """Current values (timings in milliseconds)"""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "counters": dict(self._counters),
+                "timings": {
+                    name: {
+                        "count": t["count"],
+                        "avg_ms": round(t["total"] / t["count"] * 1000, 3) if t["count"] else 0.0,
+                        "max_ms": round(t["max"] * 1000, 3),
+                    }
+                    for name, t in self._timings.items()
+                },
+            }
+
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,222 @@
+"""
+Range-Aware File Responses
+Byte-range (206), conditional (304) and zero-copy file responses for media streaming
+"""
+import os
+import stat
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from starlette.responses import RedirectResponse, Response
+
+# Bytes per body message when the server cannot sendfile
+CHUNK_SIZE = 256 * 1024
+
+# ASGI extension for sendfile-style responses (advertised by the server in scope)
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison (weak: W/ prefixes are ignored)"""
+    if if_none_match.strip() == "*":
+        return True
+
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into an inclusive (start, end)
+
+    Returns:
+        (start, end), or None to serve the whole file (unsupported or multi-range)
+
+    Raises:
+        HTTPException(416): Range cannot be satisfied
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+        else:
+            # Suffix range: last N bytes
+            start = max(file_size - int(end_text), 0)
+            end = file_size - 1
+    except ValueError:
+        return None
+
+    if start >= file_size or start > end:
+        raise HTTPException(
+            416,
+            "Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    return start, min(end, file_size - 1)
+
+
+class RangeFileResponse(Response):
+    """
+    Sends [start, end] of a file, using the server's zero-copy sendfile extension
+    when available and chunked reads otherwise
+    """
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: Dict[str, str],
+        media_type: str
+    ):
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**headers, "content-length": str(self.length)})
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = self.length
+
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+
+            if remaining > 0:
+                # File shrank while sending - close the body
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def file_response(
+    request: Request,
+    path: str,
+    etag: Optional[str] = None,
+    media_type: str = "application/octet-stream",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve a file honouring If-None-Match, If-Range and Range
+
+    Args:
+        etag: Strong ETag (quoted) derived from the file content. When given, a
+              matching If-None-Match is answered with 304 without touching the file.
+              Otherwise a weak ETag is derived from mtime and size.
+        headers: Extra headers (e.g. Cache-Control, Content-Disposition)
+
+    Raises:
+        HTTPException(404): File does not exist
+        HTTPException(416): Range cannot be satisfied
+    """
+    headers = dict(headers or {})
+    if_none_match = request.headers.get("if-none-match")
+
+    if etag and if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={**headers, "etag": etag})
+
+    try:
+        file_stat = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(404, "File not found")
+
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise HTTPException(404, "File not found")
+
+    if not etag:
+        etag = f'W/"{int(file_stat.st_mtime)}-{file_stat.st_size}"'
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={**headers, "etag": etag})
+
+    headers.update({
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(file_stat.st_mtime, usegmt=True),
+    })
+
+    file_size = file_stat.st_size
+    byte_range = None
+
+    range_header = request.headers.get("range")
+    if range_header and file_size > 0:
+        # If-Range: only honour the range if the client's copy is current (strong match)
+        if_range = request.headers.get("if-range")
+        if not if_range or (if_range == etag and not etag.startswith("W/")):
+            byte_range = parse_range(range_header, file_size)
+
+    if byte_range is None:
+        return RangeFileResponse(path, 0, file_size - 1, 200, headers, media_type)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+    return RangeFileResponse(path, start, end, 206, headers, media_type)
+
+
+async def object_response(
+    request: Request,
+    backend,
+    key: str,
+    etag: Optional[str] = None,
+    media_type: str = "application/octet-stream",
+    headers: Optional[Dict[str, str]] = None,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Serve a stored object: a 307 redirect to a presigned URL when the storage
+    backend provides one (the client fetches the bytes directly, ranges included),
+    otherwise the local file via file_response
+
+    Args:
+        backend: Storage backend holding the object (see services/storage.py)
+        filename: Download file name for the presigned URL's Content-Disposition
+    """
+    url = await anyio.to_thread.run_sync(backend.url, key, filename)
+    if url:
+        return RedirectResponse(url, status_code=307, headers={"cache-control": "private, no-store"})
+
+    return await file_response(request, backend.local_path(key), etag, media_type, headers)
@@ -0,0 +1,82 @@
+"""
+TTL Cache
+Small in-process cache with per-entry expiry and LRU eviction, for hot lookups
+that can tolerate a few seconds of staleness
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Maps keys to values for at most `ttl` seconds, holding at most `maxsize` entries.
+    Values are per process; invalidate() only clears this process's copy.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Per-key lock and the number of callers holding or waiting on it
+        self._locks: Dict[Hashable, list] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value, or default if missing or expired"""
+        entry = self._entries.get(key, self._MISSING)
+        if entry is self._MISSING:
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value (ttl overrides the cache default)"""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached value, or the result of `await compute()` stored under key
+
+        Concurrent misses for the same key wait for a single computation rather
+        than all running it.
+        """
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+
+        # The lock is dropped only once nobody holds or awaits it, so a later miss
+        # can never create a second lock for a key that is still being computed
+        slot = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                value = self.get(key, self._MISSING)
+                if value is self._MISSING:
+                    value = await compute()
+                    self.set(key, value)
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._locks.pop(key, None)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Drop one entry"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
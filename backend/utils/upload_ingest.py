@@ -0,0 +1,220 @@
+"""
+Streaming Upload Ingestion
+Parses multipart uploads straight off the request stream, writing the file part to
+disk in chunks while computing its SHA-256 and size, so the byte-exact content hash
+is available before any decoding starts and oversized uploads are cut off early
+"""
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request
+
+# Bytes read/written per chunk
+INGEST_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Allowance for multipart boundaries, part headers and text fields on top of the
+# file size when checking a declared Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Largest accepted text form field
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+# Upload size limits per tier (MB)
+MAX_UPLOAD_MB = {
+    "free": int(os.getenv("MAX_UPLOAD_MB_FREE", "500")),
+    "pro": int(os.getenv("MAX_UPLOAD_MB_PRO", "2048")),
+    "enterprise": int(os.getenv("MAX_UPLOAD_MB_ENTERPRISE", "10240")),
+}
+
+
+@dataclass
+class IngestedFile:
+    """A stored upload and its byte-exact fingerprint"""
+    path: str
+    size: int
+    sha256: str
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its size limit while being streamed"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+
+def max_upload_bytes(tier: str) -> int:
+    """Size limit for a tier in bytes"""
+    return MAX_UPLOAD_MB.get(tier, MAX_UPLOAD_MB["free"]) * 1024 * 1024
+
+
+def sha256_file(path: str, chunk_size: int = INGEST_CHUNK_SIZE) -> str:
+    """SHA-256 of a file, read in chunks (constant memory)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def ingest_upload(
+    request: Request,
+    file_field: str,
+    dest_path_for: Callable[[str], str],
+    max_bytes: Optional[int] = None,
+    max_field_bytes: int = MAX_FORM_FIELD_BYTES
+) -> Tuple[IngestedFile, Dict[str, str]]:
+    """
+    Stream a multipart/form-data request body to disk, fingerprinting the file part
+
+    The body is parsed straight from request.stream(): the file part named file_field
+    is hashed and written to dest_path_for(filename) as it arrives, so it is read
+    once and the upload is cut off as soon as it passes max_bytes (a declared
+    Content-Length that can't fit is rejected before reading anything). Endpoints
+    using this must take the Request instead of File()/Form() parameters, which
+    would make FastAPI spool the whole body first. Other text fields are returned
+    as a dict; the partial file is removed on any failure, including disconnects.
+
+    Returns:
+        (IngestedFile, form fields)
+
+    Raises:
+        HTTPException(400): Not a multipart body, or malformed
+        HTTPException(413): Upload exceeds max_bytes
+        HTTPException(422): No file part named file_field
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(400, "Expected a multipart/form-data upload")
+
+    declared_length = request.headers.get("content-length")
+    if (
+        max_bytes is not None
+        and declared_length is not None
+        and declared_length.isdigit()
+        and int(declared_length) > max_bytes + MULTIPART_OVERHEAD_BYTES
+    ):
+        raise HTTPException(413, str(UploadTooLarge(max_bytes)))
+
+    # Parser callbacks only queue events; they are applied between body chunks
+    events: List[Tuple[str, bytes]] = []
+    callbacks = {
+        "on_part_begin": lambda: events.append(("part_begin", b"")),
+        "on_part_data": lambda data, start, end: events.append(("part_data", data[start:end])),
+        "on_header_field": lambda data, start, end: events.append(("header_field", data[start:end])),
+        "on_header_value": lambda data, start, end: events.append(("header_value", data[start:end])),
+        "on_header_end": lambda: events.append(("header_end", b"")),
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+    }
+    parser = multipart.MultipartParser(boundary, callbacks)
+
+    fields: Dict[str, str] = {}
+    digest = hashlib.sha256()
+    size = 0
+    dest_path: Optional[str] = None
+    out: Optional[BinaryIO] = None
+    pending: List[bytes] = []
+    pending_size = 0
+    file_done = False
+
+    header_field = b""
+    header_value = b""
+    disposition = b""
+    part_name: Optional[str] = None
+    part_target: Optional[str] = None  # "file", "field" or None (discarded)
+    field_value = bytearray()
+
+    async def flush():
+        nonlocal pending, pending_size
+        if pending:
+            await asyncio.to_thread(out.writelines, pending)
+            pending, pending_size = [], 0
+
+    async def finish_part():
+        nonlocal part_target, file_done
+        if part_target == "file":
+            await flush()
+            file_done = True
+        elif part_target == "field":
+            fields[part_name] = field_value.decode("utf-8", errors="replace")
+        part_target = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+
+            for event, data in events:
+                if event == "part_begin":
+                    await finish_part()
+                    disposition = b""
+                    header_field = b""
+                    header_value = b""
+                    field_value = bytearray()
+                elif event == "header_field":
+                    header_field += data
+                elif event == "header_value":
+                    header_value += data
+                elif event == "header_end":
+                    if header_field.lower() == b"content-disposition":
+                        disposition = header_value
+                    header_field = b""
+                    header_value = b""
+                elif event == "headers_finished":
+                    _, options = parse_options_header(disposition)
+                    if b"name" not in options:
+                        raise HTTPException(400, "Malformed multipart upload: part without a name")
+                    part_name = options[b"name"].decode("utf-8", errors="replace")
+                    filename = options.get(b"filename")
+
+                    if filename is None:
+                        part_target = "field"
+                    elif part_name == file_field and out is None:
+                        name = os.path.basename(filename.decode("utf-8", errors="replace"))
+                        dest_path = dest_path_for(name)
+                        out = await asyncio.to_thread(open, dest_path, "wb")
+                        part_target = "file"
+                    else:
+                        part_target = None
+                elif event == "part_data":
+                    if part_target == "file":
+                        size += len(data)
+                        if max_bytes is not None and size > max_bytes:
+                            raise UploadTooLarge(max_bytes)
+                        digest.update(data)
+                        pending.append(data)
+                        pending_size += len(data)
+                        if pending_size >= INGEST_CHUNK_SIZE:
+                            await flush()
+                    elif part_target == "field":
+                        field_value.extend(data)
+                        if len(field_value) > max_field_bytes:
+                            raise HTTPException(413, f"Form field '{part_name}' is too large")
+
+            events.clear()
+
+        parser.finalize()
+        await finish_part()
+
+        if out is None or not file_done:
+            raise HTTPException(422, f"Missing file field '{file_field}'")
+
+        await asyncio.to_thread(out.close)
+    except BaseException as e:
+        if out is not None:
+            out.close()
+        if dest_path is not None and os.path.exists(dest_path):
+            os.remove(dest_path)
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(413, str(e))
+        if isinstance(e, MultipartParseError):
+            raise HTTPException(400, f"Malformed multipart upload: {e}")
+        raise
+
+    return IngestedFile(path=dest_path, size=size, sha256=digest.hexdigest()), fields
@@ -1,13 +1,112 @@
 import subprocess
 import os
+import uuid
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from PIL.PngImagePlugin import PngInfo
 from typing import Optional
 
+from utils.disk_cache import DiskLRUCache
+
+# Disk budget for cached overlays (MB)
+OVERLAY_CACHE_MB = int(os.getenv("WATERMARK_OVERLAY_CACHE_MB", "64"))
+
 class WatermarkProcessor:
     def __init__(self):
         self.logo_path = "/app/backend/assets/rendr_logo.png"
         self.temp_dir = "/app/backend/uploads/watermarks"
         os.makedirs(self.temp_dir, exist_ok=True)
+        
+        # Rendered overlays without the verification code, keyed by
+        # (username, position, tier, code layout)
+        self.overlay_cache = DiskLRUCache(
+            os.path.join(self.temp_dir, "cache"),
+            OVERLAY_CACHE_MB * 1024 * 1024,
+            suffix=".png"
+        )
+        
+        # Use a default font
+        try:
+            self.font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
+            self.code_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 18)
+        except Exception:
+            self.font = ImageFont.load_default()
+            self.code_font = ImageFont.load_default()
+        
+        # Processed once: white background removed, resized to fit the bar
+        self.logo = self._load_logo()
+    
+    def _load_logo(self) -> Optional[Image.Image]:
+        """Load the logo with its white background made transparent"""
+        try:
+            logo = np.array(Image.open(self.logo_path).convert('RGBA'))
+            
+            # If pixel is white or near-white, make it transparent
+            white = (logo[:, :, :3] > 200).all(axis=2)
+            logo[white] = (255, 255, 255, 0)
+            
+            logo = Image.fromarray(logo, 'RGBA')
+            
+            # Resize logo to fit width
+            logo_size = 60
+            logo.thumbnail((logo_size, logo_size), Image.Resampling.LANCZOS)
+            return logo
+        
+        except Exception as e:
+            print(f"Error loading logo: {e}")
+            return None
+    
+    @staticmethod
+    def _vertical_text(text: str, font, draw: ImageDraw.ImageDraw) -> Image.Image:
+        """Render text rotated 90 degrees counter-clockwise (bottom to top, letters face left)"""
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        text_img = Image.new('RGBA', (text_width + 20, text_height + 20), (0, 0, 0, 0))
+        text_draw = ImageDraw.Draw(text_img)
+        text_draw.text((10, 10), text, fill=(255, 255, 255, 200), font=font)
+        
+        return text_img.rotate(90, expand=True)
+    
+    def _render_base_overlay(self, username: str, code_size: Optional[tuple], output_path: str):
+        """
+        Render the overlay with the verification code slot left empty.
+        The slot's y offset is saved in the PNG metadata.
+        """
+        # Create a transparent image for the watermark
+        # We'll make it tall and narrow for vertical text
+        overlay_width = 80  # Width of vertical bar
+        overlay_height = 500  # Height to accommodate logo + text + code
+        
+        overlay = Image.new('RGBA', (overlay_width, overlay_height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        
+        current_y = 10
+        
+        # Draw username text vertically FIRST (at top)
+        # Remove @ symbol if present
+        text_img = self._vertical_text(username.lstrip('@'), self.font, draw)
+        
+        # Paste rotated text at top
+        text_x = (overlay_width - text_img.width) // 2
+        overlay.paste(text_img, (text_x, current_y), text_img)
+        
+        current_y += text_img.height + 5
+        
+        # Reserve space for the verification code BETWEEN username and logo
+        code_y = current_y
+        if code_size:
+            current_y += code_size[1] + 5
+        
+        # Paste logo below username
+        if self.logo is not None:
+            logo_x = (overlay_width - self.logo.width) // 2
+            overlay.paste(self.logo, (logo_x, current_y), self.logo)
+        
+        info = PngInfo()
+        info.add_text("code_y", str(code_y))
+        overlay.save(output_path, format="PNG", pnginfo=info)
     
     def create_watermark_overlay(
         self,
@@ -20,6 +119,9 @@ class WatermarkProcessor:
         Create a vertical watermark overlay image with logo, username, and verification code.
         Returns path to the overlay image.
         
+        The overlay minus the code comes from the overlay cache; only the code is drawn
+        per upload. Overlays with a code are written to a new file the caller removes.
+        
         Args:
             username: Creator's username
             position: left, right, top, bottom (free tier only supports left)
@@ -30,98 +132,50 @@ class WatermarkProcessor:
         if tier == "free":
             position = "left"
         
-        # Create a transparent image for the watermark
-        # We'll make it tall and narrow for vertical text
-        overlay_width = 80  # Width of vertical bar
-        overlay_height = 500  # Height to accommodate logo + text + code
-        
-        overlay = Image.new('RGBA', (overlay_width, overlay_height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        current_y = 10
-        
-        # Draw username text vertically FIRST (at top)
-        # Remove @ symbol if present
-        text = username.lstrip('@')
-        
-        # Use a default font
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-            code_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 18)
-        except Exception:
-            font = ImageFont.load_default()
-            code_font = ImageFont.load_default()
-        
-        # Create temporary image for horizontal text (username)
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        text_img = Image.new('RGBA', (text_width + 20, text_height + 20), (0, 0, 0, 0))
-        text_draw = ImageDraw.Draw(text_img)
-        text_draw.text((10, 10), text, fill=(255, 255, 255, 200), font=font)
-        
-        # Rotate text 90 degrees counter-clockwise (bottom to top, letters face left)
-        text_img = text_img.rotate(90, expand=True)
+        code_img = None
+        if verification_code:
+            scratch = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+            code_img = self._vertical_text(verification_code, self.code_font, scratch)
         
-        # Paste rotated text at top
-        text_x = (overlay_width - text_img.width) // 2
-        overlay.paste(text_img, (text_x, current_y), text_img)
+        code_layout = f"{code_img.width}x{code_img.height}" if code_img else "none"
+        base_path = self.overlay_cache.get_or_create(
+            f"{username}|{position}|{tier}|{code_layout}",
+            lambda path: self._render_base_overlay(username, code_img.size if code_img else None, path)
+        )
         
-        current_y += text_img.height + 5
+        if code_img is None:
+            return base_path
         
-        # Draw verification code (if provided) BETWEEN username and logo
-        if verification_code:
-            code_bbox = draw.textbbox((0, 0), verification_code, font=code_font)
-            code_width = code_bbox[2] - code_bbox[0]
-            code_height = code_bbox[3] - code_bbox[1]
-            
-            code_img = Image.new('RGBA', (code_width + 20, code_height + 20), (0, 0, 0, 0))
-            code_draw = ImageDraw.Draw(code_img)
-            code_draw.text((10, 10), verification_code, fill=(255, 255, 255, 200), font=code_font)
-            
-            # Rotate code 90 degrees counter-clockwise
-            code_img = code_img.rotate(90, expand=True)
-            
-            # Paste rotated code
-            code_x = (overlay_width - code_img.width) // 2
-            overlay.paste(code_img, (code_x, current_y), code_img)
-            
-            current_y += code_img.height + 5
-        
-        # Load and resize logo (BELOW username)
-        try:
-            logo = Image.open(self.logo_path).convert('RGBA')
-            
-            # Remove white background - make it transparent
-            logo_data = logo.getdata()
-            new_data = []
-            for item in logo_data:
-                # If pixel is white or near-white, make it transparent
-                if item[0] > 200 and item[1] > 200 and item[2] > 200:
-                    new_data.append((255, 255, 255, 0))  # Transparent
-                else:
-                    new_data.append(item)
-            logo.putdata(new_data)
-            
-            # Resize logo to fit width
-            logo_size = 60
-            logo.thumbnail((logo_size, logo_size), Image.Resampling.LANCZOS)
-            
-            # Paste logo below username
-            logo_x = (overlay_width - logo.width) // 2
-            overlay.paste(logo, (logo_x, current_y), logo)
-            
-        except Exception as e:
-            print(f"Error loading logo: {e}")
+        # Draw verification code (if provided) into the reserved slot
+        overlay = Image.open(base_path)
+        overlay.load()
+        code_y = int(overlay.text.get("code_y", "0"))
+        code_x = (overlay.width - code_img.width) // 2
+        overlay.paste(code_img, (code_x, code_y), code_img)
         
         # Save overlay
-        overlay_filename = f"watermark_{username}_{position}.png"
-        overlay_path = os.path.join(self.temp_dir, overlay_filename)
+        overlay_path = os.path.join(self.temp_dir, f"watermark_{uuid.uuid4().hex}.png")
         overlay.save(overlay_path)
         
         return overlay_path
     
+    @staticmethod
+    def overlay_position(position: str) -> tuple:
+        """Position calculations for ffmpeg overlay filter: (x, y) expressions"""
+        if position == "left":
+            return "10", "(main_h-overlay_h)/2"
+        elif position == "right":
+            return "main_w-overlay_w-10", "(main_h-overlay_h)/2"
+        elif position == "top":
+            return "(main_w-overlay_w)/2", "10"
+        elif position == "bottom":
+            return "(main_w-overlay_w)/2", "main_h-overlay_h-10"
+        return "10", "(main_h-overlay_h)/2"
+    
+    def is_temporary_overlay(self, overlay_path: str) -> bool:
+        """True for per-upload overlays (cached overlays must be kept)"""
+        return not overlay_path.startswith(self.overlay_cache.directory)
+    
     def apply_watermark(
         self,
         input_video_path: str,
@@ -129,7 +183,8 @@ class WatermarkProcessor:
         username: str,
         position: str = "left",
         tier: str = "free",
-        verification_code: str = None
+        verification_code: str = None,
+        encoding_args: Optional[list] = None
     ) -> bool:
         """
         Apply watermark to video using ffmpeg.
@@ -141,30 +196,17 @@ class WatermarkProcessor:
             position: Watermark position (left/right/top/bottom)
             tier: User tier
             verification_code: Verification code to display (optional)
+            encoding_args: ffmpeg video encoder options (e.g. EncodingProfile.output_args())
             
         Returns:
             True if successful, False otherwise
         """
+        watermark_path = None
         try:
             # Create watermark overlay
             watermark_path = self.create_watermark_overlay(username, position, tier, verification_code)
             
-            # Position calculations for ffmpeg overlay filter
-            if position == "left":
-                x_position = "10"
-                y_position = "(main_h-overlay_h)/2"
-            elif position == "right":
-                x_position = "main_w-overlay_w-10"
-                y_position = "(main_h-overlay_h)/2"
-            elif position == "top":
-                x_position = "(main_w-overlay_w)/2"
-                y_position = "10"
-            elif position == "bottom":
-                x_position = "(main_w-overlay_w)/2"
-                y_position = "main_h-overlay_h-10"
-            else:
-                x_position = "10"
-                y_position = "(main_h-overlay_h)/2"
+            x_position, y_position = self.overlay_position(position)
             
             # FFmpeg command to overlay watermark
             cmd = [
@@ -173,6 +215,7 @@ class WatermarkProcessor:
                 '-i', watermark_path,
                 '-filter_complex',
                 f'[1:v]format=rgba[wm];[0:v][wm]overlay={x_position}:{y_position}',
+                *(encoding_args or ['-movflags', '+faststart']),
                 '-codec:a', 'copy',  # Copy audio without re-encoding
                 '-y',  # Overwrite output file
                 output_video_path
@@ -188,8 +231,6 @@ class WatermarkProcessor:
             
             if result.returncode == 0:
                 print(f"✅ Watermark applied successfully to {output_video_path}")
-                # Clean up temporary watermark
-                os.remove(watermark_path)
                 return True
             else:
                 print(f"❌ FFmpeg error: {result.stderr.decode()}")
@@ -198,6 +239,12 @@ class WatermarkProcessor:
         except Exception as e:
             print(f"❌ Error applying watermark: {str(e)}")
             return False
+        
+        finally:
+            # Clean up temporary watermark (cached overlays are kept)
+            if watermark_path and self.is_temporary_overlay(watermark_path):
+                if os.path.exists(watermark_path):
+                    os.remove(watermark_path)
     
     def get_allowed_positions(self, tier: str) -> list:
         """Get allowed watermark positions for a tier"""
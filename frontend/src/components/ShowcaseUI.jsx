@@ -491,6 +491,11 @@ function ShowcaseUI(props) {
                         {video.thumbnail_url ? (
                           <img
                             src={`${BACKEND_URL}${video.thumbnail_url}`}
+                            srcSet={video.thumbnail_urls
+                              ? `${BACKEND_URL}${video.thumbnail_urls.grid.webp} ${video.thumbnail_urls.grid.width}w, ${BACKEND_URL}${video.thumbnail_urls.card.webp} ${video.thumbnail_urls.card.width}w`
+                              : undefined}
+                            sizes="(max-width: 640px) 100vw, 320px"
+                            loading="lazy"
                             alt={video.verification_code}
                             style={{
                               width: '100%',
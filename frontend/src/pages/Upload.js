@@ -49,6 +49,21 @@ function Upload() {
     }
   };
 
+  const waitForProcessing = async (jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const response = await axios.get(`${BACKEND_URL}/api/videos/jobs/${jobId}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      const job = response.data;
+
+      if (['success', 'duplicate', 'failed'].includes(job.status)) {
+        return job;
+      }
+      setProgress(job.progress);
+    }
+  };
+
   const handleUpload = async (e) => {
     e.preventDefault();
     
@@ -89,10 +104,21 @@ function Upload() {
         }
       );
 
-      if (response.data.duplicate_detected) {
-        setResult({ ...response.data, isDuplicate: true });
+      // Processing runs in the background - poll the job until it finishes
+      let data = response.data;
+      if (data.status === 'processing' && data.job_id) {
+        data = await waitForProcessing(data.job_id);
+      }
+
+      if (data.status === 'failed') {
+        setError(data.error || 'Video processing failed. Please try again.');
+        return;
+      }
+
+      if (data.duplicate_detected) {
+        setResult({ ...data, isDuplicate: true });
       } else {
-        setResult(response.data);
+        setResult(data);
       }
       setVideoFile(null);
       
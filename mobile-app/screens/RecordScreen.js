@@ -76,6 +76,20 @@ export default function RecordScreen({ navigation }) {
     }
   };
 
+  const waitForProcessing = async (jobId, token) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const response = await axios.get(`${API_BASE_URL}/videos/jobs/${jobId}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      const job = response.data;
+
+      if (['success', 'duplicate', 'failed'].includes(job.status)) {
+        return job;
+      }
+    }
+  };
+
   const uploadVideo = async (videoUri) => {
     try {
       setUploading(true);
@@ -104,9 +118,24 @@ export default function RecordScreen({ navigation }) {
         }
       );
 
+      // Processing runs in the background - poll the job until it finishes
+      let data = response.data;
+      if (data.status === 'processing' && data.job_id) {
+        data = await waitForProcessing(data.job_id, token);
+      }
+
+      if (data.status === 'failed') {
+        Alert.alert(
+          'Processing Failed',
+          data.error || 'Video processing failed. Please try again.'
+        );
+        setUploading(false);
+        return;
+      }
+
       Alert.alert(
-        'Success!',
-        `Video verified!\n\nCode: ${response.data.verification_code}`,
+        data.duplicate_detected ? 'Already Verified' : 'Success!',
+        `${data.duplicate_detected ? 'This video was already verified.' : 'Video verified!'}\n\nCode: ${data.verification_code}`,
         [
           {
             text: 'Record Another',
@@ -0,0 +1,84 @@
+"""
+In-memory stand-ins for the Motor collections the services use
+(equality and $or filters, inclusion projections and $set updates only)
+"""
+import copy
+from typing import Dict, List, Optional
+
+
+def _get(doc: Dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _matches(doc: Dict, query: Dict) -> bool:
+    return all(
+        any(_matches(doc, clause) for clause in value) if key == "$or" else _get(doc, key) == value
+        for key, value in query.items()
+    )
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return copy.deepcopy(doc)
+
+    result = {}
+    for path in ["_id", *projection]:
+        value = _get(doc, path)
+        if value is None or projection.get(path, 1) == 0:
+            continue
+        target = result
+        *parents, last = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[last] = copy.deepcopy(value)
+    return result
+
+
+class FakeCollection:
+    def __init__(self, docs: Optional[List[Dict]] = None):
+        self.docs = list(docs or [])
+
+    async def find_one(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        for doc in self.docs:
+            if _matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def insert_one(self, doc: Dict):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        await self._update(query, update, many=False)
+
+    async def update_many(self, query: Dict, update: Dict):
+        await self._update(query, update, many=True)
+
+    async def _update(self, query: Dict, update: Dict, many: bool):
+        for doc in self.docs:
+            if not _matches(doc, query):
+                continue
+            for path, value in update.get("$set", {}).items():
+                target = doc
+                *parents, last = path.split(".")
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[last] = value
+            if not many:
+                return
+
+
+class FakeDB:
+    """Collections are created on first access"""
+
+    def __init__(self, **collections: List[Dict]):
+        for name, docs in collections.items():
+            setattr(self, name, FakeCollection(docs))
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        collection = FakeCollection()
+        setattr(self, name, collection)
+        return collection
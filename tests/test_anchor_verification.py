@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import api.blockchain as blockchain_api
+import services.anchor_queue as anchor_module
+from services.anchor_queue import AnchorQueue, leaf_bytes, leaf_data
+from tests.fakes import FakeDB
+from utils.merkle import build_levels, leaf_hash, merkle_proof
+
+WALLET = "0x00000000000000000000000000000000000000aa"
+TX_HASH = "0x" + "ab" * 32
+
+
+class FakeBlockchain:
+    chain_id = 80002
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def explorer_tx_url(self, tx_hash):
+        return f"https://explorer/tx/{tx_hash}"
+
+    def get_account_address(self):
+        return WALLET
+
+    async def get_transaction_data(self, tx_hash):
+        if tx_hash != TX_HASH:
+            return None
+        return {
+            "data": {"v": "2.0", "root": self.root, "n": 2, "app": "Rendr"},
+            "from": WALLET,
+            "block_number": 123,
+            "block_timestamp": 1700000000,
+        }
+
+
+def anchored_video(video_id="video-1", original="a" * 64, file_sha256="f" * 64):
+    """A video anchored in a two-leaf batch, plus the batch root"""
+    data = leaf_data(video_id, original, file_sha256, 1700000000000)
+    leaf = leaf_hash(leaf_bytes(data))
+    other = leaf_hash(leaf_bytes(leaf_data("video-2", "b" * 64, "e" * 64, 1700000000001)))
+    levels = build_levels([leaf, other])
+    root = levels[-1][0].hex()
+
+    video = {
+        "_id": video_id,
+        "id": video_id,
+        "verification_code": "RND-TEST01",
+        "hashes": {"original": original},
+        "storage": {"file_sha256": file_sha256, "video_key": "videos/ff/ff/x.mp4"},
+        "blockchain_anchor": {
+            "status": "confirmed",
+            "leaf": leaf.hex(),
+            "leaf_data": data,
+            "root": root,
+            "index": 0,
+            "proof": merkle_proof(levels, 0),
+            "tx_hash": TX_HASH,
+        },
+        "blockchain_signature": {"tx_hash": TX_HASH, "chain_id": 80002, "status": "confirmed", "batch_size": 2},
+    }
+    return video, root
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    def install(root):
+        fake = FakeBlockchain(root)
+        monkeypatch.setattr(anchor_module, "blockchain_service", fake)
+        monkeypatch.setattr(blockchain_api, "blockchain_service", fake)
+        monkeypatch.setattr(blockchain_api, "anchor_queue", AnchorQueue())
+        return fake
+    return install
+
+
+def test_verify_anchor_end_to_end(chain):
+    video, root = anchored_video()
+    chain(root)
+    db = FakeDB(videos=[video])
+
+    result = asyncio.run(blockchain_api.verify_anchor("RND-TEST01", db=db))
+
+    assert result["verified"] is True
+    assert all(result["checks"].values())
+    assert result["block_number"] == 123
+
+
+def test_verify_anchor_rejects_edited_record(chain):
+    video, root = anchored_video()
+    video["storage"]["file_sha256"] = "0" * 64  # Record no longer matches the anchored leaf
+    chain(root)
+    db = FakeDB(videos=[video])
+
+    result = asyncio.run(blockchain_api.verify_anchor("RND-TEST01", db=db))
+
+    assert result["verified"] is False
+    assert result["checks"]["leaf_file_matches"] is False
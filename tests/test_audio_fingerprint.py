@@ -0,0 +1,21 @@
+import subprocess
+import sys
+import time
+
+from services import audio_fingerprint
+from services.audio_fingerprint import AudioFingerprinter
+
+
+def test_stalled_ffmpeg_is_killed_at_the_deadline(monkeypatch):
+    real_popen = subprocess.Popen
+
+    def stalled_ffmpeg(cmd, **kwargs):
+        return real_popen([sys.executable, "-c", "import time; time.sleep(60)"], **kwargs)
+
+    monkeypatch.setattr(audio_fingerprint.subprocess, "Popen", stalled_ffmpeg)
+    fingerprinter = AudioFingerprinter()
+    fingerprinter.timeout = 0.5
+
+    started = time.monotonic()
+    assert fingerprinter.fingerprint("video.mp4") is None
+    assert time.monotonic() - started < 10
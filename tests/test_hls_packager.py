@@ -0,0 +1,47 @@
+import json
+import subprocess
+
+from services.hls_packager import HLSPackager
+
+
+def probe(monkeypatch, width, height):
+    """_probe of a source with the given dimensions (ffprobe stubbed)"""
+    streams = {"streams": [
+        {"codec_type": "video", "width": width, "height": height},
+        {"codec_type": "audio"},
+    ]}
+    monkeypatch.setattr(
+        subprocess, "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(streams))
+    )
+    return HLSPackager._probe("clip.mp4")
+
+
+def test_portrait_source_gets_the_landscape_ladder(monkeypatch):
+    packager = HLSPackager()
+
+    portrait = packager.ladder_for(probe(monkeypatch, 1080, 1920)["short_edge"])
+    landscape = packager.ladder_for(probe(monkeypatch, 1920, 1080)["short_edge"])
+
+    assert [r.name for r in portrait] == ["360p", "720p", "source"]
+    assert [r.name for r in portrait] == [r.name for r in landscape]
+
+
+def test_small_portrait_source_drops_rungs_by_short_edge(monkeypatch):
+    packager = HLSPackager()
+
+    ladder = packager.ladder_for(probe(monkeypatch, 720, 1280)["short_edge"])
+
+    assert [r.name for r in ladder] == ["360p", "source"]
+
+
+def test_renditions_scale_the_short_edge():
+    packager = HLSPackager()
+    ladder = packager.ladder_for(1080)
+
+    cmd = packager.build_command("in.mp4", "/tmp/out", ladder, has_audio=False)
+    graph = cmd[cmd.index("-filter_complex") + 1]
+
+    # Landscape: height 720, width follows; portrait: width 720, height follows
+    assert "[v1]scale='if(gte(iw\\,ih)\\,-2\\,720)':'if(gte(iw\\,ih)\\,720\\,-2)'[v1out]" in graph
+    assert "[v2]null[v2out]" in graph
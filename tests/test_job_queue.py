@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from services.job_queue import JobQueue
+from tests.fakes import FakeDB
+
+
+def _failed_attempt(attempts: int) -> dict:
+    queue = JobQueue()
+    queue.retry_backoff = 10
+    queue.max_attempts = 5
+    queue.db = FakeDB(processing_jobs=[{"_id": "j1", "type": "work", "attempts": attempts}])
+
+    async def fail(ctx):
+        raise RuntimeError("boom")
+
+    queue.register("work", fail)
+    asyncio.run(queue._run({"_id": "j1", "type": "work", "attempts": attempts}))
+    return queue.db.processing_jobs.docs[0]
+
+
+def test_failed_jobs_back_off_exponentially():
+    for attempts, delay in [(1, 20), (2, 40), (3, 80)]:
+        before = datetime.now(timezone.utc)
+        job = _failed_attempt(attempts)
+
+        assert job["status"] == "queued"
+        assert before + timedelta(seconds=delay) <= job["available_at"]
+        assert job["available_at"] <= datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+
+def test_last_attempt_fails_without_backoff():
+    job = _failed_attempt(5)
+
+    assert job["status"] == "failed"
+    assert job["available_at"] is None
+
+
+def test_lost_job_sweep_runs_on_its_own_interval():
+    queue = JobQueue()
+    queue.lost_job_interval = 60
+    queue.db = FakeDB()
+    sweeps = []
+
+    async def sweep(now):
+        sweeps.append(now)
+
+    async def find_one_and_update(*args, **kwargs):
+        return None
+
+    queue._fail_lost_jobs = sweep
+    queue.db.processing_jobs.find_one_and_update = find_one_and_update
+
+    async def poll(times):
+        for _ in range(times):
+            await queue._claim()
+
+    asyncio.run(poll(5))
+    assert len(sweeps) == 1
+
+    queue._next_lost_sweep = 0.0
+    asyncio.run(poll(1))
+    assert len(sweeps) == 2
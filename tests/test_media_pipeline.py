@@ -0,0 +1,30 @@
+import sys
+
+import cv2
+import numpy as np
+
+from services.media_pipeline import MediaPipeline
+from services.thumbnail_service import thumbnail_service
+
+
+def frames():
+    """Flat grey (scores 0), then a detailed frame, then black (scores 0)"""
+    rng = np.random.default_rng(3)
+    detailed = rng.integers(40, 220, (48, 64, 3), dtype=np.uint8)
+    return [np.full((48, 64, 3), 128, np.uint8), detailed, np.zeros((48, 64, 3), np.uint8)]
+
+
+def bmp_stream_command(images):
+    """A command that writes BMP images to stdout the way ffmpeg's image2pipe does"""
+    payload = b"".join(cv2.imencode(".bmp", image)[1].tobytes() for image in images)
+    return [sys.executable, "-c", f"import sys; sys.stdout.buffer.write({payload!r})"]
+
+
+def test_run_keeps_the_best_frame_for_the_thumbnail():
+    images = frames()
+
+    hashes, scores, best = MediaPipeline()._run(bmp_stream_command(images), hash_frames=True)
+
+    assert len(hashes) == len(scores) == 3
+    assert thumbnail_service.best_frame([0, 10, 20], scores) == 10
+    np.testing.assert_array_equal(best, images[1])
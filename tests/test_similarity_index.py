@@ -0,0 +1,44 @@
+from services.enhanced_video_processor import enhanced_processor
+from services.hash_comparator import pack_frame_hashes
+from services.similarity_index import similarity_index
+
+FRAMES = pack_frame_hashes(["f0" * 32, "0f" * 32, "a5" * 32])
+
+
+def migrated_video():
+    """Frames backfilled from the stored (watermarked) file"""
+    return {
+        "_id": "old",
+        "hashes": {
+            "original": "1" * 64,
+            "frames": {"original": FRAMES, "center_region": FRAMES},
+            "frames_source": "watermarked",
+            "sampling_mode": "exact",
+        },
+    }
+
+
+def test_legacy_sha256_hashes_get_one_exact_key():
+    assert similarity_index.hex_keys("original", "AB" * 32) == [f"original:sha256:{'ab' * 32}"]
+
+
+def test_watermarked_full_frame_hashes_are_not_indexed():
+    keys = similarity_index.keys_for_video(migrated_video())
+
+    assert not any(key.startswith(f"original:{len(FRAMES) * 8}:") for key in keys)
+    assert any(key.startswith(f"center_region:{len(FRAMES) * 8}:") for key in keys)
+
+
+def test_watermarked_full_frame_hashes_are_not_compared():
+    upload = {
+        "original_hash": "2" * 64,
+        "frame_hashes": {"original": FRAMES},
+        "sampling_mode": "exact",
+    }
+
+    is_duplicate, _, confidence = enhanced_processor.smart_duplicate_detection(
+        upload, [migrated_video()], tier="free"
+    )
+
+    assert not is_duplicate
+    assert confidence < 0.95
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from utils.ttl_cache import TTLCache
+
+
+def test_a_key_is_never_computed_twice_at_once():
+    cache = TTLCache(ttl=60)
+    log = []
+
+    def compute(tag):
+        async def run():
+            log.append(("start", tag))
+            await asyncio.sleep(0.01)
+            log.append(("end", tag))
+            return tag
+        return run
+
+    async def invalidate_then_miss():
+        # The first computation has finished and its waiter is woken but has not run
+        # yet; an invalidate plus a new miss must queue behind that waiter
+        while ("end", "first") not in log:
+            await asyncio.sleep(0)
+        cache.invalidate("k")
+        return await cache.get_or_compute("k", compute("late"))
+
+    async def scenario():
+        return await asyncio.gather(
+            cache.get_or_compute("k", compute("first")),
+            cache.get_or_compute("k", compute("waiter")),
+            invalidate_then_miss(),
+        )
+
+    results = asyncio.run(scenario())
+
+    starts = [i for i, entry in enumerate(log) if entry[0] == "start"]
+    ends = [i for i, entry in enumerate(log) if entry[0] == "end"]
+    assert all(end < start for end, start in zip(ends, starts[1:]))
+    assert results[0] == "first"
+    assert cache._locks == {}
+
+
+def test_failed_computations_do_not_leave_locks_behind():
+    cache = TTLCache(ttl=60)
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("lookup failed")
+
+    async def scenario():
+        for key in range(3):
+            with pytest.raises(RuntimeError):
+                await cache.get_or_compute(key, fail)
+
+    asyncio.run(scenario())
+
+    assert cache._locks == {}
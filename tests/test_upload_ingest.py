@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from utils.upload_ingest import ingest_upload
+
+BOUNDARY = "rendrtestboundary"
+
+
+def _multipart_body(payload: bytes, fields=None) -> bytes:
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="video_file"; filename="../clip.mp4"\r\n'
+        f'Content-Type: video/mp4\r\n\r\n'.encode() + payload + b"\r\n"
+    )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def _request(body: bytes, chunk_size: int, received: list) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def receive():
+        index = len(received)
+        received.append(index)
+        return {
+            "type": "http.request",
+            "body": chunks[index],
+            "more_body": index < len(chunks) - 1,
+        }
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/upload",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+
+def test_file_part_is_hashed_and_written_in_one_pass(tmp_path):
+    payload = os.urandom(300_000)
+    received = []
+    request = _request(_multipart_body(payload, {"folder_id": "f1"}), 7_000, received)
+
+    ingested, form = asyncio.run(
+        ingest_upload(request, "video_file", lambda name: str(tmp_path / f"v_{name}"))
+    )
+
+    assert form == {"folder_id": "f1"}
+    assert ingested.path == str(tmp_path / "v_clip.mp4")
+    assert ingested.size == len(payload)
+    assert ingested.sha256 == hashlib.sha256(payload).hexdigest()
+    with open(ingested.path, "rb") as f:
+        assert f.read() == payload
+
+
+def test_upload_is_cut_off_at_the_limit(tmp_path):
+    payload = os.urandom(500_000)
+    received = []
+    body = _multipart_body(payload)
+    request = _request(body, 10_000, received)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(
+            ingest_upload(request, "video_file", lambda name: str(tmp_path / name), max_bytes=100_000)
+        )
+
+    assert exc.value.status_code == 413
+    # Stopped reading shortly after the limit instead of consuming the whole body
+    assert len(received) < 15
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_missing_file_part_is_rejected(tmp_path):
+    body = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="folder_id"\r\n\r\nf1\r\n--{BOUNDARY}--\r\n'.encode()
+    request = _request(body, 1_000, [])
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(ingest_upload(request, "video_file", lambda name: str(tmp_path / name)))
+
+    assert exc.value.status_code == 422
@@ -0,0 +1,38 @@
+import asyncio
+import io
+import os
+
+from starlette.datastructures import Headers, UploadFile
+
+from api import users
+from services.storage import LocalStorage, storage
+from tests.fakes import FakeDB
+
+
+def _image(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="a.png", headers=Headers({"content-type": "image/png"}))
+
+
+def _replace(db, user_id: str, data: bytes) -> str:
+    return asyncio.run(users._replace_image(db, user_id, _image(data), "profile_picture_url", "profile_picture"))
+
+
+def test_replaced_image_is_deleted_unless_another_user_shares_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads/temp")
+    monkeypatch.setattr(storage, "_backend", LocalStorage(str(tmp_path / "store")))
+    db = FakeDB(users=[{"_id": "u1"}, {"_id": "u2"}])
+
+    first = _replace(db, "u1", b"first")
+    shared = _replace(db, "u2", b"first")
+    assert shared == first
+
+    # u2 still shows the first image, so replacing u1's copy must keep the object
+    second = _replace(db, "u1", b"second")
+    assert storage.backend.exists(storage.media_key(first))
+
+    # Once u2 moves on too, nothing references it any more
+    _replace(db, "u2", b"third")
+    assert not storage.backend.exists(storage.media_key(first))
+    assert storage.backend.exists(storage.media_key(second))
+    assert db.users.docs[0]["profile_picture"] == second
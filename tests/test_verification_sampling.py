@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from services import frame_sampler as frame_sampler_module
+from services.frame_sampler import FrameSampler
+from services.video_processor import VideoProcessor
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    """50 frames of distinct noise (lossless, so re-reads decode identical pixels)"""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"FFV1"), 25, (64, 64))
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        writer.write(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def keyframe_mode(monkeypatch):
+    """FRAME_SAMPLING_MODE=keyframe, with keyframes every 3 frames (mostly not sample indices)"""
+    monkeypatch.setattr(frame_sampler_module.frame_sampler, "mode", "keyframe")
+    monkeypatch.setattr(FrameSampler, "_keyframe_indices", staticmethod(lambda path, fps: list(range(0, 50, 3))))
+
+
+def stored_hash(video_path):
+    """perceptual_hash as stored for an upload (exact sampling, no mode recorded)"""
+    frames = [
+        Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        for _, frame in FrameSampler(mode="exact").iter_frames(video_path, list(range(0, 50, 5)))
+    ]
+    return VideoProcessor.calculate_perceptual_hash(frames)
+
+
+def test_reupload_verifies_under_keyframe_sampling(video_path, keyframe_mode):
+    original = stored_hash(video_path)
+
+    frames, info = VideoProcessor.extract_frames(video_path, sampling_mode=original.get("sampling_mode"))
+    new_hash = VideoProcessor.calculate_perceptual_hash(frames)
+    new_hash["sampling_mode"] = info["sampling_mode"]
+
+    comparison = VideoProcessor.compare_hashes(original, new_hash)
+
+    assert comparison["result"] == "authentic"
+    assert comparison["similarity_score"] == 100.0
+
+
+def test_keyframe_hashes_are_not_compared_with_index_hashes(video_path, keyframe_mode):
+    original = stored_hash(video_path)
+
+    frames, info = VideoProcessor.extract_frames(video_path, sampling_mode="keyframe")
+    new_hash = VideoProcessor.calculate_perceptual_hash(frames)
+    new_hash["sampling_mode"] = info["sampling_mode"]
+
+    assert info["sampling_mode"] == "keyframe"
+    with pytest.raises(ValueError):
+        VideoProcessor.compare_hashes(original, new_hash)